@@ -1,9 +1,9 @@
 import tyro
 
-from . import check, drift, hooks, portal, sync, watch
+from . import check, chunkmap, drift, flow, hooks, portal, stats, sync, watch, watchd
 
 
-def main():
+def main():  # noqa: C901
     cmd = tyro.cli(
         check.Check
         | sync.Sync
@@ -11,6 +11,10 @@ def main():
         | portal.Portal
         | drift.Drift
         | hooks.Hooks
+        | stats.Stats
+        | watchd.Watchd
+        | chunkmap.ChunkMap
+        | flow.Flow
     )
     match cmd:
         case check.Check():
@@ -25,3 +29,11 @@ def main():
             return drift.run(cmd)
         case hooks.Hooks():
             return hooks.run(cmd)
+        case stats.Stats():
+            return stats.run(cmd)
+        case watchd.Watchd():
+            return watchd.run(cmd)
+        case chunkmap.ChunkMap():
+            return chunkmap.run(cmd)
+        case flow.Flow():
+            return flow.run(cmd)
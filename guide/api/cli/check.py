@@ -1,19 +1,27 @@
 """Validation hook for Claude Code PostToolUse events."""
 
 import asyncio
+import itertools
 import os
 import re
 import sys
 import tempfile
+from collections.abc import Awaitable, Callable, Generator
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Annotated
+from typing import TYPE_CHECKING, Annotated
 
 import tyro
 from pydantic import BaseModel
 from rich.console import Console
 from rich.status import Status
 
+from guide import pyright, timing
+
+if TYPE_CHECKING:
+    from guide.watchd import Filter
+
 
 @dataclass(frozen=True)
 class Config:
@@ -74,6 +82,8 @@ class LintResult:
     passed: bool
     output: str = ""
     error: str = ""
+    content: str | None = None
+    """Rewritten file content, when the tool pipes source through stdout."""
 
 
 @dataclass
@@ -83,6 +93,8 @@ class ValidationResult:
     lint_results: list[LintResult] = field(default_factory=list[LintResult])
     has_errors: bool = False
     was_formatted: bool = False
+    content: str = ""
+    """Content as validated, including any rewrite written back."""
 
 
 BOLD_ASTERISK = re.compile(r"\*\*[^*]+\*\*")
@@ -127,12 +139,20 @@ def label_code_fences(content: str) -> tuple[str, bool]:
 DEFAULT_TIMEOUT = 30.0
 
 
-async def run_cmd(name: str, args: list[str]) -> LintResult:
-    """Run a command and return the result."""
+async def run_cmd(name: str, args: list[str], stdin: str | None = None) -> LintResult:
+    """Run a command and return the result.
+
+    With ``stdin``, content is piped in and stdout is taken as the rewritten
+    content; diagnostics are read from stderr. The command runs under its
+    caller's deadline (a step's ``timeout``) and is killed when that expires.
+    """
     try:
         proc = await asyncio.create_subprocess_exec(
             name,
             *args,
+            stdin=asyncio.subprocess.DEVNULL
+            if stdin is None
+            else asyncio.subprocess.PIPE,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.PIPE,
         )
@@ -140,25 +160,53 @@ async def run_cmd(name: str, args: list[str]) -> LintResult:
         return LintResult(name, False, error=f"{name} not found")
 
     try:
-        async with asyncio.timeout(DEFAULT_TIMEOUT):
-            stdout, stderr = await proc.communicate()
-    except TimeoutError:
+        stdout, stderr = await proc.communicate(
+            None if stdin is None else stdin.encode()
+        )
+    except asyncio.CancelledError:
         proc.kill()
         await proc.wait()
-        return LintResult(name, False, error=f"{name} timed out after {DEFAULT_TIMEOUT}s")
+        raise
 
+    if stdin is not None:
+        return LintResult(
+            name,
+            proc.returncode == 0,
+            stderr.decode().strip(),
+            content=stdout.decode() or None,
+        )
     output = (stdout.decode() + "\n" + stderr.decode()).strip()
     return LintResult(name, proc.returncode == 0, output)
 
 
+@contextmanager
+def _tmp_copy(content: str, ext: str) -> Generator[str]:
+    """Materialize content for tools that cannot read stdin."""
+    with (
+        timing.span("write_tmp"),
+        tempfile.NamedTemporaryFile(mode="w", suffix=f".{ext}", delete=False) as tmp,
+    ):
+        tmp.write(content)
+    try:
+        yield tmp.name
+    finally:
+        Path(tmp.name).unlink(missing_ok=True)
+
+
+def _relabel(result: LintResult, tmp_path: str, file_path: str) -> LintResult:
+    """Report diagnostics against the real path instead of the temp copy."""
+    result.output = result.output.replace(tmp_path, file_path)
+    return result
+
+
 JS_EXTS = frozenset({"js", "jsx", "ts", "tsx", "mjs", "cjs"})
 MD_EXTS = frozenset({"md", "markdown"})
 PY_EXTS = frozenset({"py", "pyi"})
 C4_EXTS = frozenset({"c4"})
 
 
-async def run_biome(file_path: str, cfg: Config) -> LintResult:
-    """Run biome check on JS/TS files."""
+async def run_biome(file_path: str, content: str, cfg: Config) -> LintResult:
+    """Run biome check on JS/TS files via stdin."""
     args = ["check", "--write"]
     if cfg.biome_config:
         config_dir = (
@@ -167,57 +215,104 @@ async def run_biome(file_path: str, cfg: Config) -> LintResult:
             else cfg.biome_config
         )
         args.append(f"--config-path={config_dir}")
-    args.extend(["--vcs-use-ignore-file=false", file_path])
-    return await run_cmd("biome", args)
+    args.extend(["--vcs-use-ignore-file=false", f"--stdin-file-path={file_path}"])
+    return await run_cmd("biome", args, stdin=content)
 
 
-async def run_ruff_format(file_path: str, cfg: Config) -> None:
-    """Run ruff format on Python files."""
+async def run_ruff_format(file_path: str, content: str, cfg: Config) -> LintResult:
+    """Run ruff format on Python files via stdin."""
     args = ["format"]
     if cfg.ruff_config:
         args.append(f"--config={cfg.ruff_config}")
-    args.append(file_path)
-    await run_cmd("ruff", args)
+    args.extend(["--stdin-filename", file_path, "-"])
+    return await run_cmd("ruff", args, stdin=content)
 
 
-async def run_ruff_check(file_path: str, cfg: Config) -> LintResult:
-    """Run ruff check on Python files."""
+async def run_ruff_check(file_path: str, content: str, cfg: Config) -> LintResult:
+    """Run ruff check on Python files via stdin."""
     args = ["check", "--fix"]
     if cfg.ruff_config:
         args.append(f"--config={cfg.ruff_config}")
-    args.append(file_path)
-    return await run_cmd("ruff", args)
+    args.extend(["--stdin-filename", file_path, "-"])
+    return await run_cmd("ruff", args, stdin=content)
+
+
+def _pyright_root(file_path: str, cfg: Config) -> Path:
+    """The configured pyright project; the project the file belongs to otherwise."""
+    path = Path(file_path)
+    if cfg.pyright_config:
+        return Path(cfg.pyright_config).parent.resolve()
+    if root := pyright.find_project_root(path):
+        return root
+    return path.resolve().parent
+
+
+async def _pyright_diagnostics(
+    file_path: str, content: str, cfg: Config
+) -> list[pyright.Diagnostic]:
+    """Check through the watchd daemon's warm server, or one on this loop."""
+    from guide import watchd
+
+    root = await asyncio.to_thread(_pyright_root, file_path, cfg)
+    path = Path(file_path)
+    if (diags := await watchd.pyright_check(root, path, content)) is not None:
+        return diags
+    server = await pyright.server_for(root)
+    found = await server.check(path, content)
+    return [d for ds in found.values() for d in ds]
+
+
+async def run_pyright(file_path: str, content: str, cfg: Config) -> LintResult:
+    """Run pyright on Python files in project context via a shared language server.
+
+    Falls back to the CLI when no server is available or it does not answer
+    within ``pyright.CHECK_TIMEOUT``.
+    """
+    try:
+        diags = await _pyright_diagnostics(file_path, content, cfg)
+    except (FileNotFoundError, TimeoutError):
+        return await run_pyright_cli(file_path, content, cfg)
+    except ConnectionError as e:
+        return LintResult("pyright", False, error=str(e))
+
+    counts = {
+        sev: sum(d.severity == sev for d in diags) for sev in pyright.SEVERITY.values()
+    }
+    lines = [str(d) for d in diags]
+    lines.append(
+        f"{counts['error']} errors, {counts['warning']} warnings, "
+        f"{counts['information']} informations"
+    )
+    return LintResult("pyright", counts["error"] == 0, "\n".join(lines))
 
 
-async def run_pyright(file_path: str, cfg: Config) -> LintResult:
-    """Run pyright on Python files."""
+async def run_pyright_cli(file_path: str, content: str, cfg: Config) -> LintResult:
+    """Run the pyright CLI on a temp copy (no language server available)."""
     args: list[str] = []
     if cfg.pyright_config:
         project_dir = Path(cfg.pyright_config).parent
         args.append(f"--project={project_dir}")
-    args.append(file_path)
-    return await run_cmd("pyright", args)
+    with _tmp_copy(content, get_ext(file_path)) as tmp_path:
+        result = await run_cmd("pyright", [*args, tmp_path])
+    return _relabel(result, tmp_path, file_path)
 
 
-async def run_markdownlint_fix(file_path: str, cfg: Config) -> None:
-    """Run markdownlint --fix on markdown files."""
-    args = ["--fix"]
-    if cfg.markdownlint_config:
-        args.extend(["-c", cfg.markdownlint_config])
-    args.append(file_path)
-    await run_cmd("markdownlint", args)
-
+async def run_markdownlint(file_path: str, content: str, cfg: Config) -> LintResult:
+    """Run markdownlint --fix on markdown files, reporting what remains.
 
-async def run_markdownlint(file_path: str, cfg: Config) -> LintResult:
-    """Run markdownlint on markdown files."""
-    args: list[str] = []
+    Note: markdownlint cannot fix stdin, so fixing and linting share one temp
+    copy and a single process.
+    """
+    args = ["--fix"]
     if cfg.markdownlint_config:
         args.extend(["-c", cfg.markdownlint_config])
-    args.append(file_path)
-    return await run_cmd("markdownlint", args)
+    with _tmp_copy(content, get_ext(file_path)) as tmp_path:
+        result = await run_cmd("markdownlint", [*args, tmp_path])
+        result.content = await asyncio.to_thread(Path(tmp_path).read_text)
+    return _relabel(result, tmp_path, file_path)
 
 
-async def run_likec4(file_path: str, _cfg: Config) -> LintResult:
+async def run_likec4(file_path: str, _content: str, _cfg: Config) -> LintResult:
     """Run likec4 validate on C4 files.
 
     Note: LikeC4 validates directories, so we pass the parent directory.
@@ -231,34 +326,168 @@ def get_ext(file_path: str) -> str:
     return Path(file_path).suffix.lstrip(".")
 
 
-def _create_lint_tasks(
-    ext: str, tmp_path: str, cfg: Config
-) -> list[asyncio.Task[LintResult]]:
-    """Create linter tasks based on file extension."""
-    if ext in JS_EXTS:
-        return [asyncio.create_task(run_biome(tmp_path, cfg))]
-    if ext in PY_EXTS:
-        return [
-            asyncio.create_task(run_ruff_check(tmp_path, cfg)),
-            asyncio.create_task(run_pyright(tmp_path, cfg)),
-        ]
-    if ext in MD_EXTS:
-        return [asyncio.create_task(run_markdownlint(tmp_path, cfg))]
-    if ext in C4_EXTS:
-        return [asyncio.create_task(run_likec4(tmp_path, cfg))]
-    return []
-
-
-async def _run_linters(
-    ext: str, tmp_path: str, cfg: Config, result: ValidationResult
-) -> None:
-    """Run applicable linters and update result."""
-    tasks = _create_lint_tasks(ext, tmp_path, cfg)
-    if not tasks:
-        return
-    lint_results = await asyncio.gather(*tasks)
-    result.lint_results = list(lint_results)
-    result.has_errors = any(not lr.passed for lr in lint_results) or result.has_errors
+async def run_strip_bold(_file_path: str, content: str, _cfg: Config) -> LintResult:
+    """Strip bold emphasis from markdown."""
+    return LintResult("strip_bold", True, content=strip_markdown_bold(content)[0])
+
+
+async def run_label_fences(_file_path: str, content: str, _cfg: Config) -> LintResult:
+    """Label unlabeled markdown code fences."""
+    return LintResult("label_fences", True, content=label_code_fences(content)[0])
+
+
+type StepFn = Callable[[str, str, Config], Awaitable[LintResult]]
+
+
+@dataclass(frozen=True)
+class Step:
+    """A linter in the validation pipeline.
+
+    Steps without dependencies between them run concurrently. A mutating step
+    hands its rewritten content to its dependents, so mutating steps for one
+    extension must form a chain.
+    """
+
+    name: str
+    exts: frozenset[str]
+    fn: StepFn
+    after: tuple[str, ...] = ()
+    mutates: bool = False
+    fatal: bool = False
+    """Rejected content (not a missing tool or timeout) cancels remaining steps."""
+    silent: bool = False
+    """Only report this step when it fails."""
+    timeout: float = DEFAULT_TIMEOUT
+
+
+STEPS: list[Step] = [
+    Step("strip_bold", MD_EXTS, run_strip_bold, mutates=True, silent=True),
+    Step(
+        "label_fences",
+        MD_EXTS,
+        run_label_fences,
+        after=("strip_bold",),
+        mutates=True,
+        silent=True,
+    ),
+    Step(
+        "markdownlint",
+        MD_EXTS,
+        run_markdownlint,
+        after=("label_fences",),
+        mutates=True,
+        timeout=10.0,
+    ),
+    Step(
+        "ruff_format",
+        PY_EXTS,
+        run_ruff_format,
+        mutates=True,
+        fatal=True,
+        silent=True,
+        timeout=10.0,
+    ),
+    Step(
+        "ruff_check",
+        PY_EXTS,
+        run_ruff_check,
+        after=("ruff_format",),
+        mutates=True,
+        timeout=10.0,
+    ),
+    Step("pyright", PY_EXTS, run_pyright, after=("ruff_check",), timeout=60.0),
+    Step("biome", JS_EXTS, run_biome, mutates=True, timeout=10.0),
+    Step("likec4", C4_EXTS, run_likec4),
+]
+
+
+def plan_steps(ext: str, steps: list[Step] | None = None) -> list[Step]:
+    """Select the steps for an extension and check the mutation chain."""
+    plan = [s for s in (STEPS if steps is None else steps) if ext in s.exts]
+    names = {s.name for s in plan}
+    deps = {s.name: [d for d in s.after if d in names] for s in plan}
+
+    def ancestors(name: str) -> set[str]:
+        seen: set[str] = set()
+        stack = list(deps[name])
+        while stack:
+            if (d := stack.pop()) not in seen:
+                seen.add(d)
+                stack.extend(deps[d])
+        return seen
+
+    mutating = [s.name for s in plan if s.mutates]
+    for prev, cur in itertools.pairwise(mutating):
+        assert prev in ancestors(cur), f"mutating step {cur} must run after {prev}"
+    return plan
+
+
+async def _run_step(
+    step: Step, file_path: str, content: str, cfg: Config
+) -> LintResult:
+    """Run one step under its own timeout."""
+    try:
+        async with asyncio.timeout(step.timeout):
+            return await timing.timed(
+                f"lint.{step.name}", step.fn(file_path, content, cfg)
+            )
+    except TimeoutError:
+        return LintResult(
+            step.name, False, error=f"{step.name} timed out after {step.timeout}s"
+        )
+
+
+async def run_steps(
+    plan: list[Step], file_path: str, content: str, cfg: Config
+) -> tuple[str, list[LintResult]]:
+    """Run a step DAG; return the final content and reported results."""
+    names = {s.name for s in plan}
+    deps = {s.name: [d for d in s.after if d in names] for s in plan}
+    # content after each finished step, tagged with how many rewrites it carries
+    out: dict[str, tuple[int, str]] = {}
+    results: dict[str, LintResult] = {}
+    pending = list(plan)
+    running: dict[asyncio.Task[LintResult], tuple[Step, int, str]] = {}
+
+    try:
+        while pending or running:
+            for step in [s for s in pending if all(d in out for d in deps[s.name])]:
+                pending.remove(step)
+                version, src = max(
+                    (out[d] for d in deps[step.name]),
+                    key=lambda vc: vc[0],
+                    default=(0, content),
+                )
+                task = asyncio.create_task(_run_step(step, file_path, src, cfg))
+                running[task] = (step, version, src)
+            assert running, f"cyclic step dependencies: {[s.name for s in pending]}"
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            abort = False
+            for task in done:
+                step, version, src = running.pop(task)
+                lr = task.result()
+                results[step.name] = lr
+                if step.mutates and lr.content is not None:
+                    out[step.name] = (version + 1, lr.content)
+                else:
+                    out[step.name] = (version, src)
+                abort = abort or (step.fatal and not lr.passed and not lr.error)
+            if abort:
+                break
+    finally:
+        # superseded or short-circuited: kill whatever is still in flight
+        for t in running:
+            t.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+    final = max(out.values(), key=lambda vc: vc[0], default=(0, content))[1]
+    reported = [
+        results[s.name]
+        for s in plan
+        if s.name in results and not (s.silent and results[s.name].passed)
+    ]
+    return final, reported
 
 
 async def validate_file(
@@ -266,8 +495,13 @@ async def validate_file(
     content: str,
     cfg: Config,
     is_edit: bool = False,
+    write: bool = True,
 ) -> ValidationResult:
-    """Validate a file with applicable linters."""
+    """Validate a file with applicable linters.
+
+    Fixes from mutating steps are written back to ``file_path`` unless
+    ``write`` is false; ``was_formatted`` reports them either way.
+    """
     result = ValidationResult()
     ext = get_ext(file_path)
 
@@ -279,44 +513,48 @@ async def validate_file(
 
     # For Edit operations, read full content from disk
     if is_edit and file_path:
-        disk_path = Path(file_path)
-        if disk_path.exists():
-            content = disk_path.read_text()
-        else:
+        try:
+            with timing.span("read"):
+                content = await asyncio.to_thread(Path(file_path).read_text)
+        except FileNotFoundError:
             return result
 
-    original_content = content
-    if ext in MD_EXTS:
-        content, _ = strip_markdown_bold(content)
-        content, _ = label_code_fences(content)
-
-    # C4 files: validate original directory (likec4 validates dirs, not files)
-    if ext in C4_EXTS:
-        await _run_linters(ext, file_path, cfg, result)
+    plan = plan_steps(ext)
+    if not plan:
         return result
 
-    with tempfile.NamedTemporaryFile(mode="w", suffix=f".{ext}", delete=False) as tmp:
-        tmp.write(content)
-        tmp_path = tmp.name
-
-    try:
-        if ext in PY_EXTS:
-            await run_ruff_format(tmp_path, cfg)
-        if ext in MD_EXTS:
-            await run_markdownlint_fix(tmp_path, cfg)
-
-        await _run_linters(ext, tmp_path, cfg, result)
+    with timing.span("lint"):
+        formatted, lint_results = await run_steps(plan, file_path, content, cfg)
+    result.lint_results = lint_results
+    result.has_errors = any(not lr.passed for lr in lint_results)
+    result.content = formatted
 
-        formatted = Path(tmp_path).read_text()
-        if formatted != original_content:
+    with timing.span("write_back"):
+        if formatted != content:
             result.was_formatted = True
-            Path(file_path).write_text(formatted)
-    finally:
-        Path(tmp_path).unlink(missing_ok=True)
+            if write:
+                await asyncio.to_thread(Path(file_path).write_text, formatted)
 
     return result
 
 
+VALIDATE_JOBS = 8
+
+
+async def validate_files(
+    files: dict[str, str], cfg: Config, *, write: bool = True
+) -> dict[str, ValidationResult]:
+    """Validate ``{path: content}`` concurrently, at most ``VALIDATE_JOBS`` at once."""
+    sem = asyncio.Semaphore(VALIDATE_JOBS)
+
+    async def one(path: str, content: str) -> ValidationResult:
+        async with sem:
+            return await validate_file(path, content, cfg, write=write)
+
+    results = await asyncio.gather(*(one(p, c) for p, c in files.items()))
+    return dict(zip(files, results, strict=True))
+
+
 def _format_lint_errors(lint_results: list[LintResult]) -> list[str]:
     """Format lint errors for output."""
     lines: list[str] = []
@@ -400,21 +638,147 @@ def display_result(console: Console, result: ValidationResult) -> None:
     console.print("=" * 60)
 
 
+WATCH_DEBOUNCE_MS = 200
+
+
+@dataclass
+class Watcher:
+    """One in-flight validation per file; a newer change supersedes the run."""
+
+    cfg: Config
+    console: Console
+    inflight: dict[str, asyncio.Task[None]] = field(
+        default_factory=dict[str, asyncio.Task[None]]
+    )
+    validated: dict[str, str] = field(default_factory=dict[str, str])
+    failing: dict[str, ValidationResult] = field(
+        default_factory=dict[str, ValidationResult]
+    )
+
+    def submit(self, path: str) -> None:
+        """Cancel any stale run for ``path`` (killing its linters) and start anew."""
+        if (task := self.inflight.pop(path, None)) is not None:
+            task.cancel()
+        self.inflight[path] = asyncio.create_task(self._validate(path))
+
+    def forget(self, path: str) -> None:
+        if (task := self.inflight.pop(path, None)) is not None:
+            task.cancel()
+        self.validated.pop(path, None)
+        if self.failing.pop(path, None) is not None:
+            self.summary()
+
+    async def _validate(self, path: str) -> None:
+        try:
+            await self._revalidate(path)
+        finally:
+            if self.inflight.get(path) is asyncio.current_task():
+                del self.inflight[path]
+
+    async def _revalidate(self, path: str) -> None:
+        try:
+            content = await asyncio.to_thread(Path(path).read_text)
+        except (OSError, UnicodeDecodeError):
+            return
+        # our own write-back, or a save that changed nothing
+        if self.validated.get(path) == content:
+            return
+        result = await validate_file(path, content, self.cfg)
+        self.validated[path] = result.content or content
+        if result.has_errors:
+            self.console.print(f"\n[red]✗ {path}[/red]")
+            _display_lint_errors(self.console, result.lint_results)
+            self.failing[path] = result
+        else:
+            self.console.print(f"[green]✓ {path}[/green]")
+            self.failing.pop(path, None)
+        self.summary()
+
+    def summary(self) -> None:
+        if not self.failing:
+            self.console.print("[green]all files passing[/green]")
+            return
+        names = ", ".join(sorted(self.failing))
+        self.console.print(f"[yellow]{len(self.failing)} failing: {names}[/yellow]")
+
+
+def _watch_filter(roots: list[Path]) -> "Filter":
+    """Each root's .gitignore applies to the paths under it."""
+    from watchfiles import Change  # type: ignore[import-untyped]
+
+    from guide.utils import make_watch_filter
+
+    filters = [(r, make_watch_filter(r if r.is_dir() else r.parent)) for r in roots]
+
+    def accept(change: Change, path: str) -> bool:
+        return all(f(change, path) for r, f in filters if Path(path).is_relative_to(r))
+
+    return accept
+
+
+async def watch(roots: list[Path], cfg: Config, console: Console) -> None:
+    """Validate files as they change, coalescing bursts per file."""
+    from guide.watchd import watch_deltas
+
+    watcher = Watcher(cfg, console)
+    console.print(f"check: watching {', '.join(str(r) for r in roots)}")
+    async for deltas in watch_deltas(
+        *roots,
+        debounce=WATCH_DEBOUNCE_MS,
+        watch_filter=await asyncio.to_thread(_watch_filter, roots),
+    ):
+        for path in {p for _, p in deltas}:
+            if not plan_steps(get_ext(path)):
+                continue
+            if await asyncio.to_thread(Path(path).is_file):
+                watcher.submit(path)
+            else:
+                watcher.forget(path)
+
+
 @dataclass
 class Check:
     """Run validation on files."""
 
     files: Annotated[list[str], tyro.conf.Positional] = field(default_factory=list[str])
     hook: bool = False
+    watch: bool = False
+    """Revalidate files under the given paths (default: cwd) as they change."""
 
 
 def run(cmd: Check) -> None:
     """Execute the check command."""
+    if cmd.watch:
+        roots = [Path(f).resolve() for f in cmd.files] or [Path.cwd()]
+        asyncio.run(pyright.serving(watch(roots, load_config(), Console(stderr=True))))
+        return
+    with timing.record("check"):
+        _run(cmd)
+
+
+async def _check_files(files: list[str], cfg: Config, console: Console) -> None:
+    """Validate files in turn, sharing language servers across them."""
+    for file_path in files:
+        try:
+            content = await asyncio.to_thread(Path(file_path).read_text)
+        except FileNotFoundError:
+            console.print(f"[red]File not found: {file_path}[/red]")
+            continue
+
+        with Status(f"Validating {file_path}...", console=console):
+            result = await validate_file(file_path, content, cfg)
+
+        display_result(console, result)
+
+
+def _run(cmd: Check) -> None:
+    """Dispatch hook or file validation."""
     console = Console(stderr=True)
     cfg = load_config()
 
     if cmd.hook:
-        hook_data = HookData.model_validate_json(sys.stdin.read())
+        with timing.span("parse"):
+            hook_data = HookData.model_validate_json(sys.stdin.read())
         file_path = hook_data.tool_input.file_path
 
         if not file_path:
@@ -425,23 +789,15 @@ def run(cmd: Check) -> None:
         full_content = "" if is_edit else hook_data.tool_input.content
 
         with Status("Validating...", console=console):
-            result = asyncio.run(validate_file(file_path, full_content, cfg, is_edit))
+            result = asyncio.run(
+                pyright.serving(validate_file(file_path, full_content, cfg, is_edit))
+            )
 
         print(build_json_response(result))  # noqa: T201
         display_result(console, result)
 
     elif cmd.files:
-        for file_path in cmd.files:
-            path = Path(file_path)
-            if not path.exists():
-                console.print(f"[red]File not found: {file_path}[/red]")
-                continue
-
-            content = path.read_text()
-            with Status(f"Validating {file_path}...", console=console):
-                result = asyncio.run(validate_file(file_path, content, cfg))
-
-            display_result(console, result)
+        asyncio.run(pyright.serving(_check_files(cmd.files, cfg, console)))
 
     else:
         console.print(
@@ -0,0 +1,103 @@
+"""Run the map-md-to-yaml and map-pdf-to-md commands natively, chunk by chunk."""
+
+import asyncio
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Annotated
+
+import tyro
+from rich.console import Console
+
+from guide.chunkmap import (
+    Chunk,
+    MapError,
+    md_to_yaml,
+    pdf_text,
+    pdf_to_md,
+    write_page_groups,
+)
+from guide.llm import Model
+
+
+@dataclass(frozen=True)
+class _MdToYaml:
+    """Extract schema-guided YAML from a Markdown file."""
+
+    path: Annotated[Path, tyro.conf.Positional]
+    schema: Annotated[str, tyro.conf.Positional]
+    """Schema description, or a path to one."""
+    lines: int | None = None
+    """Lines per chunk (default: the command's NLINE_PER_CHUNK)."""
+    concurrency: int | None = None
+    model: Model = "sonnet"
+    out: Path | None = None
+    """Output file (default: PATH with a .yaml suffix)."""
+
+
+@dataclass(frozen=True)
+class _PdfToMd:
+    """Convert a PDF (or pdftotext output) to Markdown per page group."""
+
+    path: Annotated[Path, tyro.conf.Positional]
+    pages: int | None = None
+    """Pages per group (default: the command's PAGE_GROUP_SIZE)."""
+    concurrency: int | None = None
+    model: Model = "sonnet"
+    out: Path | None = None
+    """Output directory (default: PATH without its suffix)."""
+
+
+@dataclass(frozen=True)
+class ChunkMap:
+    """Map a document through an LLM command in checkpointed, concurrent chunks."""
+
+    cmd: Annotated[
+        Annotated[_MdToYaml, tyro.conf.subcommand("md-to-yaml", prefix_name=False)]
+        | Annotated[_PdfToMd, tyro.conf.subcommand("pdf-to-md", prefix_name=False)],
+        tyro.conf.OmitArgPrefixes,
+    ]
+
+
+def run(cmd: ChunkMap) -> int:
+    console = Console(stderr=True)
+
+    def done(chunk: Chunk, cached: bool) -> None:
+        note = " (checkpoint)" if cached else ""
+        console.print(f"chunk {chunk.index}: {chunk.start}-{chunk.end}{note}")
+
+    try:
+        match cmd.cmd:
+            case _MdToYaml(path=path, schema=schema, out=out):
+                if (schema_path := Path(schema)).is_file():
+                    schema = schema_path.read_text()
+                yaml = asyncio.run(
+                    md_to_yaml(
+                        path.read_text(),
+                        schema,
+                        lines_per_chunk=cmd.cmd.lines,
+                        concurrency=cmd.cmd.concurrency,
+                        model=cmd.cmd.model,
+                        on_done=done,
+                    )
+                )
+                out = out or path.with_suffix(".yaml")
+                out.write_text(yaml)
+                print(out)  # noqa: T201
+
+            case _PdfToMd(path=path, out=out):
+                text = pdf_text(path) if path.suffix == ".pdf" else path.read_text()
+                groups = asyncio.run(
+                    pdf_to_md(
+                        text,
+                        pages_per_group=cmd.cmd.pages,
+                        concurrency=cmd.cmd.concurrency,
+                        model=cmd.cmd.model,
+                        on_done=done,
+                    )
+                )
+                print(write_page_groups(groups, out or path.with_suffix("")))  # noqa: T201
+    except MapError as e:
+        print(f"chunk-map: {e}; rerun to resume", file=sys.stderr)  # noqa: T201
+        return 1
+    return 0
@@ -11,39 +11,93 @@ Gen file format::
 
     ---
     name: {doc}.gen
-    resolver: |                          # planned: Starlark (not yet implemented)
+    resolver: |
       def resolve(ctx):
           if ctx["difference"] > 30:
-              return run(ctx["contract"])
+              return run("make " + ctx["contract"])
           return None
     ---
     create-user:
-        db/init.sql
+        db/init.sql 0.82
 
-Resolver design (planned):
+Each ref is annotated with how closely its best-matching region still
+resembles the contract's baseline body: the estimated share of the body's
+token shingles found in that region (MinHash, guide.similarity).
 
-    Starlark (github.com/bazelbuild/starlark) — Python dialect, sandboxed.
-    Executes computation (if/for/def/dict/list) but cannot perform I/O.
-    Host injects builtins (run, notify, ...) that the resolver can call.
-    Guaranteed termination (no while, no recursion, frozen collections).
+Resolver (guide.resolver):
 
-    Starlark decides *whether* and *what*. Host decides *how*.
+    Starlark-like Python dialect, sandboxed: if/for/def/dict/list, no I/O,
+    no while, no recursion, step and time budgets. ``resolver:`` is kept
+    across gen rewrites and called as resolve(ctx) whenever a contract's
+    difference changes, with ctx = {contract, lang, doc, difference, refs,
+    similarity}.
+    Host builtins (run, notify) are performed on a bounded executor.
 
-    Python integration: pystarlark (PyO3 wrapper over starlark-rust).
+    The resolver decides *whether* and *what*. Host decides *how*.
+
+Index (.qx/index.json):
+
+    Rewritten atomically after the startup scan and every batch that
+    changes docs, refs or scores. ``contracts`` maps each contract to its
+    doc, lang, baseline hash, current difference, referencing files with
+    their similarity, and the most similar code regions anywhere (LSH);
+    ``paths`` maps each doc and code file to its contracts.
+    ``guide drift query <contract|path>`` answers from it without a scan.
+
+Check (``guide drift --check``, for CI):
+
+    One parallel scan, no watcher and no writes: every doc goes through
+    update_fences against a copy of the baselines. Prints a JSON report of
+    drifted, orphaned (no refs) and baseline-less contracts; exits 1 when
+    a contract's difference exceeds ``--threshold``.
 """
 
 import asyncio
+import hashlib
 import json
+import os
 import re
-from dataclasses import dataclass
+import sys
+from collections import ChainMap
+from collections.abc import Callable, Iterable, Iterator, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from difflib import SequenceMatcher
+from functools import partial
 from pathlib import Path
-
-from watchfiles import Change, awatch  # type: ignore[import-untyped]
-
+from typing import Annotated, Any, Self
+
+import tyro
+from watchfiles import Change  # type: ignore[import-untyped]
+
+from guide import timing
+from guide.fences import (
+    RE_FENCE,
+    Block,
+    Layout,
+    Layouts,
+    has_fences,
+    parse_contracts,
+)
+from guide.resolver import Host, read_resolver, resolver_front_matter
+from guide.similarity import (
+    LSHIndex,
+    Signed,
+    Sketch,
+    sign_code,
+    sign_files,
+    text_sketch,
+)
 from guide.utils import make_watch_filter
+from guide.watchd import watch_deltas
 
 DIFFS_REL = Path(".qx/diffs.json")
+INDEX_REL = Path(".qx/index.json")
+INDEX_VERSION = 1
+DRIFT_WORKERS = 8
+"""Files read, diffed and rewritten concurrently per watch batch."""
+STORM_DELTAS = 256
+"""Batches larger than this (a checkout, a rebase) are rescanned in one job."""
 _LANG_EXT: dict[str, str] = {
     "sql": ".sql",
     "py": ".py",
@@ -57,34 +111,63 @@ _LANG_EXT: dict[str, str] = {
 }
 _CODE_EXT = frozenset(_LANG_EXT.values())
 _WATCHED = _CODE_EXT | {".md"}
-_RE_FENCE = re.compile(
-    r"^(?P<indent>\s*)"
-    r"(?P<ticks>`{3,})"
-    r"(?P<lang>[a-z]+):(?P<contract>[a-z][a-z0-9]*(?:-[a-z0-9]+)*)"
-    r"(?=[:\s]|$)"
-    r"(?::(?P<diff>\d+))?"
-    r"(?P<rest>.*)$",
-)
-
 type Cache = dict[str, str]
+type Filter = Callable[[Change, str], bool]
 
 
-@dataclass
-class Block:
-    contract: str
-    lang: str
-    body: str
-    fence_idx: int
-    ticks: str
+type Index = dict[str, Any]
+type Scores = dict[str, dict[str, float]]
+"""contract -> ref path -> similarity."""
+
+
+@dataclass(frozen=True)
+class _Watch:
+    """Watch the workspace and track drift (default)."""
+
+
+@dataclass(frozen=True)
+class _Query:
+    """Look up a contract, or the contracts of a doc or code file, in the index."""
+
+    target: Annotated[str, tyro.conf.Positional]
 
 
 @dataclass(frozen=True)
 class Drift:
     """Track contract codeblock drift against cached baselines."""
 
-
-def run(_cmd: Drift) -> None:
-    asyncio.run(_drift())
+    check: bool = False
+    """Scan once, report drift as JSON and exit; writes nothing."""
+    threshold: int = 0
+    """With --check: exit 1 if any contract's difference exceeds this."""
+    cmd: (
+        Annotated[_Watch, tyro.conf.subcommand("watch", prefix_name=False)]
+        | Annotated[_Query, tyro.conf.subcommand("query", prefix_name=False)]
+    ) = _Watch()
+
+
+def run(cmd: Drift) -> int:
+    match cmd.cmd:
+        case _Watch() if cmd.check:
+            ws = find_workspace()
+            report = check(ws, make_watch_filter(ws))
+            print(json.dumps(report.to_json(cmd.threshold), indent=2))  # noqa: T201
+            return int(report.exceeds(cmd.threshold))
+        case _Watch():
+            asyncio.run(_drift())
+            return 0
+        case _Query(target=target):
+            ws = find_workspace()
+            index = load_index(ws)
+            if index is None:
+                print(f"drift: no index at {ws / INDEX_REL}", file=sys.stderr)  # noqa: T201
+                return 2
+            found = query(index, ws, target)
+            if not found:
+                print(f"drift: {target}: not in index", file=sys.stderr)  # noqa: T201
+                return 1
+            print(json.dumps(found, indent=2))  # noqa: T201
+            return 0
 
 
 def find_workspace() -> Path:
@@ -108,6 +191,82 @@ def save_cache(ws: Path, cache: Cache) -> None:
     p.write_text(json.dumps(cache, indent=2, sort_keys=True) + "\n")
 
 
+def build_index(
+    doc_blocks: dict[str, list[Block]],
+    cache: Cache,
+    refs: dict[str, set[str]],
+    scores: Scores | None = None,
+    code: LSHIndex | None = None,
+) -> Index:
+    contracts: dict[str, dict[str, Any]] = {}
+    paths: dict[str, set[str]] = {}
+    for doc, blocks in doc_blocks.items():
+        for b in blocks:
+            baseline = cache.get(f"{doc}::{b.contract}")
+            contracts[b.contract] = {
+                "doc": doc,
+                "lang": b.lang,
+                "line": b.fence_idx + 1,
+                "baseline": None
+                if baseline is None
+                else _digest(baseline.encode()).hex(),
+                "difference": b.diff,
+                "refs": sorted(refs.get(b.contract, ())),
+                "similarity": (scores or {}).get(b.contract, {}),
+                "similar": [
+                    {"path": r.path, "lines": [r.start, r.end], "score": round(s, 2)}
+                    for r, s in (
+                        code.query(_baseline_sketch(b, baseline)) if code else []
+                    )
+                ],
+            }
+            paths.setdefault(doc, set()).add(b.contract)
+    for name, files in refs.items():
+        if name in contracts:
+            for f in files:
+                paths.setdefault(f, set()).add(name)
+    return {
+        "version": INDEX_VERSION,
+        "contracts": dict(sorted(contracts.items())),
+        "paths": {p: sorted(names) for p, names in sorted(paths.items())},
+    }
+
+
+def _baseline_sketch(block: Block, baseline: str | None) -> Sketch:
+    return text_sketch(block.body if baseline is None else baseline)
+
+
+def save_index(ws: Path, index: Index) -> None:
+    """Write the index via rename, so readers never see a partial file."""
+    p = ws / INDEX_REL
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_suffix(".tmp")
+    tmp.write_text(json.dumps(index, indent=2) + "\n")
+    tmp.replace(p)
+
+
+def load_index(ws: Path) -> Index | None:
+    try:
+        index = json.loads((ws / INDEX_REL).read_text())
+    except (json.JSONDecodeError, OSError):
+        return None
+    return index if index.get("version") == INDEX_VERSION else None
+
+
+def query(index: Index, ws: Path, target: str) -> dict[str, Any]:
+    """Index entries for a contract name, or for the contracts of a file."""
+    contracts: dict[str, Any] = index["contracts"]
+    if target in contracts:
+        return {target: contracts[target]}
+    rel = target
+    try:
+        rel = str((Path.cwd() / target).resolve().relative_to(ws))
+    except ValueError:
+        pass
+    names = index["paths"].get(rel) or index["paths"].get(target, [])
+    return {n: contracts[n] for n in names if n in contracts}
+
+
 def difference(a: str, b: str) -> int:
     def norm(s: str) -> str:
         return "\n".join(ln.rstrip() for ln in s.split("\n")).strip()
@@ -118,35 +277,17 @@ def difference(a: str, b: str) -> int:
     )
 
 
-def parse_contracts(content: str) -> list[Block]:
-    lines, blocks, i = content.split("\n"), [], 0
-    while i < len(lines):
-        if m := _RE_FENCE.match(lines[i]):
-            ticks, start, body = m.group("ticks"), i, []
-            i += 1
-            while i < len(lines):
-                s = lines[i].strip()
-                if s.startswith(ticks) and not s.replace("`", ""):
-                    break
-                body.append(lines[i])
-                i += 1
-            blocks.append(
-                Block(
-                    m.group("contract"), m.group("lang"), "\n".join(body), start, ticks
-                )
-            )
-        i += 1
-    by_name = {b.contract: b for b in blocks}
-    return sorted(by_name.values(), key=lambda b: b.fence_idx)
-
-
 def update_fences(
-    content: str, cache: Cache, rel: str
+    content: str,
+    cache: MutableMapping[str, str],
+    rel: str,
+    layouts: Layouts | None = None,
 ) -> tuple[str, list[str], list[Block]]:
-    blocks = parse_contracts(content)
+    blocks = layouts.parse(rel, content) if layouts else parse_contracts(content)
     if not blocks:
         return content, [], []
-    lines, changes = content.split("\n"), []
+    edits: dict[int, tuple[int, str]] = {}
+    changes: list[str] = []
     for block in reversed(blocks):
         key = f"{rel}::{block.contract}"
         cached = cache.get(key)
@@ -155,7 +296,8 @@ def update_fences(
             changes.append(f"  {block.contract}: cached (new)")
             continue
         diff = difference(cached, block.body)
-        if not (m := _RE_FENCE.match(lines[block.fence_idx])):
+        fence = content[block.start : block.end]
+        if not (m := RE_FENCE.match(fence)):
             continue
         base = f"{m.group('indent')}{block.ticks}{block.lang}:{block.contract}"
         new_fence = (
@@ -163,118 +305,579 @@ def update_fences(
         )
         if not diff:
             cache[key] = block.body
-        if lines[block.fence_idx] != new_fence:
-            lines[block.fence_idx] = new_fence
+        if fence != new_fence:
+            edits[block.start] = (block.end, new_fence)
             changes.append(
                 f"  {block.contract}: {'Δ' + str(diff) if diff else 'converged'}"
             )
-    return "\n".join(lines), changes, blocks
+    if not edits:
+        return content, changes, blocks
+    parts: list[str] = []
+    pos = 0
+    for start in sorted(edits):
+        end, fence = edits[start]
+        parts += [content[pos:start], fence]
+        pos = end
+    updated = "".join([*parts, content[pos:]])
+    blocks = layouts.parse(rel, updated) if layouts else parse_contracts(updated)
+    return updated, changes, blocks
 
 
 def _matches(content: str, contract: str) -> bool:
     return contract in content or contract.replace("-", "_") in content
 
 
-def _scan_refs(ws: Path, contracts: dict[str, str], filt) -> dict[str, set[str]]:
+def _walk(ws: Path, filt: Filter) -> Iterator[Path]:
+    """Files the filter accepts, without descending into ignored directories."""
+    for root, dirs, files in os.walk(ws):
+        base = Path(root)
+        dirs[:] = [d for d in dirs if filt(Change.modified, str(base / d))]
+        for name in files:
+            if filt(Change.modified, str(path := base / name)):
+                yield path
+
+
+type _Trie = dict[str, _Trie]
+
+
+def _trie_pattern(node: _Trie) -> str:
+    alts = [re.escape(ch) + _trie_pattern(sub) for ch, sub in node.items() if ch]
+    if not alts:
+        return ""
+    body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+    return f"(?:{body})?" if "" in node else body
+
+
+@dataclass(frozen=True)
+class RefMatcher:
+    """Which contracts a text mentions, in one regex pass instead of one per name.
+
+    Same answer as :func:`_matches` per contract. Names and their snake_case
+    forms form a trie-shaped regex that reports the longest form starting at
+    each offset; the shorter forms starting there are its prefixes.
+    """
+
+    pattern: re.Pattern[str]
+    closure: dict[str, frozenset[str]]
+    """Form -> contracts with a form that is a prefix of it (itself included)."""
+
+    @classmethod
+    def build(cls, names: Iterable[str]) -> Self:
+        forms: dict[str, set[str]] = {}
+        for name in names:
+            for form in (name, name.replace("-", "_")):
+                forms.setdefault(form, set()).add(name)
+        trie: _Trie = {}
+        for form in forms:
+            node = trie
+            for ch in form:
+                node = node.setdefault(ch, {})
+            node[""] = {}
+        closure = {
+            form: frozenset[str]().union(
+                *(forms[form[:k]] for k in range(1, len(form) + 1) if form[:k] in forms)
+            )
+            for form in forms
+        }
+        body = _trie_pattern(trie) if forms else "(?!)"
+        return cls(re.compile(f"(?=({body}))"), closure)
+
+    def find(self, text: str) -> set[str]:
+        found: set[str] = set()
+        for m in self.pattern.finditer(text):
+            found |= self.closure[m[1]]
+        return found
+
+
+def _file_refs(
+    ws: Path, matchers: dict[str, RefMatcher], p: Path
+) -> tuple[str, set[str]]:
+    try:
+        text = p.read_text()
+    except (OSError, UnicodeDecodeError):
+        return "", set()
+    return str(p.relative_to(ws)), matchers[p.suffix].find(text)
+
+
+def _scan_refs(
+    ws: Path, contracts: dict[str, str], filt: Filter, workers: int = 1
+) -> dict[str, set[str]]:
+    by_ext: dict[str, list[str]] = {}
+    for name, lang in contracts.items():
+        if ext := _LANG_EXT.get(lang):
+            by_ext.setdefault(ext, []).append(name)
+    matchers = {ext: RefMatcher.build(names) for ext, names in by_ext.items()}
     refs: dict[str, set[str]] = {}
-    for p in ws.rglob("*"):
-        if (
-            not p.is_file()
-            or p.suffix not in _CODE_EXT
-            or not filt(Change.modified, str(p))
-        ):
-            continue
-        try:
-            text = p.read_text()
-        except (OSError, UnicodeDecodeError):
-            continue
-        rel = str(p.relative_to(ws))
-        for name, lang in contracts.items():
-            if _LANG_EXT.get(lang) == p.suffix and _matches(text, name):
+    files = [p for p in _walk(ws, filt) if p.suffix in matchers]
+    with ThreadPoolExecutor(workers) as pool:
+        for rel, names in pool.map(partial(_file_refs, ws, matchers), files):
+            for name in names:
                 refs.setdefault(name, set()).add(rel)
     return refs
 
 
+@dataclass(frozen=True)
+class Finding:
+    contract: str
+    doc: str
+    difference: int = 0
+
+
+@dataclass
+class CheckReport:
+    drifted: list[Finding] = field(default_factory=list[Finding])
+    orphaned: list[Finding] = field(default_factory=list[Finding])
+    missing_baseline: list[Finding] = field(default_factory=list[Finding])
+    contracts: int = 0
+
+    def exceeds(self, threshold: int) -> bool:
+        return any(f.difference > threshold for f in self.drifted)
+
+    def to_json(self, threshold: int) -> dict[str, Any]:
+        def rows(findings: list[Finding]) -> list[dict[str, Any]]:
+            return [vars(f) for f in sorted(findings, key=lambda f: f.contract)]
+
+        return {
+            "contracts": self.contracts,
+            "threshold": threshold,
+            "ok": not self.exceeds(threshold),
+            "drifted": rows(self.drifted),
+            "orphaned": rows(self.orphaned),
+            "missing_baseline": rows(self.missing_baseline),
+        }
+
+
+def _check_doc(ws: Path, cache: Cache, md: Path) -> tuple[str, list[Block]]:
+    if not has_fences(md):
+        return "", []
+    try:
+        content = md.read_text()
+    except (OSError, UnicodeDecodeError):
+        return "", []
+    rel = str(md.relative_to(ws))
+    # dry run: new baselines land in a throwaway overlay, the text is discarded
+    _, _, blocks = update_fences(content, ChainMap({}, cache), rel)
+    return rel, blocks
+
+
+def check(ws: Path, filt: Filter, workers: int = DRIFT_WORKERS) -> CheckReport:
+    """One-shot drift report over the workspace; reads only, writes nothing."""
+    cache = load_cache(ws)
+    docs = [
+        p
+        for p in _walk(ws, filt)
+        if p.suffix == ".md" and not p.name.endswith(".gen.md")
+    ]
+    report = CheckReport()
+    contracts: dict[str, str] = {}
+    defined: dict[str, tuple[str, Block]] = {}
+    with ThreadPoolExecutor(workers) as pool:
+        for rel, blocks in pool.map(partial(_check_doc, ws, cache), docs):
+            for b in blocks:
+                contracts[b.contract] = b.lang
+                defined[b.contract] = (rel, b)
+    refs = _scan_refs(ws, contracts, filt, workers)
+    for name, (rel, b) in defined.items():
+        if f"{rel}::{name}" not in cache:
+            report.missing_baseline.append(Finding(name, rel))
+        elif b.diff:
+            report.drifted.append(Finding(name, rel, b.diff))
+        if not refs.get(name):
+            report.orphaned.append(Finding(name, rel))
+    report.contracts = len(defined)
+    return report
+
+
+def _write_text(path: Path, text: str) -> None:
+    path.write_text(text)
+
+
 def _write_gen(
-    ws: Path, doc_rel: str, blocks: list[Block], refs: dict[str, set[str]]
+    ws: Path,
+    doc_rel: str,
+    blocks: list[Block],
+    refs: dict[str, set[str]],
+    write: Callable[[Path, str], None] = _write_text,
+    resolver: str | None = None,
+    scores: Scores | None = None,
 ) -> None:
     entries: list[str] = []
     for b in blocks:
         paths = sorted(refs.get(b.contract, set()))
+        score = (scores or {}).get(b.contract, {})
         entry = (
-            b.contract + ":\n" + "".join(f"\t{p}\n" for p in paths)
+            b.contract
+            + ":\n"
+            + "".join(
+                f"\t{p} {score[p]:.2f}\n" if p in score else f"\t{p}\n" for p in paths
+            )
             if paths
             else b.contract + ":"
         )
         entries.append(entry)
     name = Path(doc_rel).stem + ".gen"
-    (ws / doc_rel).with_suffix(".gen.md").write_text(
-        f"---\nname: {name}\n---\n" + "\n".join(entries) + "\n"
+    front = f"name: {name}\n" + (resolver_front_matter(resolver) if resolver else "")
+    write(
+        _gen_path(ws, doc_rel),
+        f"---\n{front}---\n" + "\n".join(entries) + "\n",
     )
 
 
-async def _drift() -> None:
-    ws = find_workspace()
-    cache = load_cache(ws)
-    filt = make_watch_filter(ws)
-    doc_blocks: dict[str, list[Block]] = {}
-    contracts: dict[str, str] = {}
-    for md in sorted(ws.rglob("*.md")):
-        if md.name.endswith(".gen.md") or not filt(Change.modified, str(md)):
-            continue
-        blocks = parse_contracts(md.read_text())
-        if blocks:
-            rel = str(md.relative_to(ws))
-            doc_blocks[rel] = blocks
-            contracts.update({b.contract: b.lang for b in blocks})
-    refs = _scan_refs(ws, contracts, filt)
-    for doc_rel, blks in doc_blocks.items():
-        _write_gen(ws, doc_rel, blks, refs)
-    print(f"drift: watching {ws}")  # noqa: T201
-    print(
-        f"drift: {len(contracts)} contracts, {sum(len(v) for v in refs.values())} refs"
-    )  # noqa: T201
-    async for deltas in awatch(ws, debounce=500, watch_filter=filt):
-        regen = False
-        for _, path_str in deltas:
-            path = Path(path_str)
-            if (
-                not path.is_file()
-                or path.suffix not in _WATCHED
-                or path.name.endswith(".gen.md")
-            ):
+def _gen_path(ws: Path, doc_rel: str) -> Path:
+    return (ws / doc_rel).with_suffix(".gen.md")
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    """What a file looked like right after drift wrote it."""
+
+    size: int
+    mtime_ns: int
+    digest: bytes
+
+    @classmethod
+    def of(cls, path: Path, data: bytes) -> Self:
+        st = path.stat()
+        return cls(st.st_size, st.st_mtime_ns, _digest(data))
+
+    def matches(self, path: Path) -> bool:
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == (self.size, self.mtime_ns)
+
+
+def _digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _write(path: Path, text: str, prev: Fingerprint | None) -> Fingerprint | None:
+    """Write ``text`` unless ``prev`` shows it is already there; its new fingerprint."""
+    data = text.encode()
+    if prev is not None and prev.digest == _digest(data) and prev.matches(path):
+        return None
+    path.write_bytes(data)
+    return Fingerprint.of(path, data)
+
+
+@dataclass
+class DocUpdate:
+    rel: str
+    content: str
+    updated: str
+    changes: list[str]
+    blocks: list[Block]
+    cache: Cache
+    layout: Layout | None = None
+    """The doc's fence layout after the update; None once it has no fences."""
+    written: Fingerprint | None = None
+    """Set when the doc was rewritten with its new fence annotations."""
+
+
+@dataclass
+class CodeUpdate:
+    rel: str
+    content: str
+    signed: Signed
+
+
+@dataclass
+class GenUpdate:
+    doc_rel: str
+    resolver: str | None
+
+
+type Update = DocUpdate | CodeUpdate | GenUpdate | None
+
+
+@dataclass
+class DriftState:
+    """Contracts, refs and baselines of one workspace, updated per watch batch.
+
+    File I/O and diffing run on worker threads (at most ``workers`` at once);
+    all state is mutated on the event loop between awaits. Batches are
+    handled one at a time with each path at most once per batch, so updates
+    to a path apply in event order. Events that pile up while a batch runs
+    arrive as the next batch; past ``storm`` deltas the batch is handled as a
+    rescan split into one slice of its paths per worker instead of one task
+    per path.
+    """
+
+    ws: Path
+    filt: Filter
+    cache: Cache = field(default_factory=dict[str, str])
+    doc_blocks: dict[str, list[Block]] = field(default_factory=dict[str, list[Block]])
+    contracts: dict[str, str] = field(default_factory=dict[str, str])
+    refs: dict[str, set[str]] = field(default_factory=dict[str, set[str]])
+    workers: int = DRIFT_WORKERS
+    storm: int = STORM_DELTAS
+    written: dict[Path, Fingerprint] = field(default_factory=dict[Path, Fingerprint])
+    """Files drift itself wrote; their watch events are dropped on a stat match."""
+    self_hits: int = 0
+    layouts: Layouts = field(default_factory=Layouts)
+    resolvers: dict[str, str] = field(default_factory=dict[str, str])
+    """Resolver source per doc, from its gen file's front matter."""
+    host: Host | None = None
+    diffs: dict[str, int] = field(default_factory=dict[str, int])
+    """Last difference a resolver was called with, per ``doc::contract``."""
+    code: LSHIndex = field(default_factory=LSHIndex)
+    """Signed regions of every code file in a contract language."""
+    scores: Scores = field(default_factory=dict[str, dict[str, float]])
+
+    def __post_init__(self) -> None:
+        self._sem = asyncio.Semaphore(self.workers)
+
+    def scan(self) -> None:
+        """Full startup scan: baselines, docs, refs and gen files (blocking)."""
+        self.cache = load_cache(self.ws)
+        with timing.span("scan_docs"):
+            for md in sorted(_walk(self.ws, self.filt)):
+                if md.suffix != ".md" or md.name.endswith(".gen.md"):
+                    continue
+                if not has_fences(md):
+                    continue
+                rel = str(md.relative_to(self.ws))
+                blocks = self.layouts.parse(rel, md.read_text())
+                if blocks:
+                    self.doc_blocks[rel] = blocks
+                    self.contracts.update({b.contract: b.lang for b in blocks})
+                    if source := read_resolver(_gen_path(self.ws, rel)):
+                        self.resolvers[rel] = source
+        with timing.span("scan_refs"):
+            self.refs = _scan_refs(self.ws, self.contracts, self.filt, self.workers)
+        with timing.span("sign_code"):
+            exts = {_LANG_EXT.get(lang) for lang in self.contracts.values()}
+            rels = [
+                str(p.relative_to(self.ws))
+                for p in _walk(self.ws, self.filt)
+                if p.suffix in exts
+            ]
+            self.code = LSHIndex.build(sign_files(self.ws, rels))
+            self._score(self.contracts)
+        with timing.span("write_gen"):
+            self.write_gens()
+        with timing.span("write_index"):
+            self.write_index()
+
+    def write(self, path: Path, text: str) -> None:
+        """Write ``text`` and fingerprint it; skip the write if we already did."""
+        if (fp := _write(path, text, self.written.get(path))) is not None:
+            self.written[path] = fp
+
+    def own_write(self, path: Path) -> bool:
+        """Whether an event for ``path`` is the echo of drift's own write."""
+        fp = self.written.get(path)
+        if fp is None:
+            return False
+        if fp.matches(path):
+            self.self_hits += 1
+            return True
+        del self.written[path]
+        return False
+
+    def index(self) -> Index:
+        return build_index(
+            self.doc_blocks, self.cache, self.refs, self.scores, self.code
+        )
+
+    def write_index(self) -> None:
+        save_index(self.ws, self.index())
+
+    def write_gens(self) -> None:
+        for doc_rel, blks in self.doc_blocks.items():
+            resolver = self.resolvers.get(doc_rel)
+            _write_gen(
+                self.ws, doc_rel, blks, self.refs, self.write, resolver, self.scores
+            )
+
+    def _load(self, path: Path) -> Update:
+        """Read and diff one file on a worker thread.
+
+        Shared state is only read here; what changed comes back in the update
+        and ``_apply`` folds it in on the loop.
+        """
+        if path.suffix not in _WATCHED or not path.is_file():
+            return None
+        rel = str(path.relative_to(self.ws))
+        if path.name.endswith(".gen.md"):
+            # edited by hand (our own writes are suppressed): pick up the resolver
+            doc_rel = rel.removesuffix(".gen.md") + ".md"
+            return GenUpdate(doc_rel, read_resolver(path))
+        if path.suffix == ".md" and not has_fences(path):
+            return DocUpdate(rel, "", "", [], [], {})
+        try:
+            content = path.read_text()
+        except (OSError, UnicodeDecodeError):
+            return None
+        if path.suffix != ".md":
+            return CodeUpdate(rel, content, sign_code(rel, content))
+        # diff against private copies: baseline writes land in an overlay
+        local: Cache = {}
+        overlay = ChainMap(local, self.cache)
+        layout = self.layouts.files.get(rel)
+        layouts = Layouts({rel: replace(layout)} if layout else {})
+        updated, changes, blocks = update_fences(content, overlay, rel, layouts)
+        written = None
+        if changes and updated != content:
+            written = _write(path, updated, self.written.get(path))
+        return DocUpdate(
+            rel, content, updated, changes, blocks, local, layouts.files[rel], written
+        )
+
+    def _resolve(self, rel: str, blocks: list[Block]) -> None:
+        """Call the doc's resolver for each contract whose difference changed."""
+        source = self.resolvers.get(rel)
+        if source is None or self.host is None:
+            return
+        for b in blocks:
+            key = f"{rel}::{b.contract}"
+            prev = self.diffs.get(key)
+            self.diffs[key] = b.diff
+            if prev == b.diff or (prev is None and not b.diff):
                 continue
-            try:
-                content = path.read_text()
-            except (OSError, UnicodeDecodeError):
+            ctx = {
+                "contract": b.contract,
+                "lang": b.lang,
+                "doc": rel,
+                "difference": b.diff,
+                "refs": sorted(self.refs.get(b.contract, ())),
+                "similarity": self.scores.get(b.contract, {}),
+            }
+            self.host.submit(source, ctx)
+
+    def _score(self, names: Iterable[str]) -> bool:
+        """Re-score the refs of ``names`` against their baselines; True if changed."""
+        defs = {b.contract: (d, b) for d, bs in self.doc_blocks.items() for b in bs}
+        changed = False
+        for name in names:
+            if name not in defs:
+                changed |= self.scores.pop(name, None) is not None
                 continue
-            rel = str(path.relative_to(ws))
-            if path.suffix == ".md":
-                updated, changes, blocks = update_fences(content, cache, rel)
-                if blocks:
-                    doc_blocks[rel] = blocks
-                    contracts.update({b.contract: b.lang for b in blocks})
-                elif rel in doc_blocks:
-                    del doc_blocks[rel]
-                if changes:
-                    if updated != content:
-                        path.write_text(updated)
-                    save_cache(ws, cache)
-                    for c in changes:
-                        print(f"{rel}: {c.strip()}")  # noqa: T201
+            doc, b = defs[name]
+            sketch = _baseline_sketch(b, self.cache.get(f"{doc}::{name}"))
+            scores = {
+                rel: round(self.code.score(rel, sketch), 2)
+                for rel in sorted(self.refs.get(name, ()))
+            }
+            if scores != self.scores.get(name):
+                self.scores[name] = scores
+                changed = True
+        return changed
+
+    def _update_refs(self, rel: str, content: str) -> bool:
+        regen = False
+        suffix = Path(rel).suffix
+        for name, lang in self.contracts.items():
+            if _LANG_EXT.get(lang) != suffix:
+                continue
+            was_ref = rel in self.refs.get(name, set())
+            is_ref = _matches(content, name)
+            if is_ref and not was_ref:
+                self.refs.setdefault(name, set()).add(rel)
                 regen = True
-            else:
-                for name, lang in contracts.items():
-                    if _LANG_EXT.get(lang) != path.suffix:
-                        continue
-                    was_ref = rel in refs.get(name, set())
-                    is_ref = _matches(content, name)
-                    if is_ref and not was_ref:
-                        refs.setdefault(name, set()).add(rel)
-                        regen = True
-                    elif was_ref and not is_ref:
-                        refs[name].discard(rel)
-                        regen = True
+            elif was_ref and not is_ref:
+                self.refs[name].discard(rel)
+                regen = True
+        return regen
+
+    def _apply_doc(self, result: DocUpdate) -> tuple[bool, bool]:
+        rel, blocks, changes = result.rel, result.blocks, result.changes
+        if result.layout is None:
+            self.layouts.forget(rel)
+        else:
+            self.layouts.files[rel] = result.layout
+        if result.written is not None:
+            self.written[self.ws / rel] = result.written
+        if blocks:
+            self.doc_blocks[rel] = blocks
+            self.contracts.update({b.contract: b.lang for b in blocks})
+        else:
+            self.doc_blocks.pop(rel, None)
+        self.cache.update(result.cache)
+        for c in changes:
+            print(f"{rel}: {c.strip()}")  # noqa: T201
+        self._score(b.contract for b in blocks)
+        self._resolve(rel, blocks)
+        return True, bool(changes)
+
+    def _apply(self, result: Update) -> tuple[bool, bool]:
+        """Fold one file's result into state; returns (regen, cache dirty)."""
+        match result:
+            case DocUpdate():
+                return self._apply_doc(result)
+            case GenUpdate(doc_rel=doc_rel, resolver=resolver):
+                if resolver == self.resolvers.get(doc_rel):
+                    return False, False
+                if resolver:
+                    self.resolvers[doc_rel] = resolver
+                else:
+                    self.resolvers.pop(doc_rel, None)
+                return doc_rel in self.doc_blocks, False
+            case CodeUpdate(rel=rel, content=content, signed=signed):
+                self.code.add(rel, signed)
+                before = {n for n, paths in self.refs.items() if rel in paths}
+                regen = self._update_refs(rel, content)
+                after = {n for n, paths in self.refs.items() if rel in paths}
+                return self._score(before | after) or regen, False
+            case None:
+                return False, False
+
+    async def _load_bounded(self, path: Path) -> Update:
+        async with self._sem:
+            return await asyncio.to_thread(self._load, path)
+
+    def _load_all(self, paths: list[Path]) -> list[Update]:
+        return [self._load(p) for p in paths]
+
+    async def _rescan(self, paths: list[Path]) -> list[Update]:
+        """Load ``paths`` in one contiguous slice per worker, keeping their order."""
+        size = -(-len(paths) // self.workers)
+        slices = [paths[i : i + size] for i in range(0, len(paths), size)]
+        loaded = await asyncio.gather(
+            *(asyncio.to_thread(self._load_all, s) for s in slices)
+        )
+        return [u for us in loaded for u in us]
+
+    async def handle(self, deltas: set[tuple[Change, str]]) -> None:
+        """Process one batch of watch events."""
+        paths = [
+            path
+            for path in dict.fromkeys(Path(p) for _, p in deltas)
+            if not self.own_write(path)
+        ]
+        if not paths:
+            results: list[Update] = []
+        elif len(deltas) > self.storm:
+            results = await self._rescan(paths)
+        else:
+            results = await asyncio.gather(*(self._load_bounded(p) for p in paths))
+        regen = dirty = False
+        for result in results:
+            r, d = self._apply(result)
+            regen, dirty = regen or r, dirty or d
+        if dirty:
+            await asyncio.to_thread(save_cache, self.ws, dict(self.cache))
         if regen:
-            for doc_rel, blks in doc_blocks.items():
-                _write_gen(ws, doc_rel, blks, refs)
+            await asyncio.to_thread(self.write_gens)
+        if regen or dirty:
+            await asyncio.to_thread(self.write_index)
+
+
+async def _drift() -> None:
+    ws = find_workspace()
+    state = DriftState(ws, make_watch_filter(ws), host=Host(ws))
+    with timing.record("drift"):
+        await asyncio.to_thread(state.scan)
+    print(f"drift: watching {ws}")  # noqa: T201
+    print(  # noqa: T201
+        f"drift: {len(state.contracts)} contracts, "
+        f"{sum(len(v) for v in state.refs.values())} refs"
+    )
+    try:
+        async for deltas in watch_deltas(ws, debounce=500, watch_filter=state.filt):
+            await state.handle(deltas)
+    finally:
+        print(f"drift: {state.self_hits} self-write events suppressed")  # noqa: T201
+        if state.host is not None:
+            state.host.shutdown()
@@ -0,0 +1,60 @@
+"""Run the flow: fences of a command file."""
+
+import asyncio
+import json
+import sys
+from dataclasses import dataclass
+from typing import Annotated, cast
+
+import tyro
+
+from guide.flow import FlowError, run_command
+from guide.llm import Model
+from guide.paths import Commands
+
+
+@dataclass(frozen=True)
+class Flow:
+    """Run a command's flows, asking the LLM for operations they leave undefined."""
+
+    command: Annotated[str, tyro.conf.Positional]
+    """Command name, e.g. map-md-to-yaml."""
+    variables: Annotated[tuple[str, ...], tyro.conf.Positional] = ()
+    """NAME=VALUE globals, e.g. TARGET_PATH=doc.md."""
+    entry: str = "main"
+    model: Model = "sonnet"
+
+
+def _value(text: str) -> str | int:
+    return int(text) if text.lstrip("-").isdigit() else text
+
+
+def run(cmd: Flow) -> int:
+    command = next((c for c in Commands if c.path.stem == cmd.command), None)
+    if command is None:
+        names = ", ".join(c.path.stem for c in Commands)
+        print(f"flow: no command {cmd.command} (one of {names})", file=sys.stderr)  # noqa: T201
+        return 2
+    variables: dict[str, str | int] = {}
+    for assignment in cmd.variables:
+        name, sep, text = assignment.partition("=")
+        if not sep:
+            print(f"flow: expected NAME=VALUE, got {assignment}", file=sys.stderr)  # noqa: T201
+            return 2
+        variables[name] = _value(text)
+    try:
+        result = asyncio.run(
+            run_command(command, variables, entry=cmd.entry, model=cmd.model)
+        )
+    except FlowError as e:
+        print(f"flow: {e}; rerun to resume", file=sys.stderr)  # noqa: T201
+        return 1
+    if isinstance(result, list):
+        items = cast("list[object]", result)
+        if all(isinstance(i, str) for i in items):
+            result = "".join(map(str, items))
+    if isinstance(result, str):
+        print(result, end="")  # noqa: T201
+    else:
+        print(json.dumps(result, indent=2))  # noqa: T201
+    return 0
@@ -1,27 +1,60 @@
 """Git hook management."""
 
+import asyncio
+import hashlib
+import json
 import os
 import shutil
 import subprocess
 import sys
-from dataclasses import dataclass
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass
 from pathlib import Path
 from typing import Annotated
 
 import tyro
+from rich.console import Console
+
+from guide import pyright
+from guide.api.cli.check import (
+    STEPS,
+    Config,
+    display_result,
+    get_ext,
+    load_config,
+    plan_steps,
+    validate_files,
+)
+from guide.staged import git_dir, read_blobs, staged_files
 
 HOOK_TEMPLATE = """\
 #!/bin/bash
 set -euo pipefail
 
-[ "${QX_COMMIT_HOOK_ACTIVE:-}" = "1" ] && exit 0
+[ "${{QX_COMMIT_HOOK_ACTIVE:-}}" = "1" ] && exit 0
 [ -f "$(git rev-parse --git-dir)/MERGE_HEAD" ] && exit 0
 
-exec guide hooks run changelog
+exec guide hooks run {handlers}
 """
 
+LINTER_CONFIGS = (
+    "pyproject.toml",
+    "ruff.toml",
+    ".ruff.toml",
+    "pyrightconfig.json",
+    "biome.json",
+    ".markdownlint.json",
+    ".markdownlint.yaml",
+)
+"""Repo files whose changes invalidate cached validations."""
+MAX_VALIDATED = 10_000
+
 
 def _repo_root() -> Path:
+    # git runs hooks from the top of the worktree and sets GIT_INDEX_FILE for
+    # pre-commit, which spares a rev-parse on every commit
+    if "GIT_INDEX_FILE" in os.environ:
+        return Path.cwd()
     result = subprocess.run(
         ["git", "rev-parse", "--show-toplevel"],
         capture_output=True,
@@ -44,18 +77,105 @@ def _load_env(repo: Path) -> None:
             os.environ[key.strip()] = val.strip()
 
 
+async def _changelog(_repo: Path) -> int:
+    qx_commit = shutil.which("qx-commit")
+    if not qx_commit:
+        print("qx-commit not found on PATH", file=sys.stderr)
+        return 1
+    proc = await asyncio.create_subprocess_exec(qx_commit, "post")
+    return await proc.wait()
+
+
+def _validation_key(repo: Path, cfg: Config) -> str:
+    """Hash of the steps and every linter config they read, in or outside the repo."""
+    h = hashlib.sha256(repr(cfg).encode())
+    for step in STEPS:
+        h.update(f"{step.name} {sorted(step.exts)}\n".encode())
+    configured = [Path(p) for p in asdict(cfg).values() if p]
+    paths = [
+        *(repo / name for name in LINTER_CONFIGS),
+        *(p for p in configured if not p.is_dir()),
+        *(p / name for p in configured if p.is_dir() for name in LINTER_CONFIGS),
+    ]
+    for path in paths:
+        if path.is_file():
+            h.update(str(path).encode() + b"\0" + path.read_bytes())
+    return h.hexdigest()
+
+
+async def _staged(repo: Path) -> int:
+    """Validate the staged content of every staged file, skipping known-good blobs.
+
+    Passing blobs are remembered in the git dir by id, so recommitting or
+    amending unchanged files costs two git calls. A cached verdict does not
+    notice changes in what a file imports; ``guide check`` does a full pass.
+    Staged content a formatter would rewrite fails the hook, since nothing is
+    written back to the index.
+    """
+    console = Console(stderr=True)
+    cfg = load_config()
+    cache = git_dir(repo) / "guide" / "validated.json"
+    key = _validation_key(repo, cfg)
+    try:
+        data = json.loads(cache.read_text())
+        passed: dict[str, None] = dict.fromkeys(
+            data["passed"] if data["key"] == key else []
+        )
+    except (OSError, json.JSONDecodeError, KeyError):
+        passed = {}
+
+    todo = {
+        f.path: f.sha
+        for f in staged_files(repo)
+        if plan_steps(ext := get_ext(f.path)) and f"{f.sha} {ext}" not in passed
+    }
+    blobs = read_blobs(repo, sorted(set(todo.values())))
+    files: dict[str, str] = {}
+    for path, sha in todo.items():
+        try:
+            files[str(repo / path)] = blobs[sha].decode()
+        except (KeyError, UnicodeDecodeError):
+            continue
+    results = await validate_files(files, cfg, write=False)
+
+    failed = 0
+    for path, result in results.items():
+        sha = todo[Path(path).relative_to(repo).as_posix()]
+        if result.has_errors:
+            failed += 1
+            console.print(f"[red]✗ {path}[/red]")
+            display_result(console, result)
+        elif result.was_formatted:
+            failed += 1
+            console.print(f"[red]✗ {path} is not formatted: guide check {path}[/red]")
+        else:
+            passed[f"{sha} {get_ext(path)}"] = None
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"key": key, "passed": list(passed)[-MAX_VALIDATED:]}))
+    tmp.replace(cache)
+    return 1 if failed else 0
+
+
+HANDLERS: dict[str, Callable[[Path], Awaitable[int]]] = {
+    "changelog": _changelog,
+    "staged": _staged,
+}
+"""Hook handlers by name; the ones a hook runs are run concurrently."""
+
+
 @dataclass(frozen=True)
 class _Install:
-    """Install a git hook into the current repo."""
+    """Install a pre-commit hook running the given handlers into the current repo."""
 
-    name: Annotated[str, tyro.conf.Positional]
+    names: Annotated[tuple[str, ...], tyro.conf.Positional]
 
 
 @dataclass(frozen=True)
 class _Run:
-    """Run a hook handler (called by the hook itself)."""
+    """Run hook handlers concurrently (called by the hook itself)."""
 
-    name: Annotated[str, tyro.conf.Positional]
+    names: Annotated[tuple[str, ...], tyro.conf.Positional]
 
 
 @dataclass(frozen=True)
@@ -68,51 +188,47 @@ class Hooks:
     )
 
 
-KNOWN_HOOKS = {"changelog"}
-
-
 def run(cmd: Hooks) -> int:
     match cmd.cmd:
-        case _Install(name=name):
-            if name not in KNOWN_HOOKS:
+        case _Install(names=names):
+            if unknown := [n for n in names if n not in HANDLERS]:
                 print(
-                    f"Unknown hook: {name}. Known: {', '.join(sorted(KNOWN_HOOKS))}",
+                    f"Unknown hook: {', '.join(unknown)}. Known: {', '.join(sorted(HANDLERS))}",
                     file=sys.stderr,
                 )
                 return 1
 
             repo = _repo_root()
-            hook_path = repo / ".git" / "hooks" / "pre-commit"
+            hook_path = git_dir(repo) / "hooks" / "pre-commit"
 
             # Remove stale hooks if they're ours
             for stale_name in ("post-commit", "commit-msg"):
-                stale = repo / ".git" / "hooks" / stale_name
-                if stale.exists() and "guide hooks run changelog" in stale.read_text():
+                stale = hook_path.parent / stale_name
+                if stale.exists() and "guide hooks run" in stale.read_text():
                     stale.unlink()
                     print(f"Removed stale {stale}", file=sys.stderr)
 
             if hook_path.exists():
                 print(f"Overwriting existing {hook_path}", file=sys.stderr)
 
-            hook_path.write_text(HOOK_TEMPLATE)
+            hook_path.parent.mkdir(parents=True, exist_ok=True)
+            hook_path.write_text(HOOK_TEMPLATE.format(handlers=" ".join(names)))
             hook_path.chmod(0o755)
             print(f"Installed pre-commit hook → {hook_path}", file=sys.stderr)
             return 0
 
-        case _Run(name=name):
-            if name not in KNOWN_HOOKS:
-                print(f"Unknown hook: {name}", file=sys.stderr)
+        case _Run(names=names):
+            if unknown := [n for n in names if n not in HANDLERS]:
+                print(f"Unknown hook: {', '.join(unknown)}", file=sys.stderr)
                 return 1
 
             repo = _repo_root()
             _load_env(repo)
+            return asyncio.run(pyright.serving(_run_handlers(repo, names)))
 
-            qx_commit = shutil.which("qx-commit")
-            if not qx_commit:
-                print("qx-commit not found on PATH", file=sys.stderr)
-                return 1
+    return 0
 
-            result = subprocess.run([qx_commit, "post"])
-            return result.returncode
 
-    return 0
+async def _run_handlers(repo: Path, names: tuple[str, ...]) -> int:
+    codes = await asyncio.gather(*(HANDLERS[n](repo) for n in dict.fromkeys(names)))
+    return next((c for c in codes if c), 0)
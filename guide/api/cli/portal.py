@@ -1,29 +1,47 @@
 """Password-protected Netlify portals."""
 
-import json
-import subprocess
+import shutil
 import webbrowser
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Annotated, Any
+from typing import Annotated
 
 import tyro
 from rich import print
 
+from guide.assets import Bundle, optimize
+from guide.netlify import Client, ManifestDiff, plan
+
 SITE_PREFIX = "qx-"
-Site = dict[str, Any]
+ACCOUNT_SLUG = "qxotk"
 
 
-def _netlify(args: list[str], *, capture: bool = False) -> subprocess.CompletedProcess[str]:
-    return subprocess.run(["netlify", *args], capture_output=capture, text=True, check=True)
+def _password_settings_url(site_name: str) -> str:
+    return f"https://app.netlify.com/sites/{site_name}/configuration/general#visitor-access"
 
 
-def _sites() -> list[Site]:
-    return json.loads(_netlify(["sites:list", "--json"], capture=True).stdout)
+def _print_plan(diff: ManifestDiff) -> None:
+    for mark, paths in (("+", diff.added), ("~", diff.changed), ("-", diff.removed)):
+        for path in paths:
+            print(f"{mark} {path}")
+    if not diff:
+        print("No changes.")
 
 
-def _password_settings_url(site_name: str) -> str:
-    return f"https://app.netlify.com/sites/{site_name}/configuration/general#visitor-access"
+def _stage(html: Path, raw: bool) -> Path:
+    if raw:
+        return html
+    bundle = optimize(html)
+    if not bundle.cached:
+        _print_bundle(bundle)
+    return bundle.path
+
+
+def _print_bundle(bundle: Bundle) -> None:
+    print(
+        f"Optimized {bundle.files} files: {bundle.bytes_in:,} -> {bundle.bytes_out:,} bytes, "
+        f"{bundle.sheets} shared stylesheets{' (cached)' if bundle.cached else ''}"
+    )
 
 
 @dataclass(frozen=True)
@@ -34,6 +52,10 @@ class _Add:
     html: Annotated[Path, tyro.conf.Positional]
     with_password: Annotated[bool, tyro.conf.arg(name="with-password")] = False
     """Open browser to set password after deploy."""
+    raw: bool = False
+    """Deploy files as they are, skipping dedupe and minification."""
+    dry_run: Annotated[bool, tyro.conf.arg(name="dry-run")] = False
+    """Print the files that would be uploaded, and stop."""
 
 
 @dataclass(frozen=True)
@@ -54,55 +76,112 @@ class _Set:
 
     name: Annotated[str, tyro.conf.Positional]
     html: Annotated[Path, tyro.conf.Positional]
+    raw: bool = False
+    """Deploy files as they are, skipping dedupe and minification."""
+    dry_run: Annotated[bool, tyro.conf.arg(name="dry-run")] = False
+    """Print added (+), changed (~) and removed (-) files since the last deploy, and stop."""
+
+
+@dataclass(frozen=True)
+class _Build:
+    """Run the asset stage alone: dedupe and minify, with .gz/.br variants."""
+
+    html: Annotated[Path, tyro.conf.Positional]
+    out: Path | None = None
+    """Copy the optimized bundle here; by default it stays in the cache."""
 
 
 @dataclass(frozen=True)
 class Portal:
     """Manage password-protected Netlify portals."""
 
-    cmd: (
+    cmd: Annotated[
         Annotated[_Add, tyro.conf.subcommand("add", prefix_name=False)]
         | Annotated[_Ls, tyro.conf.subcommand("ls", prefix_name=False)]
         | Annotated[_Rm, tyro.conf.subcommand("rm", prefix_name=False)]
         | Annotated[_Set, tyro.conf.subcommand("set", prefix_name=False)]
-    )
+        | Annotated[_Build, tyro.conf.subcommand("build", prefix_name=False)],
+        tyro.conf.OmitArgPrefixes,
+    ]
 
 
-def run(cmd: Portal) -> int:
-    match cmd.cmd:
-        case _Add(name=name, html=html, with_password=with_password):
-            site_name = f"{SITE_PREFIX}{name}"
+def _add(client: Client, cmd: _Add) -> int:
+    site_name = f"{SITE_PREFIX}{cmd.name}"
+    html = _stage(cmd.html, cmd.raw)
+    if cmd.dry_run:
+        _print_plan(plan(site_name, html))
+        return 0
 
-            _netlify(["sites:create", "--name", site_name, "--disable-linking", "--account-slug", "qxotk"], capture=True)
-            site_id = next(s["id"] for s in _sites() if s["name"] == site_name)
-            _netlify(["deploy", "--dir", str(html), "--prod", "--site", site_id])
+    site = client.create_site(site_name, ACCOUNT_SLUG)
+    deployed = client.deploy(site, html)
 
-            print(f"URL: https://{site_name}.netlify.app")
+    print(f"Uploaded {len(deployed.uploaded)} files")
+    print(f"URL: https://{site_name}.netlify.app")
 
-            if with_password:
-                webbrowser.open(_password_settings_url(site_name))
+    if cmd.with_password:
+        webbrowser.open(_password_settings_url(site_name))
+    return 0
+
+
+def _ls(client: Client) -> int:
+    for site in client.sites():
+        if site["name"].startswith(SITE_PREFIX):
+            print(f"{site['name']}\t{site['ssl_url']}")
+    return 0
+
+
+def _rm(client: Client, cmd: _Rm) -> int:
+    site = client.site(f"{SITE_PREFIX}{cmd.name}")
+    if not site:
+        print(f"Portal not found: {cmd.name}")
+        return 1
+    client.delete_site(site)
+    print(f"Removed: {cmd.name}")
+    return 0
 
-        case _Ls():
-            for site in _sites():
-                if site["name"].startswith(SITE_PREFIX):
-                    print(f"{site['name']}\t{site['ssl_url']}")
-
-        case _Rm(name=name):
-            site_name = f"{SITE_PREFIX}{name}"
-            site = next((s for s in _sites() if s["name"] == site_name), None)
-            if not site:
-                print(f"Portal not found: {name}")
-                return 1
-            _netlify(["sites:delete", site["id"], "-f"])
-            print(f"Removed: {name}")
-
-        case _Set(name=name, html=html):
-            site_name = f"{SITE_PREFIX}{name}"
-            site = next((s for s in _sites() if s["name"] == site_name), None)
-            if not site:
-                print(f"Portal not found: {name}")
-                return 1
-            _netlify(["deploy", "--dir", str(html), "--prod", "--site", site["id"]])
-            print(f"URL: {site['ssl_url']}")
 
+def _set(client: Client, cmd: _Set) -> int:
+    site_name = f"{SITE_PREFIX}{cmd.name}"
+    html = _stage(cmd.html, cmd.raw)
+    if cmd.dry_run:
+        _print_plan(plan(site_name, html))
+        return 0
+    site = client.site(site_name)
+    if not site:
+        print(f"Portal not found: {cmd.name}")
+        return 1
+    deployed = client.deploy(site, html)
+    print(f"Uploaded {len(deployed.uploaded)} files")
+    print(f"URL: {site['ssl_url']}")
     return 0
+
+
+def _build(cmd: _Build) -> int:
+    bundle = optimize(cmd.html, precompress=True)
+    _print_bundle(bundle)
+    if cmd.out is None:
+        print(bundle.path)
+    else:
+        shutil.copytree(
+            bundle.path,
+            cmd.out,
+            dirs_exist_ok=True,
+            ignore=shutil.ignore_patterns(".*"),
+        )
+        print(cmd.out)
+    return 0
+
+
+def run(cmd: Portal) -> int:
+    client = Client()
+    match cmd.cmd:
+        case _Add() as add:
+            return _add(client, add)
+        case _Ls():
+            return _ls(client)
+        case _Rm() as rm:
+            return _rm(client, rm)
+        case _Set() as set_:
+            return _set(client, set_)
+        case _Build() as build:
+            return _build(build)
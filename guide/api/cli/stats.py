@@ -0,0 +1,103 @@
+"""Latency percentiles per phase from recorded span timings."""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from guide import timing
+
+REGRESSION_RATIO = 1.2
+
+
+@dataclass(frozen=True)
+class PhaseStats:
+    command: str
+    phase: str
+    n: int
+    p50: float
+    p95: float
+    p99: float
+    prev_p95: float | None = None
+
+    @property
+    def regressed(self) -> bool:
+        return self.prev_p95 is not None and self.p95 > self.prev_p95 * REGRESSION_RATIO
+
+
+def _durations(records: Sequence[timing.Recorder]) -> dict[str, list[float]]:
+    by_phase: dict[str, list[float]] = {}
+    for rec in records:
+        for name, secs in rec.spans:
+            by_phase.setdefault(name, []).append(secs)
+    return by_phase
+
+
+def summarize(records: Sequence[timing.Recorder], window: int) -> list[PhaseStats]:
+    """Percentiles over the last ``window`` runs per command, vs the window before."""
+    by_cmd: dict[str, list[timing.Recorder]] = {}
+    for rec in sorted(records, key=lambda r: r.ts):
+        by_cmd.setdefault(rec.command, []).append(rec)
+
+    stats: list[PhaseStats] = []
+    for command, recs in by_cmd.items():
+        recent = _durations(recs[-window:])
+        prev = _durations(recs[-2 * window : -window])
+        for phase, secs in recent.items():
+            p50, p95, p99 = np.percentile(np.asarray(secs), [50, 95, 99])
+            base = prev.get(phase)
+            stats.append(
+                PhaseStats(
+                    command,
+                    phase,
+                    len(secs),
+                    float(p50),
+                    float(p95),
+                    float(p99),
+                    float(np.percentile(np.asarray(base), 95)) if base else None,
+                )
+            )
+    return stats
+
+
+@dataclass(frozen=True)
+class Stats:
+    """Report p50/p95/p99 latency per phase and linter."""
+
+    command: str | None = None
+    """Only report this entry point (check, drift, sync)."""
+    window: int = 200
+    """Most recent runs per command; the preceding window is the baseline."""
+    path: Path = timing.TIMINGS_PATH
+
+
+def _ms(secs: float) -> str:
+    return f"{secs * 1000:.1f}"
+
+
+def run(cmd: Stats) -> int:
+    console = Console()
+    records = [
+        r
+        for r in timing.load(cmd.path)
+        if cmd.command is None or r.command == cmd.command
+    ]
+    if not records:
+        console.print(f"[yellow]No timings recorded in {cmd.path}[/yellow]")
+        return 0
+
+    table = Table("command", "phase", "n", "p50 ms", "p95 ms", "p99 ms", "Δp95")
+    for s in summarize(records, cmd.window):
+        if s.prev_p95 is None or s.prev_p95 == 0:
+            delta = ""
+        else:
+            pct = (s.p95 / s.prev_p95 - 1) * 100
+            delta = f"[{'red' if s.regressed else 'dim'}]{pct:+.0f}%[/]"
+        table.add_row(
+            s.command, s.phase, str(s.n), _ms(s.p50), _ms(s.p95), _ms(s.p99), delta
+        )
+    console.print(table)
+    return 0
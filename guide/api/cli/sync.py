@@ -1,14 +1,25 @@
 import logging
-from dataclasses import dataclass
-
-log = logging.getLogger(__name__)
+import subprocess
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Literal
 
+from guide import timing
+from guide.imports import affected_tests
 from guide.model import Guide
 
+log = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class Sync:
-    pass
+    run: Literal["affected", "all"] | None = None
+    """Run tests first: only those affected by changed files, or all of them."""
+    changed: tuple[str, ...] = ()
+    """Changed files for --run affected (default: git diff against base + untracked)."""
+    base: str = "HEAD"
+    shards: int = 1
+    """Parallel pytest workers packed by past test durations; implies --run all."""
 
 
 @dataclass(frozen=True)
@@ -21,12 +32,63 @@ class SyncResult:
         return self.discovered - self.declared
 
 
+def _git_changed(base_dir: Path, base: str) -> list[Path]:
+    def git(*args: str) -> list[str]:
+        out = subprocess.run(
+            ["git", *args], cwd=base_dir, capture_output=True, text=True, check=True
+        ).stdout
+        return [line for line in out.splitlines() if line]
+
+    diff = git("diff", "--name-only", "--relative", base)
+    untracked = git("ls-files", "--others", "--exclude-standard")
+    return [Path(p) for p in [*diff, *untracked]]
+
+
+def _relative(base_dir: Path, changed: tuple[str, ...]) -> list[Path]:
+    root = base_dir.resolve()
+    paths = [Path(p) for p in changed]
+    return [p.resolve().relative_to(root) if p.is_absolute() else p for p in paths]
+
+
+def run_tests(guide: Guide, cmd: Sync) -> None:
+    if cmd.run == "affected":
+        changed = (
+            _relative(guide.dir, cmd.changed)
+            if cmd.changed
+            else _git_changed(guide.dir, cmd.base)
+        )
+        nodeids = affected_tests(guide.dir, changed)
+        log.info(f"{len(nodeids)} tests affected by {len(changed)} changed files")
+        if not nodeids:
+            return
+        guide.lang.run_tests(guide.dir, nodeids, shards=cmd.shards)
+    elif cmd.shards > 1:
+        declared = {
+            ref
+            for spec in guide.design.flat()
+            if spec.test
+            and (guide.dir / (ref := spec.test.ref).split("::", 1)[0]).is_file()
+        }
+        nodeids = sorted(declared | set(guide.lang.discover_tests(guide.dir)))
+        guide.lang.run_tests(guide.dir, nodeids, shards=cmd.shards, replace=True)
+    else:
+        guide.lang.run_tests(guide.dir)
+
+
 def run(cmd: Sync) -> SyncResult:
-    guide = Guide.touch()
-    guide.load_test_results_()
+    if cmd.run is None and cmd.shards > 1:
+        cmd = replace(cmd, run="all")
+    with timing.record("sync"):
+        guide = Guide.touch()
+        if cmd.run is not None:
+            with timing.span("run_tests"):
+                run_tests(guide, cmd)
+        with timing.span("load_results"):
+            guide.load_test_results_()
 
-    declared = {spec.test.ref for spec in guide.design.flat() if spec.test}
-    discovered = set(guide.lang.discover_tests(guide.dir))
+        declared = {spec.test.ref for spec in guide.design.flat() if spec.test}
+        with timing.span("discover"):
+            discovered = set(guide.lang.discover_tests(guide.dir))
 
     result = SyncResult(declared=declared, discovered=discovered)
 
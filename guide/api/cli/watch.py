@@ -7,10 +7,9 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import cast
 
-from watchfiles import awatch  # type: ignore[import-untyped]
-
 from guide.model import Guide
 from guide.utils import make_watch_filter
+from guide.watchd import watch_deltas
 
 
 @dataclass(frozen=True)
@@ -33,7 +32,7 @@ async def _watch() -> None:
     cache: Cache = {}
     watch_filter = make_watch_filter(mission.dir)
 
-    async for deltas in awatch(
+    async for deltas in watch_deltas(
         mission.dir,
         debounce=1000,
         watch_filter=watch_filter,
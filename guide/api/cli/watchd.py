@@ -0,0 +1,25 @@
+"""Serve shared file watchers to drift, watch and check --watch."""
+
+import asyncio
+import sys
+from dataclasses import dataclass
+
+from guide.watchd import Server, ServerRunningError, socket_path
+
+
+@dataclass(frozen=True)
+class Watchd:
+    """Run one file watcher per root for all guide tools, over a Unix socket."""
+
+
+def run(_cmd: Watchd) -> int:
+    path = socket_path()
+    print(f"watchd: listening on {path}")  # noqa: T201
+    try:
+        asyncio.run(Server(path).serve())
+    except ServerRunningError as e:
+        print(f"watchd: {e}", file=sys.stderr)  # noqa: T201
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
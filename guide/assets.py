@@ -0,0 +1,226 @@
+"""Asset stage for portal bundles: dedupe, minify and precompress.
+
+Generated reports inline their comm and mood CSS into every page, so a
+bundle of N pages ships the same stylesheets N times. :func:`optimize`
+lifts each sizeable ``<style>`` block into ``assets/<sha>.css`` (identical
+blocks land in one file, which browsers then cache across pages), minifies
+HTML and CSS, and optionally writes ``.gz``/``.br`` siblings for static
+hosts that serve precompressed files. Brotli needs the optional ``brotli``
+package; without it only gzip is written.
+
+Output goes to a cache directory keyed by the hash of the input files, so
+rebuilding an unchanged report is a lookup.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from guide.netlify import cache_dir
+
+try:
+    import brotli  # type: ignore[import-not-found]
+except ImportError:
+    brotli = None
+
+STAGE_VERSION = 2
+"""Bump when the output of the stage changes, to drop cached bundles."""
+ASSETS_DIR = "assets"
+INLINE_MAX = 256
+"""Minified ``<style>`` blocks up to this many bytes stay inline."""
+COMPRESS_MIN = 256
+COMPRESSIBLE = frozenset({".html", ".css", ".js", ".svg", ".json", ".txt", ".xml"})
+MAX_BUNDLES = 8
+"""Cached bundles kept; older ones are pruned after each build."""
+
+
+# ── CSS ──────────────────────────────────────────────────────────────
+
+_CSS_KEEP = re.compile(
+    r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|/\*!.*?\*/)|/\*.*?\*/""", re.DOTALL
+)
+_CSS_PUNCT = re.compile(r" ?([{};,>]) ?")
+_CSS_SLOT = re.compile(r"\x00(\d+)\x00")
+_CSS_RUN = re.compile(r"([^{}]*)([{}]?)")
+"""Text up to the next brace: a declaration block when that brace closes."""
+_CSS_COLON = re.compile(r" ?: ?")
+
+
+def _squeeze_declarations(m: re.Match[str]) -> str:
+    # in selectors and at-rule preludes a space before ":" is a descendant combinator
+    text, brace = m.groups()
+    return (_CSS_COLON.sub(":", text) if brace == "}" else text) + brace
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and redundant whitespace; strings and ``/*!`` comments survive."""
+    kept: list[str] = []
+
+    def stash(m: re.Match[str]) -> str:
+        if m.group(1) is None:
+            return " "
+        kept.append(m.group(1))
+        return f"\x00{len(kept) - 1}\x00"
+
+    css = _CSS_KEEP.sub(stash, css)
+    css = re.sub(r"\s+", " ", css)
+    css = _CSS_RUN.sub(_squeeze_declarations, css)
+    css = _CSS_PUNCT.sub(r"\1", css).replace(";}", "}")
+    return _CSS_SLOT.sub(lambda m: kept[int(m.group(1))], css.strip())
+
+
+# ── HTML ─────────────────────────────────────────────────────────────
+
+_RAW = re.compile(
+    r"(<(pre|textarea|script|style)\b[^>]*>.*?</\2\s*>)", re.DOTALL | re.IGNORECASE
+)
+_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+_STYLE = re.compile(r"<style(\s[^>]*)?>(.*?)</style\s*>", re.DOTALL | re.IGNORECASE)
+_PLAIN_ATTRS = re.compile(r"""\s*(type\s*=\s*["']?text/css["']?)?\s*""", re.IGNORECASE)
+
+
+def minify_html(html: str) -> str:
+    """Strip comments and collapse whitespace outside raw-text elements.
+
+    Runs of whitespace become one space rather than nothing, so inline
+    elements keep their spacing.
+    """
+    parts = _RAW.split(html)
+    out: list[str] = []
+    # split yields text, whole raw element, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        out.append(re.sub(r"\s+", " ", _COMMENT.sub("", parts[i])))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return "".join(out).strip()
+
+
+def _css_name(css: str) -> str:
+    return f"{hashlib.sha256(css.encode()).hexdigest()[:16]}.css"
+
+
+def extract_styles(html: str, prefix: str, sheets: dict[str, str]) -> str:
+    """Minify ``<style>`` blocks; move sizeable ones to ``sheets`` as links.
+
+    ``prefix`` is the relative path from the page to the bundle root.
+    Repeated blocks within a page are emitted once.
+    """
+    seen: set[str] = set()
+
+    def replace(m: re.Match[str]) -> str:
+        attrs, css = m.group(1) or "", minify_css(m.group(2))
+        if css in seen:
+            return ""
+        seen.add(css)
+        if len(css) <= INLINE_MAX or not _PLAIN_ATTRS.fullmatch(attrs):
+            return f"<style{attrs}>{css}</style>"
+        name = _css_name(css)
+        sheets[name] = css
+        return f'<link rel="stylesheet" href="{prefix}{ASSETS_DIR}/{name}">'
+
+    return _STYLE.sub(replace, html)
+
+
+# ── bundles ──────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class Bundle:
+    path: Path
+    files: int
+    bytes_in: int
+    bytes_out: int
+    """Size of the optimized files, not counting precompressed siblings."""
+    sheets: int
+    """Stylesheets lifted out of pages."""
+    cached: bool
+
+
+def _inputs(root: Path) -> list[Path]:
+    return sorted(
+        p
+        for p in root.rglob("*")
+        if p.is_file() and not any(s.startswith(".") for s in p.relative_to(root).parts)
+    )
+
+
+def input_key(root: Path, *, precompress: bool) -> str:
+    h = hashlib.sha256(f"{STAGE_VERSION} {precompress}".encode())
+    for path in _inputs(root):
+        h.update(path.relative_to(root).as_posix().encode() + b"\0")
+        h.update(hashlib.sha256(path.read_bytes()).digest())
+    return h.hexdigest()[:32]
+
+
+def _write(path: Path, data: bytes, precompress: bool) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    if not precompress or path.suffix not in COMPRESSIBLE or len(data) < COMPRESS_MIN:
+        return
+    gz = gzip.compress(data, 9, mtime=0)
+    if len(gz) < len(data):
+        path.with_name(path.name + ".gz").write_bytes(gz)
+    if brotli is not None:
+        br: bytes = brotli.compress(data, quality=11)
+        if len(br) < len(data):
+            path.with_name(path.name + ".br").write_bytes(br)
+
+
+def _build(src: Path, out: Path, precompress: bool) -> tuple[int, int, int, int]:
+    sheets: dict[str, str] = {}
+    files = bytes_in = bytes_out = 0
+    for path in _inputs(src):
+        rel = path.relative_to(src)
+        data = path.read_bytes()
+        files += 1
+        bytes_in += len(data)
+        if path.suffix == ".html":
+            prefix = "../" * (len(rel.parts) - 1)
+            html = extract_styles(data.decode(), prefix, sheets)
+            data = minify_html(html).encode()
+        elif path.suffix == ".css":
+            data = minify_css(data.decode()).encode()
+        bytes_out += len(data)
+        _write(out / rel, data, precompress)
+    for name, css in sheets.items():
+        data = css.encode()
+        bytes_out += len(data)
+        _write(out / ASSETS_DIR / name, data, precompress)
+    return files, bytes_in, bytes_out, len(sheets)
+
+
+def _prune(bundles: Path) -> None:
+    dirs = sorted(
+        (d for d in bundles.iterdir() if d.is_dir() and not d.name.startswith(".")),
+        key=lambda d: d.stat().st_mtime,
+        reverse=True,
+    )
+    for d in dirs[MAX_BUNDLES:]:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+def optimize(src: Path, *, precompress: bool = False) -> Bundle:
+    """Optimized copy of the bundle at ``src``, built or taken from the cache."""
+    bundles = cache_dir() / "bundles"
+    key = input_key(src, precompress=precompress)
+    out = bundles / key
+    stats = out / ".stats"
+    if stats.exists():
+        os.utime(out)  # keep recently used bundles from being pruned
+        files, bytes_in, bytes_out, sheets = map(int, stats.read_text().split())
+        return Bundle(out, files, bytes_in, bytes_out, sheets, cached=True)
+
+    tmp = bundles / f".{key}.{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    counts = _build(src, tmp, precompress)
+    (tmp / ".stats").write_text(" ".join(map(str, counts)))
+    try:
+        tmp.rename(out)
+    except OSError:  # built concurrently by another process
+        shutil.rmtree(tmp, ignore_errors=True)
+    _prune(bundles)
+    return Bundle(out, *counts, cached=False)
@@ -0,0 +1,244 @@
+"""Chunked map engine for the ``map-md-to-yaml`` and ``map-pdf-to-md`` commands.
+
+Both commands describe the same shape: cut a document into chunks (line
+ranges, or page groups), run one LLM task per chunk with a cap on how many
+run at once, and stitch the answers back together in document order.
+:func:`map_chunks` is that shape. Each answer is checkpointed under the
+hash of the task and the chunk text, so a rerun after a crash, a timeout
+or an edit to one part of the document only asks for the chunks it lacks.
+Chunks are fixed-size, so an edit that adds or removes lines changes the
+text of every chunk after it.
+
+Chunk sizes and concurrency caps default to what the command files
+declare (``NLINE_PER_CHUNK``, ``N_MAX_CONCURRENT_AGENT``,
+``PAGE_GROUP_SIZE``, ``N_MAX_CONCURRENT_FLOW``).
+"""
+
+import asyncio
+import hashlib
+import shutil
+import subprocess
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+from guide.llm import Model
+from guide.paths import Commands, cache_dir, write_atomic
+from guide.prompts import declared_int, fenced
+
+LINES_PER_CHUNK = 200
+PAGES_PER_GROUP = 10
+CONCURRENCY = 3
+PAGE_BREAK = "\f"
+"""What ``pdftotext`` puts between pages."""
+
+
+@dataclass(frozen=True)
+class Chunk:
+    index: int
+    start: int
+    """First line or page, 1-based."""
+    end: int
+    """Last line or page, inclusive."""
+    text: str
+
+
+def line_chunks(text: str, size: int) -> list[Chunk]:
+    lines = text.splitlines(keepends=True)
+    return [
+        Chunk(
+            i,
+            start + 1,
+            min(start + size, len(lines)),
+            "".join(lines[start : start + size]),
+        )
+        for i, start in enumerate(range(0, len(lines), size))
+    ]
+
+
+def page_chunks(text: str, size: int) -> list[Chunk]:
+    """Groups of ``size`` pages, from text with form feeds between pages."""
+    pages = text.split(PAGE_BREAK)
+    if pages and not pages[-1].strip():
+        pages.pop()  # pdftotext ends the last page with a form feed too
+    return [
+        Chunk(
+            i,
+            start + 1,
+            min(start + size, len(pages)),
+            PAGE_BREAK.join(pages[start : start + size]),
+        )
+        for i, start in enumerate(range(0, len(pages), size))
+    ]
+
+
+def pdf_text(path: Path) -> str:
+    """Page text of a PDF through poppler's ``pdftotext``."""
+    if shutil.which("pdftotext") is None:
+        raise FileNotFoundError("pdftotext not found on PATH (install poppler)")
+    return subprocess.run(
+        ["pdftotext", "-layout", str(path), "-"],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+
+# ── engine ───────────────────────────────────────────────────────────
+
+
+class MapError(RuntimeError):
+    """Some chunks failed; the others are checkpointed for the rerun."""
+
+    def __init__(self, failed: dict[int, BaseException], total: int) -> None:
+        first = next(iter(failed.values()))
+        super().__init__(f"{len(failed)} of {total} chunks failed, first: {first!r}")
+        self.failed = failed
+
+
+type OnDone = Callable[[Chunk, bool], None]
+"""Called with each finished chunk and whether it came from a checkpoint."""
+
+
+async def map_chunks(
+    chunks: Sequence[Chunk],
+    fn: Callable[[Chunk], Awaitable[str]],
+    *,
+    key: str,
+    concurrency: int = CONCURRENCY,
+    checkpoints: Path | None = None,
+    on_done: OnDone | None = None,
+) -> list[str]:
+    """``fn`` over ``chunks``, at most ``concurrency`` at once, in chunk order.
+
+    ``key`` names the task (prompt, schema, model): answers are
+    checkpointed per (key, chunk text) under ``checkpoints``, by default the
+    user cache dir. The range is not part of the checkpoint, so a chunk whose
+    text moved keeps its answer.
+    """
+    root = cache_dir("chunkmap") if checkpoints is None else checkpoints
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(chunk: Chunk) -> str:
+        ident = f"{key}\0{chunk.text}"
+        digest = hashlib.sha256(ident.encode()).hexdigest()
+        path = root / digest[:2] / f"{digest[2:32]}.txt"
+        if path.exists():
+            result, cached = path.read_text(), True
+        else:
+            async with sem:
+                result, cached = await fn(chunk), False
+            write_atomic(path, result)
+        if on_done is not None:
+            on_done(chunk, cached)
+        return result
+
+    results = await asyncio.gather(*(one(c) for c in chunks), return_exceptions=True)
+    failed = {
+        c.index: r
+        for c, r in zip(chunks, results, strict=True)
+        if isinstance(r, BaseException)
+    }
+    if failed:
+        raise MapError(failed, len(chunks))
+    return [r for r in results if isinstance(r, str)]
+
+
+# ── commands ─────────────────────────────────────────────────────────
+
+
+def _task_key(command: Commands, model: Model, *extra: str) -> str:
+    parts = (command.value, model, command.template.body, *extra)
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+
+async def md_to_yaml(
+    text: str,
+    schema: str,
+    *,
+    lines_per_chunk: int | None = None,
+    concurrency: int | None = None,
+    model: Model = "sonnet",
+    on_done: OnDone | None = None,
+) -> str:
+    """YAML extracted from Markdown chunk by chunk, as one multi-document stream."""
+    command = Commands.map_md_to_yaml
+    template = command.template
+    size = lines_per_chunk or declared_int(template, "NLINE_PER_CHUNK", LINES_PER_CHUNK)
+
+    async def extract(chunk: Chunk) -> str:
+        answer = await command.aask(
+            f"Run process-chunk only, for lines {chunk.start}-{chunk.end}, on the "
+            "chunk below: do not read files or dispatch agents. Respond with a "
+            "single ```yaml block. Do not hallucinate.",
+            model=model,
+            schema=schema,
+            chunk=chunk.text,
+        )
+        return fenced(answer, "yaml")
+
+    docs = await map_chunks(
+        line_chunks(text, size),
+        extract,
+        key=_task_key(command, model, schema),
+        concurrency=concurrency
+        or declared_int(template, "N_MAX_CONCURRENT_AGENT", CONCURRENCY),
+        on_done=on_done,
+    )
+    return "---\n".join(docs)
+
+
+@dataclass(frozen=True)
+class PageGroup:
+    start: int
+    end: int
+    markdown: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.start}-{self.end}.md"
+
+
+async def pdf_to_md(
+    text: str,
+    *,
+    pages_per_group: int | None = None,
+    concurrency: int | None = None,
+    model: Model = "sonnet",
+    on_done: OnDone | None = None,
+) -> list[PageGroup]:
+    """Markdown per page group, from page text separated by form feeds."""
+    command = Commands.map_pdf_to_md
+    template = command.template
+    size = pages_per_group or declared_int(template, "PAGE_GROUP_SIZE", PAGES_PER_GROUP)
+    chunks = page_chunks(text, size)
+
+    async def convert(chunk: Chunk) -> str:
+        answer = await command.aask(
+            f"Run map-page-group only, for pages {chunk.start}-{chunk.end}, from "
+            "their extracted text below (pages are separated by form feeds): do "
+            "not read files or dispatch agents. Respond with a single ````md "
+            "block (four backticks), pages joined by a --- line.",
+            model=model,
+            pages=chunk.text,
+        )
+        return fenced(answer, "md")
+
+    mds = await map_chunks(
+        chunks,
+        convert,
+        key=_task_key(command, model),
+        concurrency=concurrency
+        or declared_int(template, "N_MAX_CONCURRENT_FLOW", CONCURRENCY),
+        on_done=on_done,
+    )
+    return [PageGroup(c.start, c.end, md) for c, md in zip(chunks, mds, strict=True)]
+
+
+def write_page_groups(groups: Sequence[PageGroup], out: Path) -> Path:
+    """One file per page group plus an ``index.md`` linking them in order."""
+    for g in groups:
+        write_atomic(out / g.name, g.markdown)
+    index = "".join(f"- [Pages {g.start}-{g.end}]({g.name})\n" for g in groups)
+    write_atomic(out / "index.md", index)
+    return out / "index.md"
@@ -0,0 +1,247 @@
+"""Contract fences in markdown: ```{lang}:{contract}[:{diff}] code blocks.
+
+Only lines containing a run of three backticks can open or close a fence,
+so parsing first finds those lines with ``str.find`` and runs the fence
+regex on them alone. A :class:`Layouts` cache keeps each file's fence lines
+and, on the next version, re-scans only the lines between the unchanged
+prefix and suffix, shifting the fence lines after the edit.
+"""
+
+import mmap
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Self
+
+TICKS = "```"
+RE_FENCE = re.compile(
+    r"^(?P<indent>\s*)"
+    r"(?P<ticks>`{3,})"
+    r"(?P<lang>[a-z]+):(?P<contract>[a-z][a-z0-9]*(?:-[a-z0-9]+)*)"
+    r"(?=[:\s]|$)"
+    r"(?::(?P<diff>\d+))?"
+    r"(?P<rest>.*)$",
+)
+RE_FLOW = re.compile(
+    r"^(?P<indent>\s*)"
+    r"(?P<ticks>`{3,})"
+    r"(?P<lang>flow):(?P<contract>[a-z][a-z0-9]*(?:-[a-z0-9]+)*)"
+    r"\((?P<params>[^()]*)\)\s*$",
+)
+"""Openers of ``flow:{name}({params})`` fences; see :mod:`guide.flow`."""
+
+
+@dataclass
+class Block:
+    contract: str
+    lang: str
+    body: str
+    fence_idx: int
+    ticks: str
+    start: int = 0
+    """Offset of the opening fence line."""
+    end: int = 0
+    """Offset just past the opening fence line, before its newline."""
+    diff: int = 0
+    """The fence's ``:{diff}`` suffix, 0 when absent."""
+    params: str = ""
+    """Parameter list of a ``flow:`` fence."""
+
+
+@dataclass(slots=True)
+class FenceLine:
+    """A line that may open a contract fence or close any fence."""
+
+    line: int
+    start: int
+    end: int
+    ticks: str = ""
+    lang: str = ""
+    contract: str = ""
+    diff: int = 0
+    close: int = 0
+    """Backtick count if the stripped line is only backticks, else 0."""
+    params: str = ""
+
+    @classmethod
+    def classify(
+        cls, text: str, line: int, start: int, pattern: re.Pattern[str] = RE_FENCE
+    ) -> Self | None:
+        s = text.strip()
+        close = len(s) if s and not s.replace("`", "") else 0
+        m = pattern.match(text)
+        if m is None and not close:
+            return None
+        return cls(
+            line,
+            start,
+            start + len(text),
+            *((m["ticks"], m["lang"], m["contract"]) if m else ("", "", "")),
+            int(m["diff"]) if m and m.groupdict().get("diff") else 0,
+            close,
+            (m.groupdict().get("params") or "") if m else "",
+        )
+
+    def shifted(self, lines: int, chars: int) -> Self:
+        return type(self)(
+            self.line + lines,
+            self.start + chars,
+            self.end + chars,
+            self.ticks,
+            self.lang,
+            self.contract,
+            self.diff,
+            self.close,
+            self.params,
+        )
+
+
+def scan(
+    content: str,
+    lo: int = 0,
+    hi: int | None = None,
+    line: int = 0,
+    *,
+    pattern: re.Pattern[str] = RE_FENCE,
+) -> list[FenceLine]:
+    """Fence lines among the lines in ``content[lo:hi]``; ``lo`` starts line ``line``."""
+    hi = len(content) if hi is None else hi
+    found: list[FenceLine] = []
+    pos = last = lo
+    while (i := content.find(TICKS, pos, hi)) >= 0:
+        start = content.rfind("\n", lo, i) + 1 or lo
+        end = content.find("\n", i)
+        end = len(content) if end < 0 else end
+        line += content.count("\n", last, start)
+        last = start
+        if fl := FenceLine.classify(content[start:end], line, start, pattern):
+            found.append(fl)
+        pos = end + 1
+    return found
+
+
+def pair(content: str, fences: list[FenceLine]) -> list[Block]:
+    """Match openers to closers; duplicate contracts: last occurrence wins."""
+    blocks: list[Block] = []
+    opened: FenceLine | None = None
+
+    def close(o: FenceLine, body_end: int) -> None:
+        body = content[o.end + 1 : body_end] if o.end < len(content) else ""
+        blocks.append(
+            Block(
+                o.contract,
+                o.lang,
+                body,
+                o.line,
+                o.ticks,
+                o.start,
+                o.end,
+                o.diff,
+                o.params,
+            )
+        )
+
+    for fl in fences:
+        if opened is None:
+            if fl.contract:
+                opened = fl
+        elif fl.close >= len(opened.ticks):
+            close(opened, fl.start - 1)
+            opened = None
+    if opened is not None:
+        close(opened, len(content))
+    by_name = {b.contract: b for b in blocks}
+    return sorted(by_name.values(), key=lambda b: b.fence_idx)
+
+
+def parse_contracts(content: str) -> list[Block]:
+    return pair(content, scan(content))
+
+
+def parse_flows(content: str) -> list[Block]:
+    """``flow:`` fences, with their parameter lists."""
+    return pair(content, scan(content, pattern=RE_FLOW))
+
+
+def _common_prefix(a: str, b: str) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid :] == b[len(b) - mid :]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+@dataclass
+class Layout:
+    content: str
+    fences: list[FenceLine]
+
+    @classmethod
+    def parse(cls, content: str) -> Self:
+        return cls(content, scan(content))
+
+    def update(self, new: str) -> None:
+        """Re-scan only the lines that differ from the previous version."""
+        old = self.content
+        if new == old:
+            return
+        p = _common_prefix(old, new)
+        s = _common_suffix(old, new, min(len(old), len(new)) - p)
+        lo = old.rfind("\n", 0, p) + 1
+        old_hi = old.find("\n", len(old) - s)
+        old_hi = len(old) if old_hi < 0 else old_hi
+        delta = len(new) - len(old)
+        new_hi = old_hi + delta
+        line_delta = new.count("\n", lo, new_hi) - old.count("\n", lo, old_hi)
+        before = [f for f in self.fences if f.start < lo]
+        after = [f.shifted(line_delta, delta) for f in self.fences if f.start > old_hi]
+        if before:
+            line = before[-1].line + new.count("\n", before[-1].start, lo)
+        else:
+            line = new.count("\n", 0, lo)
+        self.fences = [*before, *scan(new, lo, new_hi, line), *after]
+        self.content = new
+
+
+@dataclass
+class Layouts:
+    """Per-file fence layouts, updated incrementally as each file changes."""
+
+    files: dict[str, Layout] = field(default_factory=dict[str, Layout])
+
+    def parse(self, key: str, content: str) -> list[Block]:
+        layout = self.files.get(key)
+        if layout is None:
+            layout = self.files[key] = Layout.parse(content)
+        else:
+            layout.update(content)
+        return pair(content, layout.fences)
+
+    def forget(self, key: str) -> None:
+        self.files.pop(key, None)
+
+
+def has_fences(path: Path) -> bool:
+    """Whether the file contains a fence marker at all, without reading it in."""
+    try:
+        with (
+            path.open("rb") as f,
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm,
+        ):
+            return mm.find(TICKS.encode()) >= 0
+    except (OSError, ValueError):  # ValueError: empty file
+        return False
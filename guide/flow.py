@@ -0,0 +1,761 @@
+"""Run the ``flow:`` fences of a command file.
+
+Command files sketch their mechanics as ```` ```flow:name(params) ````
+fences: one statement per line, in a Python-like dialect with hyphenated
+operation names (``load-or-infer-schema(...)``), ``$VAR`` references,
+``x ← expr`` assignments, ``() => expr`` thunks and ``bash`...``` commands.
+:func:`parse_flows` rewrites a fence into Python and parses it with
+:mod:`ast`; each statement becomes a :class:`Step` that depends on the
+earlier steps writing the names it reads.
+
+A :class:`Runner` starts every step of a flow at once and lets each wait
+for its dependencies, so independent steps overlap. ``map(items, fn)``
+fans out over ``items`` at most ``concurrency`` at a time. A call resolves
+to another flow of the file, a builtin, an op the caller registered, and
+else to the ``fallback`` (an LLM asked to perform just that operation,
+under :func:`run_command`). Flow parameters that are not passed are looked
+up in the caller's scope, so ``map(chunks, process-chunk)`` reaches the
+``schema`` of ``main``.
+
+Step values are checkpointed as JSON by the hash of the step and the
+values it reads, so a rerun after a failure picks up where the last run
+stopped; a checkpointed value is passed on as read back from JSON on the
+first run too (tuples as lists), so reruns see the same types. Steps that
+run ``bash``, directly or through a flow, are always rerun: their output
+depends on more than their inputs. Flow values reach ``bash`` through its
+environment, never pasted into the command.
+"""
+
+import ast
+import asyncio
+import hashlib
+import json
+import os
+import re
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, cast
+
+from guide.chunkmap import CONCURRENCY
+from guide.fences import parse_flows as parse_fences
+from guide.llm import Model
+from guide.paths import Commands, cache_dir, write_atomic
+from guide.prompts import declared_int, declared_ints, fenced
+
+type Op = Callable[..., Awaitable[Any]]
+type Fallback = Callable[[str, tuple[Any, ...], dict[str, Any]], Awaitable[Any]]
+"""Performs an operation nothing else defines: (name, args, kwargs)."""
+type Param = str | tuple[str, ...]
+"""A parameter name, or names to destructure a sequence into."""
+
+
+class FlowError(RuntimeError):
+    pass
+
+
+# ── parsing ──────────────────────────────────────────────────────────
+
+_NESTED = re.compile(r"^(`{3,})[^\n]*\n(.*?)\n\1(?!`)", re.DOTALL | re.MULTILINE)
+_BASH = re.compile(r"\bbash`([^`]*)`")
+_STRING = re.compile(r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')""")
+_VAR = re.compile(r"\$\{(\w+)\}|\$(\w+)")
+_ARROW = re.compile(r"\(([\w\s,]*)\)\s*=>")
+_HYPHENATED = re.compile(r"(?<![\w.])[A-Za-z_]\w*(?:-[A-Za-z_]\w*)+")
+
+
+def identifier(name: str) -> str:
+    """Python spelling of a flow or operation name: ``a-b`` is ``a_b``."""
+    return name.replace("-", "_")
+
+
+def normalize(source: str, spelled: dict[str, str] | None = None) -> str:
+    """Python source for a flow body; hyphenated names go into ``spelled``.
+
+    Nested fences become string literals, as do ``bash`...``` commands,
+    whose ``$VAR`` references are filled in when they run.
+    Subtraction needs spaces: ``a-b`` is a name.
+    """
+    spelled = {} if spelled is None else spelled
+
+    def name(m: re.Match[str]) -> str:
+        spelled[identifier(m.group())] = m.group()
+        return identifier(m.group())
+
+    source = _NESTED.sub(lambda m: repr(m.group(2)), source)
+    source = _BASH.sub(lambda m: f"bash({m.group(1)!r})", source)
+    parts = _STRING.split(source)
+    for i in range(0, len(parts), 2):  # code between string literals
+        code = parts[i].replace("←", "=")
+        code = _ARROW.sub(r"lambda \1:", code)
+        code = _VAR.sub(lambda m: m.group(1) or m.group(2), code)
+        parts[i] = _HYPHENATED.sub(name, code)
+    return "".join(parts)
+
+
+@dataclass(frozen=True)
+class Step:
+    index: int
+    source: str
+    """The statement, normalized."""
+    node: ast.stmt
+    reads: frozenset[str]
+    writes: tuple[str, ...]
+    deps: tuple[int, ...]
+    """Earlier steps that last wrote a name this one reads."""
+
+
+@dataclass(frozen=True)
+class Flow:
+    name: str
+    params: tuple[Param, ...]
+    steps: tuple[Step, ...]
+    line: int
+    """Line of the opening fence, 0-based."""
+    spelled: dict[str, str] = field(default_factory=dict[str, str])
+    """Hyphenated names in the flow, by their Python spelling."""
+
+
+def _names(node: ast.AST) -> set[str]:
+    """Free names read in ``node``; comprehension and lambda variables are bound."""
+    bound: set[str] = set()
+    for sub in ast.walk(node):
+        if isinstance(sub, ast.comprehension):
+            bound |= {n.id for n in ast.walk(sub.target) if isinstance(n, ast.Name)}
+        elif isinstance(sub, ast.Lambda):
+            bound |= {a.arg for a in sub.args.args}
+    return {
+        n.id
+        for n in ast.walk(node)
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)
+    } - bound
+
+
+def _targets(node: ast.stmt) -> tuple[str, ...]:
+    if not isinstance(node, ast.Assign):
+        return ()
+    return tuple(
+        n.id
+        for t in node.targets
+        for n in ast.walk(t)
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)
+    )
+
+
+def _param(node: ast.expr) -> Param:
+    match node:
+        case ast.Name(id=name):
+            return name
+        case ast.List(elts=elts) | ast.Tuple(elts=elts) if all(
+            isinstance(e, ast.Name) for e in elts
+        ):
+            return tuple(e.id for e in elts if isinstance(e, ast.Name))
+        case _:
+            raise FlowError(f"bad parameter: {ast.unparse(node)}")
+
+
+def parse_flow(name: str, params: str, body: str, line: int = 0) -> Flow:
+    spelled: dict[str, str] = {}
+    try:
+        source = normalize(body, spelled)
+        tree = ast.parse(source)
+        spec = ast.parse(
+            f"({normalize(params)},)" if params.strip() else "()", mode="eval"
+        )
+    except SyntaxError as e:
+        raise FlowError(f"flow {name} (line {line + (e.lineno or 0)}): {e.msg}") from e
+    assert isinstance(spec.body, ast.Tuple)
+    steps: list[Step] = []
+    for i, node in enumerate(tree.body):
+        if not isinstance(node, ast.Assign | ast.Expr | ast.Assert):
+            raise FlowError(
+                f"flow {name} (line {line + node.lineno}): "
+                f"{type(node).__name__.lower()} statements are not supported"
+            )
+        source_text = ast.get_source_segment(source, node) or ast.unparse(node)
+        steps.append(
+            Step(i, source_text, node, frozenset(_names(node)), _targets(node), ())
+        )
+    return Flow(
+        name,
+        tuple(_param(p) for p in spec.body.elts),
+        _link(steps),
+        line,
+        spelled,
+    )
+
+
+def _link(steps: Sequence[Step]) -> tuple[Step, ...]:
+    """``steps`` with their dependencies on earlier writers filled in."""
+    writer: dict[str, int] = {}
+    linked: list[Step] = []
+    for step in steps:
+        deps = tuple(sorted({writer[n] for n in step.reads if n in writer}))
+        linked.append(replace(step, deps=deps))
+        writer |= dict.fromkeys(step.writes, step.index)
+    return tuple(linked)
+
+
+def _param_names(flow: Flow) -> set[str]:
+    return {n for p in flow.params for n in ((p,) if isinstance(p, str) else p)}
+
+
+def parse_flows(content: str) -> dict[str, Flow]:
+    """The ``flow:`` fences of a command file, by name.
+
+    A step that calls or passes a flow also reads what that flow may look
+    up in its caller's scope (its parameters and free names), so it waits
+    for the steps that write them.
+    """
+    flows = {
+        identifier(b.contract): parse_flow(b.contract, b.params, b.body, b.fence_idx)
+        for b in parse_fences(content)
+    }
+    needs: dict[str, set[str]] = {}
+
+    def needed(name: str) -> set[str]:
+        if name not in needs:
+            needs[name] = set()  # cycles contribute nothing more
+            flow = flows[name]
+            reads = _param_names(flow).union(*(s.reads for s in flow.steps))
+            for ref in reads & flows.keys():
+                reads |= needed(ref)
+            needs[name] = reads - {n for s in flow.steps for n in s.writes}
+        return needs[name]
+
+    for key, flow in flows.items():
+        steps = [
+            replace(s, reads=s.reads.union(*map(needed, s.reads & flows.keys())))
+            for s in flow.steps
+        ]
+        flows[key] = replace(flow, steps=_link(steps))
+    return {f.name: f for f in flows.values()}
+
+
+# ── evaluation ───────────────────────────────────────────────────────
+
+
+@dataclass
+class _Scope:
+    values: dict[str, Any]
+    parent: "_Scope | None" = None
+
+    def get(self, name: str) -> tuple[bool, Any]:
+        scope: _Scope | None = self
+        while scope is not None:
+            if name in scope.values:
+                return True, scope.values[name]
+            scope = scope.parent
+        return False, None
+
+
+def _range(*args: Any) -> list[int]:
+    r = range(*(int(a) for a in args))
+    if len(r) > 100_000:
+        raise FlowError(f"range of {len(r)} items")
+    return list(r)
+
+
+def _first(items: Sequence[Any]) -> Any:
+    return items[0]
+
+
+def _last(items: Sequence[Any]) -> Any:
+    return items[-1]
+
+
+def _join(items: Sequence[Any], sep: str = "\n") -> str:
+    return sep.join(map(str, items))
+
+
+BUILTINS: dict[str, Callable[..., Any]] = {
+    "len": len,
+    "str": str,
+    "int": int,
+    "min": min,
+    "max": max,
+    "sum": sum,
+    "sorted": sorted,
+    "list": list,
+    "range": _range,
+    "first": _first,
+    "last": _last,
+    "join": _join,
+}
+"""Plain functions callable from a flow, besides ``map`` and ``bash``."""
+VOLATILE = frozenset({"bash"})
+"""Operations whose result is not a function of their arguments."""
+
+_BINOPS: dict[type[ast.operator], Callable[[Any, Any], Any]] = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+}
+_COMPARE: dict[type[ast.cmpop], Callable[[Any, Any], bool]] = {
+    ast.Eq: lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+    ast.Lt: lambda a, b: a < b,
+    ast.LtE: lambda a, b: a <= b,
+    ast.Gt: lambda a, b: a > b,
+    ast.GtE: lambda a, b: a >= b,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+}
+_LEADING_INT = re.compile(r"\s*(-?\d+)(?:\s[^\n]*)?\s*")
+
+
+def _scalar(value: Any) -> bool:
+    return isinstance(value, str | int | float) and not isinstance(value, bool)
+
+
+_REFERENCE = {"": '"${{{}}}"', '"': "${{{}}}", "'": "'\"${{{}}}\"'"}
+"""How a flow value is referenced outside quotes, in double and in single quotes."""
+
+
+def _expand(command: str, scope: _Scope) -> tuple[str, dict[str, str]]:
+    """``command`` referencing flow values as quoted variables, and their values.
+
+    Each ``$VAR`` the flow binds becomes a double-quoted ``"${VAR}"`` (closing
+    and reopening single quotes around it), so the shell expands the value as
+    one word and never parses it; other ``$VAR`` are left to the shell.
+    """
+    out: list[str] = []
+    env: dict[str, str] = {}
+    quote = ""
+    i = 0
+    while i < len(command):
+        c = command[i]
+        if c == "\\" and quote != "'":
+            out.append(command[i : i + 2])
+            i += 2
+            continue
+        if c in "'\"" and quote in ("", c):
+            quote = "" if quote else c
+        elif c == "$" and (m := _VAR.match(command, i)):
+            name = m.group(1) or m.group(2)
+            found, value = scope.get(name)
+            if found and _scalar(value):
+                env[name] = str(value)
+                out.append(_REFERENCE[quote].format(name))
+                i = m.end()
+                continue
+        out.append(c)
+        i += 1
+    return "".join(out), env
+
+
+async def _bash(command: str, scope: _Scope) -> str | int:
+    """Stdout of ``command``; a one-line answer led by an integer (``wc -l``) is it."""
+    script, env = _expand(command, scope)
+    proc = await asyncio.create_subprocess_exec(
+        "bash",
+        "-c",
+        script,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=os.environ | env,
+    )
+    out, err = await proc.communicate()
+    if proc.returncode:
+        raise FlowError(f"bash `{command}` exited {proc.returncode}: {err.decode()}")
+    text = out.decode()
+    if m := _LEADING_INT.fullmatch(text):
+        return int(m.group(1))
+    return text
+
+
+@dataclass
+class Runner:
+    """Executes the flows of one command file."""
+
+    flows: dict[str, Flow]
+    variables: dict[str, Any] = field(default_factory=dict[str, Any])
+    """Globals such as ``TARGET_PATH``."""
+    ops: dict[str, Op] = field(default_factory=dict[str, Op])
+    """Async operations by name; hyphenated names are fine."""
+    fallback: Fallback | None = None
+    concurrency: int = CONCURRENCY
+    """Items a ``map`` runs at once."""
+    checkpoints: Path | None = None
+    """Where step values are kept, by default the user cache dir."""
+    key: str = ""
+    """Names the task in checkpoints, e.g. the hash of the command file."""
+    hits: int = 0
+    runs: int = 0
+
+    def __post_init__(self) -> None:
+        self.flows = {identifier(n): f for n, f in self.flows.items()}
+        self.ops = {identifier(n): op for n, op in self.ops.items()}
+        self._globals = _Scope(dict(self.variables))
+        self._volatile: dict[str, bool] = {}
+
+    async def call(self, flow: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._call_flow(identifier(flow), args, kwargs, self._globals)
+
+    # ── flows and steps ──
+
+    def _spelling(self, name: str) -> str:
+        for f in self.flows.values():
+            if name in f.spelled:
+                return f.spelled[name]
+        return name
+
+    def _flow_is_volatile(self, name: str) -> bool:
+        if name not in self._volatile:
+            self._volatile[name] = True  # until proven otherwise, also for cycles
+            flow = self.flows[name]
+            self._volatile[name] = any(self._is_volatile(s) for s in flow.steps)
+        return self._volatile[name]
+
+    def _is_volatile(self, step: Step) -> bool:
+        names = {n.id for n in ast.walk(step.node) if isinstance(n, ast.Name)}
+        return any(
+            n in VOLATILE or (n in self.flows and self._flow_is_volatile(n))
+            for n in names
+        )
+
+    def _bind(
+        self, flow: Flow, args: tuple[Any, ...], kwargs: dict[str, Any]
+    ) -> dict[str, Any]:
+        if len(args) > len(flow.params):
+            raise FlowError(
+                f"{flow.name} takes {len(flow.params)} arguments, got {len(args)}"
+            )
+        values: dict[str, Any] = {}
+        for param, arg in zip(flow.params, args, strict=False):
+            if isinstance(param, str):
+                values[param] = arg
+            elif len(arg) != len(param):
+                raise FlowError(
+                    f"{flow.name}: cannot unpack {arg!r} into {list(param)}"
+                )
+            else:
+                values |= dict(zip(param, arg, strict=True))
+        return values | kwargs
+
+    async def _call_flow(
+        self, name: str, args: tuple[Any, ...], kwargs: dict[str, Any], caller: _Scope
+    ) -> Any:
+        flow = self.flows[name]
+        scope = _Scope(self._bind(flow, args, kwargs), caller)
+        tasks: list[asyncio.Future[Any]] = []
+
+        async def run(step: Step) -> Any:
+            await asyncio.gather(*(tasks[d] for d in step.deps))
+            return await self._step(flow, step, scope)
+
+        tasks.extend(asyncio.ensure_future(run(s)) for s in flow.steps)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for r in results:
+            if isinstance(r, BaseException):
+                raise r
+        return results[-1] if results else None
+
+    def _checkpoint(self, flow: Flow, step: Step, scope: _Scope) -> Path | None:
+        if self._is_volatile(step):
+            return None
+        inputs: dict[str, Any] = {}
+        for name in sorted(step.reads):
+            found, value = scope.get(name)
+            if found:
+                inputs[name] = value
+        try:
+            ident = json.dumps(
+                [self.key, flow.name, step.source, inputs], sort_keys=True
+            )
+        except TypeError:  # thunks and other values without a stable form
+            return None
+        digest = hashlib.sha256(ident.encode()).hexdigest()
+        root = cache_dir("flow") if self.checkpoints is None else self.checkpoints
+        return root / digest[:2] / f"{digest[2:32]}.json"
+
+    async def _step(self, flow: Flow, step: Step, scope: _Scope) -> Any:
+        path = self._checkpoint(flow, step, scope)
+        if path is not None and path.exists():
+            value = json.loads(path.read_text())["value"]
+            self.hits += 1
+        else:
+            try:
+                value = await self._exec(step.node, scope)
+            except FlowError as e:
+                raise FlowError(f"{flow.name}: {step.source}: {e}") from e
+            self.runs += 1
+            if path is not None:
+                try:
+                    text = json.dumps({"value": value})
+                except (TypeError, ValueError):  # thunks and the like
+                    pass
+                else:
+                    write_atomic(path, text)
+                    value = json.loads(text)["value"]  # as a rerun will see it
+        if isinstance(step.node, ast.Assign):
+            for target in step.node.targets:
+                _assign(target, value, scope)
+        return value
+
+    async def _exec(self, node: ast.stmt, scope: _Scope) -> Any:
+        match node:
+            case ast.Assign(value=value) | ast.Expr(value=value):
+                return await self._eval(value, scope)
+            case ast.Assert(test=test):
+                if not await self._eval(test, scope):
+                    raise FlowError("assertion failed")
+                return None
+            case _:
+                raise FlowError(f"cannot run {ast.unparse(node)}")
+
+    # ── expressions ──
+
+    def _resolve(self, name: str, scope: _Scope) -> Op | None:
+        if name in self.flows:
+            return lambda *a, **kw: self._call_flow(name, a, kw, scope)
+        if name in self.ops:
+            return self.ops[name]
+        if name == "map":
+            return self._map
+        if name == "bash":
+
+            async def bash(command: str) -> str | int:
+                return await _bash(command, scope)
+
+            return bash
+        if name in BUILTINS:
+            fn = BUILTINS[name]
+
+            async def builtin(*a: Any, **kw: Any) -> Any:
+                return fn(*a, **kw)
+
+            return builtin
+        return None
+
+    async def _map(self, items: Sequence[Any], fn: Op) -> list[Any]:
+        sem = asyncio.Semaphore(self.concurrency)
+
+        async def one(item: Any) -> Any:
+            async with sem:
+                return await fn(item)
+
+        results = await asyncio.gather(*map(one, items), return_exceptions=True)
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if failed:
+            raise FlowError(
+                f"{len(failed)} of {len(items)} map items failed, first: {failed[0]!r}"
+            ) from failed[0]
+        return results
+
+    async def _call(self, node: ast.Call, scope: _Scope) -> Any:
+        args = [await self._eval(a, scope) for a in node.args]
+        kwargs = {
+            k.arg: await self._eval(k.value, scope) for k in node.keywords if k.arg
+        }
+        match node.func:
+            case ast.Name(id=name):
+                found, value = scope.get(name)
+                fn = (
+                    cast("Op", value)
+                    if found and callable(value)
+                    else self._resolve(name, scope)
+                )
+                if fn is not None:
+                    return await fn(*args, **kwargs)
+                if self.fallback is not None:
+                    return await self.fallback(
+                        self._spelling(name), tuple(args), kwargs
+                    )
+                raise FlowError(f"undefined operation {self._spelling(name)}")
+            case _:
+                raise FlowError(
+                    f"only named operations can be called: {ast.unparse(node)}"
+                )
+
+    async def _eval(self, node: ast.expr, scope: _Scope) -> Any:
+        match node:
+            case ast.Constant(value=value):
+                return value
+            case ast.Name(id=name):
+                return self._name(name, scope)
+            case ast.List() | ast.Tuple() | ast.Dict():
+                return await self._collection(node, scope)
+            case (
+                ast.BinOp() | ast.UnaryOp() | ast.BoolOp() | ast.Compare() | ast.IfExp()
+            ):
+                return await self._operation(node, scope)
+            case ast.Subscript() | ast.Slice() | ast.Attribute():
+                return await self._access(node, scope)
+            case ast.Call():
+                return await self._call(node, scope)
+            case ast.ListComp(elt=elt, generators=generators):
+                return await self._comprehension(elt, list(generators), scope)
+            case ast.Lambda(args=args, body=body):
+                return self._thunk([a.arg for a in args.args], body, scope)
+            case _:
+                raise FlowError(f"unsupported expression {ast.unparse(node)}")
+
+    def _name(self, name: str, scope: _Scope) -> Any:
+        found, value = scope.get(name)
+        if found:
+            return value
+        if (fn := self._resolve(name, scope)) is not None:
+            return fn
+        raise FlowError(f"undefined name {self._spelling(name)}")
+
+    async def _collection(self, node: ast.expr, scope: _Scope) -> Any:
+        match node:
+            case ast.List(elts=elts):
+                return [await self._eval(e, scope) for e in elts]
+            case ast.Tuple(elts=elts):
+                return tuple([await self._eval(e, scope) for e in elts])
+            case ast.Dict(keys=keys, values=values):
+                return {
+                    await self._eval(k, scope): await self._eval(v, scope)
+                    for k, v in zip(keys, values, strict=True)
+                    if k is not None
+                }
+            case _:
+                raise FlowError(f"unsupported expression {ast.unparse(node)}")
+
+    async def _operation(self, node: ast.expr, scope: _Scope) -> Any:
+        match node:
+            case ast.BinOp(left=left, op=op, right=right) if type(op) in _BINOPS:
+                return _BINOPS[type(op)](
+                    await self._eval(left, scope), await self._eval(right, scope)
+                )
+            case ast.UnaryOp(op=ast.USub(), operand=operand):
+                return -(await self._eval(operand, scope))
+            case ast.UnaryOp(op=ast.Not(), operand=operand):
+                return not await self._eval(operand, scope)
+            case ast.BoolOp(op=op, values=values):
+                result: Any = None
+                for v in values:
+                    result = await self._eval(v, scope)
+                    if bool(result) != isinstance(op, ast.And):
+                        break
+                return result
+            case ast.Compare():
+                return await self._compare(node, scope)
+            case ast.IfExp(test=test, body=body, orelse=orelse):
+                return await self._eval(
+                    body if await self._eval(test, scope) else orelse, scope
+                )
+            case _:
+                raise FlowError(f"unsupported operation {ast.unparse(node)}")
+
+    async def _compare(self, node: ast.Compare, scope: _Scope) -> bool:
+        a = await self._eval(node.left, scope)
+        for op, right in zip(node.ops, node.comparators, strict=True):
+            if type(op) not in _COMPARE:
+                raise FlowError(f"unsupported comparison {ast.unparse(node)}")
+            b = await self._eval(right, scope)
+            if not _COMPARE[type(op)](a, b):
+                return False
+            a = b
+        return True
+
+    async def _access(self, node: ast.expr, scope: _Scope) -> Any:
+        match node:
+            case ast.Subscript(value=value, slice=index):
+                return (await self._eval(value, scope))[await self._eval(index, scope)]
+            case ast.Slice(lower=lower, upper=upper, step=step):
+                return slice(
+                    *[
+                        None if p is None else await self._eval(p, scope)
+                        for p in (lower, upper, step)
+                    ]
+                )
+            case ast.Attribute(value=value, attr=attr) if not attr.startswith("_"):
+                obj = await self._eval(value, scope)
+                if isinstance(obj, dict):
+                    return cast("dict[str, Any]", obj)[attr]
+                return getattr(obj, attr)
+            case _:
+                raise FlowError(f"unsupported expression {ast.unparse(node)}")
+
+    def _thunk(self, names: list[str], body: ast.expr, scope: _Scope) -> Op:
+        async def thunk(*values: Any) -> Any:
+            inner = _Scope(dict(zip(names, values, strict=True)), scope)
+            return await self._eval(body, inner)
+
+        return thunk
+
+    async def _comprehension(
+        self, elt: ast.expr, generators: list[ast.comprehension], scope: _Scope
+    ) -> list[Any]:
+        if not generators:
+            return [await self._eval(elt, scope)]
+        gen, rest = generators[0], generators[1:]
+        out: list[Any] = []
+        for item in await self._eval(gen.iter, scope):
+            inner = _Scope({}, scope)
+            _assign(gen.target, item, inner)
+            if all([await self._eval(c, inner) for c in gen.ifs]):
+                out += await self._comprehension(elt, rest, inner)
+        return out
+
+
+def _assign(target: ast.expr, value: Any, scope: _Scope) -> None:
+    match target:
+        case ast.Name(id=name):
+            scope.values[name] = value
+        case ast.Tuple(elts=elts) | ast.List(elts=elts):
+            values = list(value)
+            if len(values) != len(elts):
+                raise FlowError(
+                    f"cannot unpack {len(values)} values into {ast.unparse(target)}"
+                )
+            for t, v in zip(elts, values, strict=True):
+                _assign(t, v, scope)
+        case _:
+            raise FlowError(f"cannot assign to {ast.unparse(target)}")
+
+
+# ── commands ─────────────────────────────────────────────────────────
+
+
+def ask_fallback(command: Commands, model: Model, concurrency: int) -> Fallback:
+    """Ask the LLM to perform one operation with the command's prompt as context."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def ask(name: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        details = {f"argument {i + 1}": a for i, a in enumerate(args)} | kwargs
+        async with sem:
+            answer = await command.aask(
+                f"Perform only the operation `{name}` of this command, on the "
+                "arguments below: do not read files or dispatch agents. Respond "
+                "with its result alone, in a single fenced block. Do not hallucinate.",
+                model=model,
+                **details,
+            )
+        return fenced(answer)
+
+    return ask
+
+
+async def run_command(
+    command: Commands,
+    variables: dict[str, Any],
+    *,
+    entry: str = "main",
+    ops: dict[str, Op] | None = None,
+    model: Model = "sonnet",
+    checkpoints: Path | None = None,
+) -> Any:
+    """Run the ``entry`` flow of ``command``, asking the LLM for undefined operations.
+
+    ``map`` fans out up to ``N_MAX_CONCURRENT_FLOW`` items and LLM calls are
+    capped at ``N_MAX_CONCURRENT_AGENT``, as the command declares.
+    """
+    template = command.template
+    agents = declared_int(template, "N_MAX_CONCURRENT_AGENT", CONCURRENCY)
+    runner = Runner(
+        parse_flows(template.body),
+        declared_ints(template) | variables,
+        ops or {},
+        ask_fallback(command, model, agents),
+        concurrency=declared_int(template, "N_MAX_CONCURRENT_FLOW", agents),
+        checkpoints=checkpoints,
+        key=hashlib.sha256(f"{model}\0{template.body}".encode()).hexdigest(),
+    )
+    return await runner.call(entry)
@@ -0,0 +1,177 @@
+"""Append-only, columnar history of test results across runs.
+
+Each ingested run appends one row per test to flat binary column files
+(``node.i4``, ``run.i4``, ``status.i1``, ``duration.f8``, ``ts.f8``); nodeids
+are interned in ``nodeids.txt``. Loading is a handful of ``np.fromfile``
+calls and every query is vectorized over a (tests x window) matrix, so
+thousands of runs stay cheap.
+"""
+
+import warnings
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Self
+
+import numpy as np
+
+from guide.lang import TestResult
+from guide.paths import RESULTS_DIR
+
+HISTORY_DIR = RESULTS_DIR / "history"
+NODEIDS_FILE = "nodeids.txt"
+COLUMNS = {
+    "node": np.int32,
+    "run": np.int32,
+    "status": np.int8,
+    "duration": np.float64,
+    "ts": np.float64,
+}
+PASSED, FAILED = 1, 0
+DEFAULT_WINDOW = 20
+MAD_K = 3.0
+MIN_MAD_SECONDS = 1e-3
+"""Floor for the MAD so near-constant fast tests don't flag on jitter."""
+
+
+def _read_column(path: Path, dtype: type[np.generic]) -> np.ndarray:
+    """A column file's rows; none if a crash came before it was first written."""
+    try:
+        return np.fromfile(path, dtype)
+    except FileNotFoundError:
+        return np.empty(0, dtype)
+
+
+@dataclass
+class History:
+    dir: Path
+    nodeids: list[str] = field(default_factory=list[str])
+    node: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    run: np.ndarray = field(default_factory=lambda: np.empty(0, np.int32))
+    status: np.ndarray = field(default_factory=lambda: np.empty(0, np.int8))
+    duration: np.ndarray = field(default_factory=lambda: np.empty(0, np.float64))
+    ts: np.ndarray = field(default_factory=lambda: np.empty(0, np.float64))
+
+    @classmethod
+    def load(cls, dir: Path = HISTORY_DIR) -> Self:
+        self = cls(dir)
+        names = dir / NODEIDS_FILE
+        if not names.exists():
+            return self
+        self.nodeids = names.read_text().splitlines()
+        cols = {
+            name: _read_column(dir / f"{name}.{np.dtype(dtype).str[1:]}", dtype)
+            for name, dtype in COLUMNS.items()
+        }
+        # a run interrupted mid-append leaves ragged columns; drop its tail here
+        # and on disk at the next ingest
+        n = min(len(c) for c in cols.values())
+        for name, col in cols.items():
+            setattr(self, name, col[:n])
+        return self
+
+    @property
+    def runs(self) -> int:
+        return int(self.run.max()) + 1 if len(self.run) else 0
+
+    def ingest(self, results: Iterable[TestResult], ts: float) -> int:
+        """Append results newer than each test's last row as one run; returns rows added.
+
+        Results without a ``stop`` detail are stamped with ``ts``. Re-ingesting
+        the same (or a merged, partially stale) results file adds nothing.
+        """
+        index = {nodeid: i for i, nodeid in enumerate(self.nodeids)}
+        last = np.full(len(self.nodeids), -np.inf)
+        np.maximum.at(last, self.node, self.ts)
+
+        new_ids: list[str] = []
+        rows: list[tuple[int, int, float, float]] = []
+        for r in results:
+            stamp = float((r.details or {}).get("stop", ts))
+            i = index.get(r.ref)
+            if i is None:
+                i = index[r.ref] = len(index)
+                new_ids.append(r.ref)
+            elif i < len(last) and stamp <= last[i]:
+                continue
+            status = PASSED if r.status == "passed" else FAILED
+            rows.append((i, status, float((r.details or {}).get("duration", 0)), stamp))
+        if not rows:
+            return 0
+
+        node, status, duration, stamps = zip(*rows, strict=True)
+        cols = {
+            "node": np.asarray(node, np.int32),
+            "run": np.full(len(rows), self.runs, np.int32),
+            "status": np.asarray(status, np.int8),
+            "duration": np.asarray(duration, np.float64),
+            "ts": np.asarray(stamps, np.float64),
+        }
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if new_ids:
+            with (self.dir / NODEIDS_FILE).open("a") as f:
+                f.writelines(f"{nodeid}\n" for nodeid in new_ids)
+            self.nodeids.extend(new_ids)
+        for name, col in cols.items():
+            with (self.dir / f"{name}.{col.dtype.str[1:]}").open("ab") as f:
+                # cut any interrupted run's rows so every column ends on the same row
+                f.truncate(len(getattr(self, name)) * col.itemsize)
+                col.tofile(f)
+            setattr(self, name, np.concatenate([getattr(self, name), col]))
+        return len(rows)
+
+    def _matrix(self, values: np.ndarray, window: int) -> np.ndarray:
+        """(tests x window) matrix of each test's last ``window`` values, NaN-padded left."""
+        out = np.full((len(self.nodeids), window), np.nan)
+        if not len(self.node):
+            return out
+        order = np.lexsort((self.run, self.node))
+        node = self.node[order]
+        counts = np.bincount(node, minlength=len(self.nodeids))
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        from_end = counts[node] - 1 - (np.arange(len(node)) - starts[node])
+        keep = from_end < window
+        out[node[keep], window - 1 - from_end[keep]] = values[order][keep]
+        return out
+
+    def rolling_median(self, window: int = DEFAULT_WINDOW) -> np.ndarray:
+        """Median duration per test over its last ``window`` runs."""
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanmedian(self._matrix(self.duration, window), axis=1)
+
+    def flake_rate(self, window: int = DEFAULT_WINDOW) -> np.ndarray:
+        """Fraction of consecutive runs per test whose pass/fail outcome flipped."""
+        m = self._matrix(self.status.astype(np.float64), window)
+        prev, cur = m[:, :-1], m[:, 1:]
+        pairs = ~np.isnan(prev) & ~np.isnan(cur)
+        flips = (pairs & (prev != cur)).sum(axis=1)
+        n = pairs.sum(axis=1)
+        return np.divide(flips, n, out=np.zeros(len(n)), where=n > 0)
+
+    def regressions(self, window: int = DEFAULT_WINDOW, k: float = MAD_K) -> np.ndarray:
+        """Whether each test's latest duration exceeds its prior median by > k·MAD."""
+        m = self._matrix(self.duration, window + 1)
+        latest, prior = m[:, -1], m[:, :-1]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            med = np.nanmedian(prior, axis=1)
+            mad = np.nanmedian(np.abs(prior - med[:, None]), axis=1)
+        mad = np.maximum(mad, MIN_MAD_SECONDS)
+        return np.nan_to_num(latest - med, nan=-np.inf) > k * mad
+
+    def annotate(self, results: Iterable[TestResult], window: int = DEFAULT_WINDOW):
+        """Add median duration, flake rate and regression flags to result details."""
+        index = {nodeid: i for i, nodeid in enumerate(self.nodeids)}
+        median = self.rolling_median(window)
+        flake = self.flake_rate(window)
+        regressed = self.regressions(window)
+        for r in results:
+            if (i := index.get(r.ref)) is None:
+                continue
+            r.details = {
+                **(r.details or {}),
+                "median_duration": f"{median[i]:.6g}",
+                "flake_rate": f"{flake[i]:.3g}",
+                "regressed": str(bool(regressed[i])).lower(),
+            }
@@ -0,0 +1,106 @@
+"""Import dependency graph of a Python package, built from parsed ASTs."""
+
+import ast
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Self
+
+from guide.lang import parse_py, pytest_nodeids, pytest_test_files
+
+SKIP_DIRS = frozenset({"node_modules", "__pycache__", "site-packages"})
+CONFTEST = "conftest.py"
+
+
+def _py_files(base_dir: Path) -> Iterator[Path]:
+    for path in base_dir.rglob("*.py"):
+        rel = path.relative_to(base_dir)
+        if not any(p.startswith(".") or p in SKIP_DIRS for p in rel.parts[:-1]):
+            yield rel
+
+
+def module_names(rel: Path) -> Iterator[str]:
+    """Dotted names a file is importable as, from the base dir and from ``src/``."""
+    parts = rel.with_suffix("").parts
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    if parts:
+        yield ".".join(parts)
+    if len(parts) > 1 and parts[0] == "src":
+        yield ".".join(parts[1:])
+
+
+def _imported(rel: Path, tree: ast.Module) -> Iterator[str]:
+    """Candidate module names referenced by the imports in one module."""
+    package = rel.parent.parts
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                parts = alias.name.split(".")
+                yield from (".".join(parts[:i]) for i in range(1, len(parts) + 1))
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[: len(package) - node.level + 1]
+                parts = [*base, *(node.module or "").split(".")]
+                parts = [p for p in parts if p]
+            else:
+                parts = (node.module or "").split(".")
+            yield from (".".join(parts[:i]) for i in range(1, len(parts) + 1))
+            yield from (".".join([*parts, alias.name]) for alias in node.names)
+
+
+@dataclass
+class ImportGraph:
+    modules: dict[str, Path] = field(default_factory=dict[str, Path])
+    imports: dict[Path, set[Path]] = field(default_factory=dict[Path, set[Path]])
+
+    @classmethod
+    def build(cls, base_dir: Path) -> Self:
+        """Map each package file to the package files it imports."""
+        self = cls()
+        files = list(_py_files(base_dir))
+        for rel in files:
+            for name in module_names(rel):
+                self.modules[name] = rel
+        for rel in files:
+            tree = parse_py(base_dir / rel)
+            if tree is None:
+                self.imports[rel] = set()
+                continue
+            self.imports[rel] = {
+                self.modules[name]
+                for name in _imported(rel, tree)
+                if name in self.modules and self.modules[name] != rel
+            }
+        return self
+
+    def dependents(self, changed: Iterable[Path]) -> set[Path]:
+        """Files that transitively import any changed file, including the changed."""
+        reverse: dict[Path, set[Path]] = {}
+        for src, targets in self.imports.items():
+            for target in targets:
+                reverse.setdefault(target, set()).add(src)
+
+        seen = set(changed)
+        stack = list(seen)
+        while stack:
+            for src in reverse.get(stack.pop(), ()):
+                if src not in seen:
+                    seen.add(src)
+                    stack.append(src)
+        # a conftest applies to every test module below its directory
+        for conftest in [p for p in seen if p.name == CONFTEST]:
+            seen.update(p for p in self.imports if p.is_relative_to(conftest.parent))
+        return seen
+
+
+def affected_tests(base_dir: Path, changed: Iterable[Path]) -> list[str]:
+    """Nodeids of the tests that transitively depend on the changed files."""
+    graph = ImportGraph.build(base_dir)
+    hit = graph.dependents(changed)
+    nodeids: list[str] = []
+    for test_file in pytest_test_files(base_dir):
+        rel = test_file.relative_to(base_dir)
+        if rel in hit and (tree := parse_py(test_file)) is not None:
+            nodeids.extend(pytest_nodeids(rel, tree))
+    return nodeids
@@ -1,44 +1,155 @@
 from __future__ import annotations
 
 import ast
+import heapq
 import json
-from collections.abc import Iterator
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from functools import cache
 from pathlib import Path
 from typing import Literal
 
 from pydantic import BaseModel, Field
 
+from guide import tstest
 from guide.paths import RESULTS_DIR, Preferences
 from guide.utils import inject
 
 type Language = Literal["py", "ts", "md"]
 
 
+@cache
+def _parse_py(path: Path, _mtime_ns: int) -> ast.Module | None:
+    try:
+        return ast.parse(path.read_text())
+    except (SyntaxError, UnicodeDecodeError, OSError):
+        return None
+
+
+def parse_py(path: Path) -> ast.Module | None:
+    """Parse a Python file once per process (per mtime); None if unparsable."""
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return None
+    return _parse_py(path, mtime_ns)
+
+
+def pytest_test_files(base_dir: Path) -> Iterator[Path]:
+    for pattern in ("test_*.py", "*_test.py"):
+        yield from base_dir.rglob(pattern)
+
+
+def pytest_nodeids(rel_path: Path, tree: ast.Module) -> Iterator[str]:
+    """Test nodeids defined in one parsed test module."""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.FunctionDef) and node.name.startswith("test_"):
+            if not any(
+                isinstance(p, ast.ClassDef)
+                for p in ast.walk(tree)
+                if isinstance(body := getattr(p, "body", None), list) and node in body
+            ):
+                yield f"{rel_path}::{node.name}"
+
+        elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef) and item.name.startswith("test_"):
+                    yield f"{rel_path}::{node.name}::{item.name}"
+
+
 def discover_pytest_tests(base_dir: Path) -> Iterator[str]:
     """Discover all pytest test nodeids in a directory via AST parsing."""
-    for pattern in ("test_*.py", "*_test.py"):
-        for test_file in base_dir.rglob(pattern):
-            rel_path = test_file.relative_to(base_dir)
-            try:
-                tree = ast.parse(test_file.read_text())
-            except SyntaxError:
-                continue
-
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef) and node.name.startswith("test_"):
-                    if not any(
-                        isinstance(p, ast.ClassDef)
-                        for p in ast.walk(tree)
-                        if node in getattr(p, "body", [])
-                    ):
-                        yield f"{rel_path}::{node.name}"
-
-                elif isinstance(node, ast.ClassDef) and node.name.startswith("Test"):
-                    for item in node.body:
-                        if isinstance(item, ast.FunctionDef) and item.name.startswith(
-                            "test_"
-                        ):
-                            yield f"{rel_path}::{node.name}::{item.name}"
+    for test_file in pytest_test_files(base_dir):
+        tree = parse_py(test_file)
+        if tree is not None:
+            yield from pytest_nodeids(test_file.relative_to(base_dir), tree)
+
+
+def run_pytest(base_dir: Path, nodeids: Sequence[str], report_log: Path) -> int:
+    """Run pytest on nodeids (all tests if empty), logging to ``report_log``."""
+    report_log.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [sys.executable, "-m", "pytest", "-q", f"--report-log={report_log}"]
+    return subprocess.run([*cmd, *nodeids], cwd=base_dir, check=False).returncode
+
+
+def reportlog_durations(results: Iterable[TestResult]) -> dict[str, float]:
+    """Last recorded call duration per nodeid, parametrized cases summed."""
+    durations: dict[str, float] = {}
+    for r in results:
+        base = r.ref.split("[", 1)[0]
+        secs = float((r.details or {}).get("duration", 0))
+        durations[base] = durations.get(base, 0.0) + secs
+    return durations
+
+
+def lpt_shards(
+    nodeids: Sequence[str], durations: Mapping[str, float], n: int
+) -> list[list[str]]:
+    """Pack nodeids into at most ``n`` shards of near-equal total duration.
+
+    Longest-processing-time first: each test, slowest first, goes to the
+    currently lightest shard. Tests without history count as the median.
+    """
+    known = [durations[t] for t in nodeids if t in durations]
+    default = statistics.median(known) if known else 1.0
+    cost = {t: durations.get(t, default) for t in nodeids}
+    shards: list[list[str]] = [[] for _ in range(max(1, n))]
+    loads = [(0.0, i) for i in range(len(shards))]
+    for t in sorted(cost, key=lambda t: (-cost[t], t)):
+        load, i = heapq.heappop(loads)
+        shards[i].append(t)
+        heapq.heappush(loads, (load + cost[t], i))
+    return [s for s in shards if s]
+
+
+def run_pytest_shards(
+    base_dir: Path, shards: Sequence[Sequence[str]], report_logs: Sequence[Path]
+) -> int:
+    """Run each shard as its own pytest process in parallel; worst exit code wins.
+
+    Shard output goes to a ``.out`` file next to its reportlog so parallel
+    workers don't interleave on the terminal.
+    """
+    procs: list[subprocess.Popen[bytes]] = []
+    for nodeids, report_log in zip(shards, report_logs, strict=True):
+        report_log.parent.mkdir(parents=True, exist_ok=True)
+        with report_log.with_suffix(".out").open("wb") as out:
+            cmd = [
+                *(sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider"),
+                f"--report-log={report_log}",
+            ]
+            procs.append(
+                subprocess.Popen([*cmd, *nodeids], cwd=base_dir, stdout=out, stderr=out)
+            )
+    return max((p.wait() for p in procs), default=0)
+
+
+def merge_reportlogs(target: Path, *logs: Path) -> None:
+    """Merge fresh pytest-reportlog files into ``target``; fresh entries win per nodeid."""
+    fresh: list[str] = []
+    rerun: set[str] = set()
+    for log in logs:
+        if not log.exists():
+            continue
+        for line in log.read_text().splitlines():
+            if line.strip() and "nodeid" in (item := json.loads(line)):
+                fresh.append(line)
+                rerun.add(item["nodeid"])
+
+    kept: list[str] = []
+    if target.exists():
+        kept = [
+            line
+            for line in target.read_text().splitlines()
+            if line.strip() and json.loads(line).get("nodeid") not in rerun
+        ]
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text("".join(f"{line}\n" for line in [*kept, *fresh]))
+    tmp.replace(target)
 
 
 CLAUDE_MD_NAME = "CLAUDE.md"
@@ -61,15 +172,81 @@ class Lang(BaseModel):
             case "py":
                 return discover_pytest_tests(base_dir)
             case "ts":
-                return iter([])  # TODO: implement for TS
+                return tstest.discover_ts_tests(base_dir)
             case _:
                 return iter([])
 
+    def run_tests(
+        self,
+        base_dir: Path,
+        nodeids: Sequence[str] = (),
+        shards: int = 1,
+        replace: bool = False,
+    ) -> int:
+        """Run the given tests (all if empty) and fold them into the results file.
+
+        With ``shards > 1`` the tests are packed by historical duration and run
+        as parallel pytest workers, each with its own reportlog, then merged.
+        ``replace`` drops previous results instead of merging over them.
+        """
+        match self.language:
+            case "py" if shards > 1:
+                return self._run_pytest_sharded(base_dir, nodeids, shards, replace)
+            case "py":
+                results_file = self.results_path(base_dir)
+                if not nodeids:
+                    return run_pytest(base_dir, nodeids, results_file)
+                with tempfile.TemporaryDirectory() as tmp:
+                    log = Path(tmp) / results_file.name
+                    code = run_pytest(base_dir, nodeids, log)
+                    if replace:
+                        results_file.unlink(missing_ok=True)
+                    merge_reportlogs(results_file, log)
+                return code
+            case "ts" if shards <= 1:
+                results_file = self.results_path(base_dir)
+                files = list(dict.fromkeys(n.split("::", 1)[0] for n in nodeids))
+                if not nodeids:
+                    return tstest.run_ts(base_dir, files, results_file)
+                with tempfile.TemporaryDirectory() as tmp:
+                    report = Path(tmp) / results_file.name
+                    code = tstest.run_ts(base_dir, files, report)
+                    if replace:
+                        results_file.unlink(missing_ok=True)
+                    tstest.merge_results(results_file, report)
+                return code
+            case _:
+                raise NotImplementedError(
+                    f"Test running not implemented for language: {self.language}"
+                    + (f" with {shards} shards" if shards > 1 else "")
+                )
+
+    def _run_pytest_sharded(
+        self, base_dir: Path, nodeids: Sequence[str], shards: int, replace: bool
+    ) -> int:
+        results_file = self.results_path(base_dir)
+        if not nodeids:
+            nodeids = sorted(discover_pytest_tests(base_dir))
+            replace = True
+        durations = reportlog_durations(self.load_test_results(base_dir))
+        packed = lpt_shards(nodeids, durations, shards)
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = [Path(tmp) / f"shard-{i}.jsonl" for i in range(len(packed))]
+            code = run_pytest_shards(base_dir, packed, logs)
+            for log in logs:
+                if (out := log.with_suffix(".out")).exists():
+                    sys.stdout.write(out.read_text())
+            if replace:
+                results_file.unlink(missing_ok=True)
+            merge_reportlogs(results_file, *logs)
+        return code
+
     def load_test_results(self, base_dir: Path) -> Iterator[TestResult]:
         def load_pytest_results():
             results_file = self.results_path(base_dir)
             if not results_file.exists():
                 return
+            mtime = results_file.stat().st_mtime
             for line in results_file.read_text().splitlines():
                 if not line.strip():
                     continue
@@ -79,17 +256,17 @@ class Lang(BaseModel):
                 yield TestResult(
                     ref=item["nodeid"],
                     status="passed" if item["outcome"] == "passed" else "failed",
-                    details={"duration": str(item.get("duration", 0))},
+                    details={
+                        "duration": str(item.get("duration", 0)),
+                        "stop": str(item.get("stop", mtime)),
+                    },
                 )
 
-        def load_ts_results():
-            raise NotImplementedError("TS results loading not implemented yet")
-
         match self.language:
             case "py":
                 return load_pytest_results()
             case "ts":
-                return load_ts_results()
+                return load_ts_results(self.results_path(base_dir), base_dir)
             case _:
                 raise NotImplementedError(
                     f"Test results loading not implemented for language: {self.language}"
@@ -102,6 +279,22 @@ class TestResult(BaseModel):
     details: dict[str, str] | None = None
 
 
+def load_ts_results(results_file: Path, base_dir: Path) -> Iterator[TestResult]:
+    """Test cases from a vitest/jest JSON report, as ``TestResult`` rows."""
+    if not results_file.exists():
+        return
+    mtime = results_file.stat().st_mtime
+    for case in tstest.iter_results(results_file, base_dir):
+        yield TestResult(
+            ref=case.nodeid,
+            status=case.status,
+            details={
+                "duration": str(case.duration),
+                "stop": str(case.stop or mtime),
+            },
+        )
+
+
 md = Lang(language="md")
 
 
@@ -118,4 +311,5 @@ py = Lang(
 ts = Lang(
     language="ts",
     claude_context=[Preferences.code.directive, Preferences.ts.directive],
+    results_file_name="results.json",
 )
@@ -1,53 +1,216 @@
 import asyncio
+import hashlib
 import json
+import os
 import re
 import subprocess
-from typing import Any, Literal
+import zlib
+from collections import Counter
+from collections.abc import Callable, Generator, Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Literal, Protocol, cast
 
-from pydantic import BaseModel, create_model
+import numpy as np
+from pydantic import BaseModel, ValidationError, create_model
+
+from guide.utils import get_seed
+
+type Model = Literal["opus", "sonnet"]
+
+BACKEND_ENV = "GUIDE_LLM"
+"""``claude`` (default), ``fake``, ``record:<dir>`` or ``replay:<dir>``."""
+
+
+class LLMBackend(Protocol):
+    async def complete(
+        self, prompt: str, *, model: Model, timeout_seconds: float
+    ) -> str: ...
+
+
+@dataclass(frozen=True)
+class ClaudeCLI:
+    """Ask through ``claude --print``, one process per prompt."""
+
+    max_turns: int = 10
+
+    async def complete(
+        self, prompt: str, *, model: Model, timeout_seconds: float
+    ) -> str:
+        cmd = (
+            "claude",
+            "--print",
+            *("--model", model),
+            *("--max-turns", str(self.max_turns)),
+        )
+
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            async with asyncio.timeout(timeout_seconds):
+                stdout, stderr = await process.communicate(input=prompt.encode())
+        except TimeoutError:
+            process.kill()
+            await process.wait()
+            raise TimeoutError(f"LLM call timed out after {timeout_seconds}s") from None
+        stdout = stdout.decode(errors="replace")
+        stderr = stderr.decode(errors="replace") if stderr else None
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode or 100, cmd, stdout, stderr
+            )
+        return stdout
+
+
+@dataclass
+class FakeBackend:
+    """In-process stand-in with simulated latency and failures.
+
+    Outcomes are drawn from a generator seeded by the seed, the prompt and
+    how many times that prompt was asked, so a run is reproducible however
+    its calls interleave, and a retried prompt can succeed.
+    """
+
+    respond: Callable[[str], str] = lambda _prompt: ""
+    latency: float = 0.0
+    """Mean seconds per call, exponentially distributed."""
+    failure_rate: float = 0.0
+    """Chance a call fails like a crashed CLI (``CalledProcessError``)."""
+    timeout_rate: float = 0.0
+    """Chance a call hangs until ``timeout_seconds`` and raises ``TimeoutError``."""
+    seed: int = field(default_factory=get_seed)
+    calls: list[str] = field(default_factory=list[str])
+    asked: Counter[str] = field(default_factory=Counter[str])
+    """Calls so far per prompt."""
+
+    async def complete(
+        self, prompt: str, *, model: Model, timeout_seconds: float
+    ) -> str:
+        nth = self.asked[prompt]
+        self.asked[prompt] += 1
+        self.calls.append(prompt)
+        rng = np.random.default_rng([self.seed, zlib.crc32(prompt.encode()), nth])
+        fate = rng.random()
+        if fate < self.timeout_rate:
+            await asyncio.sleep(timeout_seconds)
+            raise TimeoutError(f"LLM call timed out after {timeout_seconds}s")
+        if self.latency:
+            await asyncio.sleep(min(rng.exponential(self.latency), timeout_seconds))
+        if fate < self.timeout_rate + self.failure_rate:
+            raise subprocess.CalledProcessError(
+                1, ("fake", model), "", "injected failure"
+            )
+        return self.respond(prompt)
+
+
+class ReplayMissError(LookupError):
+    pass
+
+
+@dataclass(frozen=True)
+class Recorded:
+    """Answer from prompt→response pairs on disk, one JSON file per pair.
+
+    On a miss, ask ``backend`` and record its answer; without a backend a
+    miss raises ``ReplayMissError``.
+    """
+
+    root: Path
+    backend: LLMBackend | None = None
+
+    def path(self, prompt: str, model: Model) -> Path:
+        key = hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+        return self.root / f"{key[:32]}.json"
+
+    async def complete(
+        self, prompt: str, *, model: Model, timeout_seconds: float
+    ) -> str:
+        path = self.path(prompt, model)
+        try:
+            return json.loads(path.read_text())["response"]
+        except FileNotFoundError:
+            if self.backend is None:
+                raise ReplayMissError(f"no recording for prompt in {path}") from None
+        response = await self.backend.complete(
+            prompt, model=model, timeout_seconds=timeout_seconds
+        )
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps({"model": model, "prompt": prompt, "response": response})
+        )
+        tmp.replace(path)
+        return response
+
+
+def backend_from_env() -> LLMBackend:
+    spec = os.environ.get(BACKEND_ENV, "claude")
+    kind, _, arg = spec.partition(":")
+    match kind:
+        case "claude":
+            return ClaudeCLI()
+        case "fake":
+            return FakeBackend()
+        case "record" if arg:
+            return Recorded(Path(arg), ClaudeCLI())
+        case "replay" if arg:
+            return Recorded(Path(arg))
+        case _:
+            raise ValueError(
+                f"{BACKEND_ENV}={spec!r}: expected claude, fake, record:<dir> or replay:<dir>"
+            )
+
+
+_backend: LLMBackend | None = None
+
+
+def get_backend() -> LLMBackend:
+    global _backend
+    if _backend is None:
+        _backend = backend_from_env()
+    return _backend
+
+
+@contextmanager
+def use_backend(backend: LLMBackend) -> Generator[LLMBackend]:
+    """Route every ``aask`` in the block through ``backend``."""
+    global _backend
+    prev, _backend = _backend, backend
+    try:
+        yield backend
+    finally:
+        _backend = prev
 
 
 async def aask(
     *content: str,
-    model: Literal["opus", "sonnet"] = "opus",
+    model: Model = "opus",
     timeout_seconds: float = 300.0,
 ) -> str:
-    cmd = (
-        "claude",
-        "--print",
-        *("--model", model),
-        *("--max-turns", "10"),
+    return await get_backend().complete(
+        "\n".join(content), model=model, timeout_seconds=timeout_seconds
     )
 
-    process = await asyncio.create_subprocess_exec(
-        *cmd,
-        stdin=asyncio.subprocess.PIPE,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-    try:
-        async with asyncio.timeout(timeout_seconds):
-            stdout, stderr = await process.communicate(
-                input="\n".join(content).encode()
-            )
-    except TimeoutError:
-        process.kill()
-        await process.wait()
-        raise TimeoutError(f"LLM call timed out after {timeout_seconds}s") from None
-    stdout = stdout.decode(errors="replace")
-    stderr = stderr.decode(errors="replace") if stderr else None
-
-    if process.returncode != 0:
-        raise subprocess.CalledProcessError(
-            process.returncode or 100, cmd, stdout, stderr
-        )
-    return stdout
+
+def _format_details(details: Mapping[str, Any], level: int = 2) -> str:
+    return "\n\n".join([f"{'#' * level} {k}\n\n{v}" for k, v in details.items()])
+
+
+def _extract_json(stdout: str) -> str:
+    data = re_json.search(stdout)
+    return data.group(1).strip() if data else stdout
 
 
 async def aask_model[T: BaseModel](model: type[T], **details: Any) -> T:
     schema = model.model_json_schema()
 
-    prompt = "\n\n".join([f"## {k}\n\n{v}" for k, v in details.items()])
+    prompt = _format_details(details)
 
     content = f"""\
 **Given the Information and your Knowledge, generate a JSON object Answer**
@@ -66,12 +229,160 @@ async def aask_model[T: BaseModel](model: type[T], **details: Any) -> T:
 """
 
     stdout = await aask(content)
-    data = re_json.search(stdout)
-    data = data.group(1).strip() if data else stdout
-    response = model.model_validate_json(data)
+    response = model.model_validate_json(_extract_json(stdout))
     return response
 
 
+PROMPT_BUDGET = 48_000
+"""Characters per batched prompt, schema included (~12k tokens)."""
+MAX_BATCH = 32
+"""Items per request, whatever the budget, to bound the size of the answer."""
+MAX_ROUNDS = 3
+BATCH_CONCURRENCY = 4
+
+
+class ExtractionError(ValueError):
+    """Some items still had no valid answer after ``MAX_ROUNDS``."""
+
+    def __init__(self, results: list[Any], errors: dict[int, str]) -> None:
+        super().__init__(
+            f"{len(errors)} of {len(results)} items failed: "
+            + "; ".join(f"item {i}: {e}" for i, e in sorted(errors.items())[:5])
+        )
+        self.results = results
+        """Answers by item index, None where extraction failed."""
+        self.errors = errors
+
+
+def _batch_schema(schema: dict[str, Any]) -> dict[str, Any]:
+    """Array of ``{"item": i, "answer": <schema>}``, with ``$defs`` hoisted."""
+    defs = schema.pop("$defs", None)
+    batch: dict[str, Any] = {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": {"item": {"type": "integer"}, "answer": schema},
+            "required": ["item", "answer"],
+        },
+    }
+    if defs:
+        batch["$defs"] = defs
+    return batch
+
+
+def _batch_prompt(schema: str, items: dict[int, str]) -> str:
+    sections = "\n\n".join(f"## Item {i}\n\n{text}" for i, text in items.items())
+    return f"""\
+**Given the Information for each Item and your Knowledge, generate a JSON array Answer with one element per Item**
+
+# Information
+
+{sections}
+
+# JSON Response Schema
+
+- Answer every Item, each in its own element, with "item" set to the Item number
+- If there are no valid value(s), use null or empty list/dict befitting the field type
+- RESPOND ONLY WITH A SCHEMA VALIDATED JSON ARRAY, DO NOT RESPOND WITH ANY OTHER TEXT
+- DO NOT HALLUCINATE
+
+{schema}
+"""
+
+
+def pack(sizes: Mapping[int, int], overhead: int, budget: int) -> list[list[int]]:
+    """Group item indices in order so each prompt stays within ``budget``.
+
+    An item too large to share a prompt gets one to itself.
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    used = overhead
+    for i, size in sizes.items():
+        if current and (used + size > budget or len(current) == MAX_BATCH):
+            batches.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_batch[T: BaseModel](
+    model: type[T], stdout: str, asked: list[int]
+) -> tuple[dict[int, T], dict[int, str]]:
+    """Validate each element on its own; unanswered items count as failed."""
+    answers: dict[int, T] = {}
+    errors = dict.fromkeys(asked, "no answer")
+    try:
+        elements = json.loads(_extract_json(stdout))
+    except json.JSONDecodeError as e:
+        return answers, dict.fromkeys(asked, f"invalid JSON: {e}")
+    if not isinstance(elements, list):
+        return answers, dict.fromkeys(asked, "answer is not a JSON array")
+    for el in cast("list[Any]", elements):
+        if not isinstance(el, dict):
+            continue
+        el = cast("dict[str, Any]", el)
+        if (i := el.get("item")) not in errors:
+            continue
+        try:
+            answers[i] = model.model_validate(el.get("answer"))
+        except ValidationError as e:
+            errors[i] = str(e).splitlines()[0]
+        else:
+            del errors[i]
+    return answers, errors
+
+
+async def aask_model_many[T: BaseModel](
+    model: type[T],
+    items: Sequence[Mapping[str, Any]],
+    *,
+    budget: int = PROMPT_BUDGET,
+    concurrency: int = BATCH_CONCURRENCY,
+) -> list[T]:
+    """``aask_model`` for many items, packed several to a prompt.
+
+    The schema is sent once per prompt rather than once per item, and as
+    many items go in as fit ``budget``. Elements are validated one by one;
+    items whose answer is missing or invalid are asked again, in smaller
+    company, for up to ``MAX_ROUNDS`` rounds before ``ExtractionError``.
+    """
+    schema = json.dumps(_batch_schema(model.model_json_schema()), indent=2)
+    texts = {i: _format_details(details, level=3) for i, details in enumerate(items)}
+    overhead = len(_batch_prompt(schema, {}))
+    results: dict[int, T] = {}
+    errors: dict[int, str] = {}
+    sem = asyncio.Semaphore(concurrency)
+
+    async def ask(batch: list[int]) -> None:
+        async with sem:
+            try:
+                stdout = await aask(_batch_prompt(schema, {i: texts[i] for i in batch}))
+            except (subprocess.CalledProcessError, TimeoutError) as e:
+                errors.update(dict.fromkeys(batch, repr(e)))
+                return
+        answers, failed = _parse_batch(model, stdout, batch)
+        results.update(answers)
+        errors.update(failed)
+
+    todo = list(texts)
+    for attempt in range(MAX_ROUNDS):
+        # retries go in batches a quarter the size, so one bad item
+        # cannot sink the same neighbours again
+        round_budget = overhead + (budget - overhead) // 4**attempt
+        sizes = {i: len(texts[i]) for i in todo}
+        errors.clear()
+        async with asyncio.TaskGroup() as tg:
+            for batch in pack(sizes, overhead, round_budget):
+                tg.create_task(ask(batch))
+        if not (todo := sorted(errors)):
+            return [results[i] for i in range(len(items))]
+    raise ExtractionError([results.get(i) for i in range(len(items))], dict(errors))
+
+
 re_json = re.compile(r"```json(.*?)```", re.DOTALL)
 
 
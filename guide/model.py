@@ -1,3 +1,4 @@
+import time
 import warnings
 from pathlib import Path
 from typing import Self
@@ -7,6 +8,7 @@ from pydantic import BaseModel, Field
 
 from guide import lang, paths
 from guide.design import Design
+from guide.history import HISTORY_DIR, History
 
 
 class Guide(BaseModel):
@@ -26,7 +28,12 @@ class Guide(BaseModel):
         specs = self.design.flat()
         spec_test_map = {spec.test.ref: spec.test for spec in specs if spec.test}
 
-        for r in self.lang.load_test_results(self.dir):
+        results = list(self.lang.load_test_results(self.dir))
+        history = History.load(self.dir / HISTORY_DIR)
+        history.ingest(results, ts=time.time())
+        history.annotate(results)
+
+        for r in results:
             spec_test = spec_test_map.get(r.ref)
             if spec_test:
                 spec_test.result = r
@@ -0,0 +1,277 @@
+"""Netlify API client: cached site list and incremental file-digest deploys.
+
+A deploy posts the SHA1 of every file; Netlify answers with the digests it
+does not have yet, and only those files are uploaded, on a bounded thread
+pool. A per-site manifest of (size, mtime_ns, sha1) kept in the cache dir
+spares rehashing unchanged files and is what ``--dry-run`` diffs against.
+
+The API base URL comes from ``NETLIFY_API_URL`` (a local stand-in in tests)
+and the token from ``NETLIFY_AUTH_TOKEN`` or the netlify CLI's login.
+"""
+
+import hashlib
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from guide import paths
+
+API_URL_ENV = "NETLIFY_API_URL"
+DEFAULT_API_URL = "https://api.netlify.com/api/v1"
+TOKEN_ENV = "NETLIFY_AUTH_TOKEN"
+SITES_TTL = 300.0
+"""Seconds the cached site list is trusted."""
+PER_PAGE = 100
+UPLOAD_WORKERS = 8
+RETRIES = 3
+DEPLOY_TIMEOUT = 120.0
+"""Seconds to wait for an uploaded deploy to go live."""
+
+type Site = dict[str, Any]
+
+
+class NetlifyError(RuntimeError):
+    pass
+
+
+def cache_dir() -> Path:
+    return paths.cache_dir("portal")
+
+
+def _token() -> str:
+    if token := os.environ.get(TOKEN_ENV):
+        return token
+    config = Path.home() / ".config" / "netlify" / "config.json"
+    try:
+        data = json.loads(config.read_text())
+        return data["users"][data["userId"]]["auth"]["token"]
+    except (OSError, json.JSONDecodeError, KeyError, TypeError):
+        raise NetlifyError(
+            f"no Netlify token: set {TOKEN_ENV} or run `netlify login`"
+        ) from None
+
+
+def _write_json(path: Path, data: object) -> None:
+    paths.write_atomic(path, json.dumps(data))
+
+
+# ── manifests ────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    sha1: str
+    size: int
+    mtime_ns: int
+
+
+type Manifest = dict[str, FileEntry]
+"""Deploy path ("/index.html") -> entry."""
+
+
+def _files(root: Path) -> Iterator[Path]:
+    for dirpath, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if not name.startswith("."):
+                yield Path(dirpath) / name
+
+
+def _sha1(path: Path) -> str:
+    with path.open("rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+
+def build_manifest(root: Path, previous: Manifest | None = None) -> Manifest:
+    """Hash every file under ``root``, reusing ``previous`` where size and mtime match."""
+    previous = previous or {}
+    manifest: Manifest = {}
+    for path in _files(root):
+        key = "/" + path.relative_to(root).as_posix()
+        st = path.stat()
+        old = previous.get(key)
+        if old and (old.size, old.mtime_ns) == (st.st_size, st.st_mtime_ns):
+            manifest[key] = old
+        else:
+            manifest[key] = FileEntry(_sha1(path), st.st_size, st.st_mtime_ns)
+    return manifest
+
+
+def _manifest_path(site_name: str) -> Path:
+    return cache_dir() / "manifests" / f"{site_name}.json"
+
+
+def load_manifest(site_name: str) -> Manifest:
+    try:
+        data = json.loads(_manifest_path(site_name).read_text())
+    except (OSError, json.JSONDecodeError):
+        return {}
+    return {k: FileEntry(**v) for k, v in data.items()}
+
+
+def save_manifest(site_name: str, manifest: Manifest) -> None:
+    _write_json(_manifest_path(site_name), {k: asdict(v) for k, v in manifest.items()})
+
+
+@dataclass(frozen=True)
+class ManifestDiff:
+    added: list[str]
+    changed: list[str]
+    removed: list[str]
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def diff_manifests(old: Manifest, new: Manifest) -> ManifestDiff:
+    return ManifestDiff(
+        added=sorted(new.keys() - old.keys()),
+        changed=sorted(
+            k for k in new.keys() & old.keys() if new[k].sha1 != old[k].sha1
+        ),
+        removed=sorted(old.keys() - new.keys()),
+    )
+
+
+def plan(site_name: str, root: Path) -> ManifestDiff:
+    """What deploying ``root`` would change against the last deploy."""
+    previous = load_manifest(site_name)
+    return diff_manifests(previous, build_manifest(root, previous))
+
+
+# ── API ──────────────────────────────────────────────────────────────
+
+
+@dataclass(frozen=True)
+class Deployed:
+    deploy_id: str
+    uploaded: list[str]
+    """Paths whose content Netlify did not have yet."""
+
+
+@dataclass
+class Client:
+    url: str = field(
+        default_factory=lambda: os.environ.get(API_URL_ENV, DEFAULT_API_URL)
+    )
+    workers: int = UPLOAD_WORKERS
+    _auth: str | None = None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: object = None,
+        *,
+        data: bytes | None = None,
+    ) -> Any:
+        """One API call with retries on connection errors and 5xx; JSON back."""
+        if self._auth is None:
+            self._auth = _token()
+        headers = {"Authorization": f"Bearer {self._auth}"}
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+        elif data is not None:
+            headers["Content-Type"] = "application/octet-stream"
+        req = urllib.request.Request(
+            self.url.rstrip("/") + path, data=data, headers=headers, method=method
+        )
+        for attempt in range(RETRIES):
+            try:
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    raw = resp.read()
+                return json.loads(raw) if raw else None
+            except urllib.error.HTTPError as e:
+                if e.code < 500 or attempt == RETRIES - 1:
+                    raise NetlifyError(f"{method} {path}: HTTP {e.code}") from e
+            except urllib.error.URLError as e:
+                if attempt == RETRIES - 1:
+                    raise NetlifyError(f"{method} {path}: {e.reason}") from e
+            time.sleep(0.5 * 2**attempt)
+        raise AssertionError("unreachable")
+
+    # sites
+
+    def sites(self, ttl: float = SITES_TTL) -> list[Site]:
+        """All account sites, from a cache younger than ``ttl`` seconds if any."""
+        path = cache_dir() / "sites.json"
+        try:
+            cached = json.loads(path.read_text())
+            if time.time() - cached["ts"] < ttl and cached["url"] == self.url:
+                return cached["sites"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            pass
+        sites: list[Site] = []
+        page = 1
+        while True:
+            batch = self.request(
+                "GET", f"/sites?filter=all&page={page}&per_page={PER_PAGE}"
+            )
+            sites += batch
+            if len(batch) < PER_PAGE:
+                break
+            page += 1
+        _write_json(path, {"ts": time.time(), "url": self.url, "sites": sites})
+        return sites
+
+    def site(self, name: str) -> Site | None:
+        return next((s for s in self.sites() if s["name"] == name), None)
+
+    def forget_sites(self) -> None:
+        (cache_dir() / "sites.json").unlink(missing_ok=True)
+
+    def create_site(self, name: str, account_slug: str) -> Site:
+        site = self.request("POST", f"/{account_slug}/sites", {"name": name})
+        self.forget_sites()
+        return site
+
+    def delete_site(self, site: Site) -> None:
+        self.request("DELETE", f"/sites/{site['id']}")
+        self.forget_sites()
+        _manifest_path(site["name"]).unlink(missing_ok=True)
+
+    # deploys
+
+    def deploy(self, site: Site, root: Path) -> Deployed:
+        """Deploy ``root`` to production, uploading only what Netlify lacks."""
+        manifest = build_manifest(root, load_manifest(site["name"]))
+        files = {k: e.sha1 for k, e in manifest.items()}
+        deploy = self.request("POST", f"/sites/{site['id']}/deploys", {"files": files})
+        required = set(deploy.get("required", []))
+        first: dict[str, str] = {}
+        for key, sha in files.items():
+            if sha in required:
+                first.setdefault(sha, key)
+        uploads = sorted(first.values())
+
+        def upload(key: str) -> None:
+            quoted = urllib.parse.quote(key)
+            self.request(
+                "PUT",
+                f"/deploys/{deploy['id']}/files{quoted}",
+                data=(root / key[1:]).read_bytes(),
+            )
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            list(pool.map(upload, uploads))
+        self._wait_ready(deploy["id"])
+        save_manifest(site["name"], manifest)
+        return Deployed(deploy["id"], uploads)
+
+    def _wait_ready(self, deploy_id: str) -> None:
+        deadline = time.monotonic() + DEPLOY_TIMEOUT
+        while (
+            state := self.request("GET", f"/deploys/{deploy_id}")["state"]
+        ) != "ready":
+            if state == "error" or time.monotonic() > deadline:
+                raise NetlifyError(f"deploy {deploy_id}: {state}")
+            time.sleep(0.5)
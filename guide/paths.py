@@ -1,11 +1,16 @@
+import os
 from pathlib import Path
-from typing import Any, Literal
+from typing import TYPE_CHECKING, Any, Literal
 
 from guide.utils import AutoDir
 
+if TYPE_CHECKING:
+    from guide.prompts import Template
+
 GUIDE_YAML_NAME = "guide.yaml"
 RESULTS_DIR_NAME = "results"
 RESULTS_DIR = Path("results")
+TIMINGS_FILE_NAME = "timings.jsonl"
 
 
 class Workspace(AutoDir, dir="."):
@@ -16,6 +21,21 @@ class Workspace(AutoDir, dir="."):
 PYPROJECT_TOML_NAME = "pyproject.toml"
 PACKAGE_JSON_NAME = "package.json"
 
+
+def cache_dir(name: str) -> Path:
+    """``$XDG_CACHE_HOME/guide/<name>``, read on each call so tests can move it."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "guide" / name
+
+
+def write_atomic(path: Path, text: str) -> None:
+    """Write through a per-process temp file, so readers never see half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(text)
+    tmp.replace(path)
+
+
 ###
 
 this_file = Path(__file__).resolve()
@@ -48,17 +68,33 @@ class Commands(AutoDir, dir=GUIDES / "commands"):
     gen_limn = "gen-limn.md"
     gen_comm = "gen-comm.md"
     gen_mood = "gen-mood.md"
+    gen_report = "gen-report.md"
+    map_md_to_yaml = "map-md-to-yaml.md"
+    map_pdf_to_md = "map-pdf-to-md.md"
+
+    @property
+    def template(self) -> "Template":
+        from guide.prompts import load_template
+
+        return load_template(self.path)
 
     async def aask(
         self,
         *content: str,
         model: Literal["opus", "sonnet"] = "opus",
         timeout_seconds: float = 300.0,
+        budget: int | None = None,
         **details: Any,
     ) -> str:
+        """Ask with this command's prompt; ``details`` go most important first.
+
+        Details are trimmed from the last to fit ``budget`` tokens, by
+        default the model's ``PROMPT_BUDGETS`` entry.
+        """
         from guide.llm import aask
+        from guide.prompts import PROMPT_BUDGETS, render
 
-        formatted = "\n\n".join([f"## {k}\n\n{v}" for k, v in details.items()])
-        parts = (self.path.read_text(), *content, formatted)
+        budget = PROMPT_BUDGETS[model] if budget is None else budget
+        parts = render(self.template, content, details, budget)
 
         return await aask(*parts, model=model, timeout_seconds=timeout_seconds)
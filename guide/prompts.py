@@ -0,0 +1,166 @@
+"""Command prompt templates: cached, split, and trimmed to a token budget.
+
+A command file (``guides/commands/*.md``) is read once and kept until its
+mtime or size changes; the front matter is split off as metadata and only
+the body is sent. :func:`render` appends the caller's content and
+``details`` sections, and when the estimate exceeds the model's budget it
+trims the details from the last one backwards, so callers list them most
+important first. The template body and positional content are never cut.
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, cast
+
+import yaml
+
+from guide.llm import Model
+
+CHARS_PER_TOKEN = 4
+"""Rough bytes per token for English prose and code."""
+PROMPT_BUDGETS: dict[Model, int] = {"opus": 100_000, "sonnet": 100_000}
+"""Prompt tokens per model, leaving the rest of the window to the answer."""
+MIN_SECTION_TOKENS = 64
+"""Sections that would be cut below this are dropped instead."""
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text.encode()) // CHARS_PER_TOKEN)
+
+
+@dataclass(frozen=True)
+class Template:
+    path: Path
+    meta: dict[str, Any]
+    body: str
+    stamp: tuple[int, int]
+    """(mtime_ns, size) the template was read at."""
+
+
+def split_front_matter(text: str) -> tuple[dict[str, Any], str]:
+    """Front matter and body; lines YAML rejects (``[a] [b]``) stay strings."""
+    if not text.startswith("---\n") or (end := text.find("\n---\n", 3)) < 0:
+        return {}, text
+    front, body = text[4:end], text[end + 5 :].lstrip("\n")
+    try:
+        data = yaml.safe_load(front)
+        if isinstance(data, dict):
+            return cast("dict[str, Any]", data), body
+    except yaml.YAMLError:
+        pass
+    meta: dict[str, Any] = {}
+    for line in front.splitlines():
+        key, sep, value = line.partition(":")
+        if not sep:
+            continue
+        try:
+            meta[key.strip()] = yaml.safe_load(value)
+        except yaml.YAMLError:
+            meta[key.strip()] = value.strip()
+    return meta, body
+
+
+_templates: dict[Path, Template] = {}
+
+
+def load_template(path: Path) -> Template:
+    """The template at ``path``, re-read only when the file has changed."""
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _templates.get(path)
+    if cached is not None and cached.stamp == stamp:
+        return cached
+    meta, body = split_front_matter(path.read_text())
+    template = _templates[path] = Template(path, meta, body, stamp)
+    return template
+
+
+_DECLARED = re.compile(r"^([A-Z][A-Z0-9_]*)=(\d+)[ \t]*$", re.MULTILINE)
+
+
+def declared_ints(template: Template) -> dict[str, int]:
+    """``NAME=<int>`` body lines and upper-case integer front matter, which wins."""
+    meta = {
+        k: v
+        for k, v in template.meta.items()
+        if k.isupper() and isinstance(v, int) and not isinstance(v, bool)
+    }
+    body = {m.group(1): int(m.group(2)) for m in _DECLARED.finditer(template.body)}
+    return body | meta
+
+
+def declared_int(template: Template, name: str, default: int) -> int:
+    """``name`` from the front matter, or a ``NAME=<int>`` line in the body."""
+    return declared_ints(template).get(name, default)
+
+
+_FENCE = re.compile(r"^(`{3,})(\w*)[^\n]*\n(.*?)^\1[ \t]*$", re.DOTALL | re.MULTILINE)
+
+
+def fenced(answer: str, lang: str | None = None) -> str:
+    """Body of the first ``lang`` fence (any fence if None) in ``answer``, else all of it."""
+    for m in _FENCE.finditer(answer):
+        if lang is None or m.group(2) == lang:
+            return m.group(3).strip() + "\n"
+    return answer.strip() + "\n"
+
+
+def _section(name: str, text: str) -> str:
+    return f"## {name}\n\n{text}"
+
+
+def _omitted(text: str) -> str:
+    return f"[omitted: ~{estimate_tokens(text)} tokens over the prompt budget]"
+
+
+def trim(text: str, tokens: int) -> str:
+    """Keep whole lines from the head and tail of ``text`` within ``tokens``."""
+    lines = text.splitlines()
+    room = tokens * CHARS_PER_TOKEN - 80  # the marker line
+    head: list[str] = []
+    tail: list[str] = []
+    used = 0
+    i, j = 0, len(lines) - 1
+    # two parts head to one part tail
+    while i <= j:
+        take_head = len(head) <= 2 * len(tail)
+        line = lines[i] if take_head else lines[j]
+        if used + len(line.encode()) + 1 > room:
+            break
+        used += len(line.encode()) + 1
+        if take_head:
+            head.append(line)
+            i += 1
+        else:
+            tail.append(line)
+            j -= 1
+    cut = j - i + 1
+    if cut <= 0:
+        return text
+    marker = f"[… {cut} of {len(lines)} lines trimmed to fit the prompt budget …]"
+    return "\n".join([*head, marker, *reversed(tail)])
+
+
+def render(
+    template: Template,
+    content: tuple[str, ...],
+    details: dict[str, Any],
+    budget: int,
+) -> tuple[str, ...]:
+    """Prompt parts for ``template``, with ``details`` trimmed to fit ``budget``."""
+    fixed = (template.body, *content)
+    left = budget - sum(estimate_tokens(p) + 1 for p in fixed)
+    texts = {name: str(value) for name, value in details.items()}
+    notes = {name: _section(name, _omitted(text)) for name, text in texts.items()}
+    # room for the omission notes of every later section, should it come to that
+    reserve = sum(estimate_tokens(n) + 1 for n in notes.values())
+    sections: list[str] = []
+    for name, text in texts.items():
+        reserve -= estimate_tokens(notes[name]) + 1
+        room = left - reserve - estimate_tokens(_section(name, "")) - 1
+        if estimate_tokens(text) > room:
+            text = trim(text, room) if room >= MIN_SECTION_TOKENS else _omitted(text)
+        sections.append(_section(name, text))
+        left -= estimate_tokens(sections[-1]) + 1
+    return (*fixed, "\n\n".join(sections))
@@ -0,0 +1,257 @@
+"""Persistent pyright language server for project-context, incremental checks.
+
+Edited content is sent as an in-memory overlay (didOpen) on the real path, so
+relative imports and project config resolve and nothing is written to disk.
+The overlay is closed again once its diagnostics arrive, so later checks of
+other files import what is on disk. The server keeps its analysis of the
+project between checks.
+"""
+
+import asyncio
+import json
+from collections.abc import Awaitable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Self
+
+LANGSERVER = "pyright-langserver"
+CHECK_TIMEOUT = 20.0
+"""Longest wait for the edited file's diagnostics before giving up on the server."""
+PROJECT_MARKERS = ("pyrightconfig.json", "pyproject.toml")
+SEVERITY = {1: "error", 2: "warning", 3: "information", 4: "hint"}
+
+type Message = dict[str, Any]
+type Published = tuple[str, int | None, list[Message]] | None
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    path: str
+    line: int
+    col: int
+    severity: str
+    message: str
+    rule: str = ""
+
+    @classmethod
+    def from_lsp(cls, path: str, d: Message) -> Self:
+        start = d["range"]["start"]
+        return cls(
+            path,
+            start["line"] + 1,
+            start["character"] + 1,
+            SEVERITY.get(d.get("severity", 1), "error"),
+            d["message"].replace("\u00a0", " "),
+            str(d.get("code", "")),
+        )
+
+    def __str__(self) -> str:
+        rule = f" ({self.rule})" if self.rule else ""
+        return f"{self.path}:{self.line}:{self.col} - {self.severity}: {self.message}{rule}"
+
+
+def find_project_root(file_path: Path) -> Path | None:
+    d = file_path.resolve().parent
+    return next(
+        (p for p in [d, *d.parents] if any((p / m).exists() for m in PROJECT_MARKERS)),
+        None,
+    )
+
+
+@dataclass
+class Server:
+    root: Path
+    proc: asyncio.subprocess.Process
+    loop: asyncio.AbstractEventLoop = field(default_factory=asyncio.get_running_loop)
+    versions: dict[str, int] = field(default_factory=dict[str, int])
+    """Last version sent per URI; versions keep rising across open/close."""
+    _open: dict[str, asyncio.Lock] = field(default_factory=dict[str, asyncio.Lock])
+    _next_id: int = 0
+    _pending: dict[int, asyncio.Future[Any]] = field(
+        default_factory=dict[int, asyncio.Future[Any]]
+    )
+    _listeners: set[asyncio.Queue[Published]] = field(
+        default_factory=set[asyncio.Queue[Published]]
+    )
+    _reader: asyncio.Task[None] | None = None
+
+    @classmethod
+    async def start(cls, root: Path) -> Self:
+        proc = await asyncio.create_subprocess_exec(
+            LANGSERVER,
+            "--stdio",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        self = cls(root, proc)
+        self._reader = asyncio.create_task(self._read())
+        await self.request(
+            "initialize",
+            {
+                "processId": None,
+                "rootUri": root.as_uri(),
+                "workspaceFolders": [{"uri": root.as_uri(), "name": root.name}],
+                "capabilities": {
+                    "workspace": {"configuration": True, "workspaceFolders": True},
+                    "textDocument": {"publishDiagnostics": {"versionSupport": True}},
+                },
+            },
+        )
+        await self.notify("initialized", {})
+        return self
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.returncode is None and self._reader is not None
+
+    async def _send(self, msg: Message) -> None:
+        assert self.proc.stdin is not None
+        body = json.dumps({"jsonrpc": "2.0", **msg}).encode()
+        self.proc.stdin.write(f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await self.proc.stdin.drain()
+
+    async def notify(self, method: str, params: Message) -> None:
+        await self._send({"method": method, "params": params})
+
+    async def request(self, method: str, params: Message | None = None) -> Any:
+        self._next_id += 1
+        fut = self.loop.create_future()
+        self._pending[self._next_id] = fut
+        await self._send({"id": self._next_id, "method": method, "params": params})
+        return await fut
+
+    async def _recv(self) -> Message | None:
+        assert self.proc.stdout is not None
+        length = 0
+        while line := await self.proc.stdout.readline():
+            if line == b"\r\n":
+                break
+            key, _, val = line.decode().partition(":")
+            if key.lower() == "content-length":
+                length = int(val)
+        if not length:
+            return None
+        return json.loads(await self.proc.stdout.readexactly(length))
+
+    async def _read(self) -> None:
+        try:
+            while (msg := await self._recv()) is not None:
+                await self._dispatch(msg)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._reader = None
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError(f"{LANGSERVER} exited"))
+            for q in self._listeners:
+                q.put_nowait(None)
+
+    async def _dispatch(self, msg: Message) -> None:
+        method = msg.get("method")
+        if method is None:
+            if (fut := self._pending.pop(msg.get("id", -1), None)) and not fut.done():
+                fut.set_result(msg.get("result"))
+        elif "id" in msg:
+            # server → client requests: default settings, accept registrations
+            items = (msg.get("params") or {}).get("items", [])
+            result = (
+                [None] * len(items) if method == "workspace/configuration" else None
+            )
+            await self._send({"id": msg["id"], "result": result})
+        elif method == "textDocument/publishDiagnostics":
+            p = msg["params"]
+            for q in self._listeners:
+                q.put_nowait((p["uri"], p.get("version"), p["diagnostics"]))
+
+    async def check(self, path: Path, content: str) -> dict[Path, list[Diagnostic]]:
+        """Diagnostics for ``path`` overlaid with ``content``.
+
+        Checks of one file run one at a time. Raises ``TimeoutError`` when the
+        server has not published diagnostics for the edit within
+        ``CHECK_TIMEOUT``.
+        """
+        resolved = await asyncio.to_thread(path.resolve)
+        uri = resolved.as_uri()
+        async with self._open.setdefault(uri, asyncio.Lock()):
+            version = self.versions.get(uri, 0) + 1
+            self.versions[uri] = version
+            q: asyncio.Queue[Published] = asyncio.Queue()
+            self._listeners.add(q)
+            doc = {"uri": uri, "languageId": "python", "version": version}
+            try:
+                await self.notify(
+                    "textDocument/didOpen", {"textDocument": {**doc, "text": content}}
+                )
+                async with asyncio.timeout(CHECK_TIMEOUT):
+                    diags = await self._published(q, uri, version)
+            finally:
+                self._listeners.discard(q)
+                if self.alive:
+                    await self.notify(
+                        "textDocument/didClose", {"textDocument": {"uri": uri}}
+                    )
+        return {resolved: [Diagnostic.from_lsp(str(resolved), d) for d in diags]}
+
+    async def _published(
+        self, q: asyncio.Queue[Published], uri: str, version: int
+    ) -> list[Message]:
+        while (item := await q.get()) is not None:
+            got, got_version, diags = item
+            if got == uri and (got_version or 0) >= version:
+                return diags
+        raise ConnectionError(f"{LANGSERVER} exited")
+
+    async def close(self) -> None:
+        if self.alive:
+            try:
+                async with asyncio.timeout(2.0):
+                    await self.request("shutdown")
+                    await self.notify("exit", {})
+                    await self.proc.wait()
+            except (TimeoutError, ConnectionError):
+                pass
+        if self.proc.returncode is None:
+            self.proc.kill()
+            await self.proc.wait()
+        if self._reader is not None:
+            self._reader.cancel()
+
+
+_servers: dict[Path, Server] = {}
+_starting: dict[Path, asyncio.Task[Server]] = {}
+
+
+async def server_for(root: Path) -> Server:
+    """Shared server for ``root`` on the running loop, started on first use."""
+    loop = asyncio.get_running_loop()
+    server = _servers.get(root)
+    if server is not None and server.alive and server.loop is loop:
+        return server
+    task = _starting.get(root)
+    if task is None or task.get_loop() is not loop:
+        task = _starting[root] = asyncio.create_task(Server.start(root))
+    try:
+        server = _servers[root] = await task
+    finally:
+        _starting.pop(root, None)
+    return server
+
+
+async def shutdown() -> None:
+    servers = list(_servers.values())
+    _servers.clear()
+    await asyncio.gather(*(s.close() for s in servers), return_exceptions=True)
+
+
+async def serving[T](aw: Awaitable[T]) -> T:
+    """Await a command's work with servers shared across it, then stop them.
+
+    Servers are bound to the running loop, so this wraps a whole
+    ``asyncio.run``; ``guide watchd`` keeps them warm across processes.
+    """
+    try:
+        return await aw
+    finally:
+        await shutdown()
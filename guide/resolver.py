@@ -0,0 +1,790 @@
+"""Resolvers: small, sandboxed Python-dialect functions in ``.gen.md`` front matter.
+
+A resolver is a ``def resolve(ctx): ...`` in a Starlark-like subset of Python:
+``def``, ``if``, ``for``, assignments, literals, comprehensions and a few pure
+builtins. There is no ``while``, ``lambda``, ``import``, attribute access
+(beyond a short list of str/list/dict methods) or recursion, and every
+evaluation runs under a step and wall-clock budget, so it always terminates
+and cannot touch the host.
+
+Source is checked and compiled once into nested closures, cached by source
+hash. Host builtins (``run``, ``notify``) only record effects during
+evaluation; :class:`Host` evaluates on a bounded thread pool and performs the
+recorded effects there, dropping work when the pool is saturated. Each of its
+threads evaluates in a :class:`Sandbox` process, which is killed when a call
+overruns its time budget.
+"""
+
+import ast
+import hashlib
+import multiprocessing
+import operator
+import pickle
+import shlex
+import subprocess
+import threading
+import time
+from collections.abc import Callable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from multiprocessing.context import SpawnProcess
+from pathlib import Path
+from typing import Any
+
+import yaml
+
+MAX_STEPS = 100_000
+MAX_SECONDS = 0.25
+MAX_LEN = 100_000
+"""Longest string or list an expression may build."""
+MAX_INT_BITS = 4096
+"""Largest integer an expression may build, in bits."""
+KILL_GRACE = 1.0
+"""Seconds past the time budget before a sandbox process is killed."""
+SANDBOX_START_TIMEOUT = 30.0
+RUN_TIMEOUT = 300.0
+ENTRY = "resolve"
+
+type Value = Any
+type Eval = Callable[["_Frame"], Value]
+type Exec = Callable[["_Frame"], None]
+
+
+class ResolverError(Exception):
+    """A resolver failed to compile or evaluate."""
+
+
+class BudgetExceededError(ResolverError):
+    pass
+
+
+@dataclass(frozen=True)
+class Effect:
+    """A host builtin call recorded during evaluation."""
+
+    name: str
+    args: tuple[Value, ...]
+
+
+@dataclass
+class Result:
+    value: Value
+    effects: list[Effect]
+    steps: int
+
+
+# ── runtime ─────────────────────────────────────────────────────────
+
+
+class _Return(Exception):  # noqa: N818
+    def __init__(self, value: Value) -> None:
+        self.value = value
+
+
+class _Break(Exception):  # noqa: N818
+    pass
+
+
+class _Continue(Exception):  # noqa: N818
+    pass
+
+
+@dataclass
+class _Run:
+    steps: int
+    deadline: float
+    globals: dict[str, Value] = field(default_factory=dict[str, Value])
+    effects: list[Effect] = field(default_factory=list[Effect])
+    active: set[str] = field(default_factory=set[str])
+    used: int = 0
+
+    def tick(self) -> None:
+        self.used += 1
+        if self.used > self.steps:
+            raise BudgetExceededError(f"step budget of {self.steps} exceeded")
+        if time.monotonic() > self.deadline:
+            raise BudgetExceededError("time budget exceeded")
+
+
+@dataclass
+class _Frame:
+    run: _Run
+    vars: dict[str, Value]
+
+
+@dataclass(frozen=True)
+class _Function:
+    name: str
+    params: tuple[str, ...]
+    defaults: tuple[Value, ...]
+    body: Exec
+
+    def __call__(self, run: _Run, args: tuple[Value, ...]) -> Value:
+        if self.name in run.active:
+            raise ResolverError(f"recursion into {self.name}() is not allowed")
+        required = len(self.params) - len(self.defaults)
+        if not required <= len(args) <= len(self.params):
+            raise ResolverError(f"{self.name}() takes {len(self.params)} arguments")
+        values = (*args, *self.defaults[len(args) - required :])
+        run.active.add(self.name)
+        try:
+            self.body(_Frame(run, dict(zip(self.params, values, strict=True))))
+        except _Return as r:
+            return r.value
+        finally:
+            run.active.discard(self.name)
+        return None
+
+
+def _bounded(value: Value) -> Value:
+    if isinstance(value, (str, list, tuple, dict)) and len(value) > MAX_LEN:
+        raise BudgetExceededError(f"value longer than {MAX_LEN}")
+    if isinstance(value, int) and value.bit_length() > MAX_INT_BITS:
+        raise BudgetExceededError(f"integer larger than {MAX_INT_BITS} bits")
+    return value
+
+
+def _check_repeat(seq: Value, n: Value) -> None:
+    if isinstance(seq, (str, list, tuple)) and isinstance(n, int):
+        if len(seq) * n > MAX_LEN:
+            raise BudgetExceededError(f"value longer than {MAX_LEN}")
+
+
+def _check_method(target: Value, attr: str, args: tuple[Value, ...]) -> None:
+    """Reject a call whose result would outgrow ``MAX_LEN``, before making it."""
+    if attr != "replace" or len(args) < 2:
+        return
+    old, new = args[0], args[1]
+    if not (isinstance(target, str) and isinstance(old, str) and isinstance(new, str)):
+        return
+    hits = target.count(old) if old else len(target) + 1
+    if len(args) > 2 and isinstance(args[2], int) and args[2] >= 0:
+        hits = min(hits, args[2])
+    if len(target) + hits * (len(new) - len(old)) > MAX_LEN:
+        raise BudgetExceededError(f"value longer than {MAX_LEN}")
+
+
+def _none(f: "_Frame") -> Value:
+    return None
+
+
+def _range(*args: int) -> list[int]:
+    r = range(*args)
+    if len(r) > MAX_LEN:
+        raise BudgetExceededError(f"range longer than {MAX_LEN}")
+    return list(r)
+
+
+PURE_BUILTINS: dict[str, Callable[..., Value]] = {
+    "len": len,
+    "str": str,
+    "int": int,
+    "float": float,
+    "bool": bool,
+    "min": min,
+    "max": max,
+    "abs": abs,
+    "any": any,
+    "all": all,
+    "sorted": sorted,
+    "list": list,
+    "dict": dict,
+    "range": _range,
+}
+HOST_BUILTINS = ("run", "notify")
+METHODS: dict[type, frozenset[str]] = {
+    str: frozenset(
+        {"startswith", "endswith", "lower", "upper", "strip", "split", "replace"}
+    ),
+    list: frozenset({"append", "index", "count"}),
+    dict: frozenset({"get", "keys", "values", "items"}),
+}
+"""Methods a resolver may call; view results are copied into lists."""
+
+_BINOPS: dict[type[ast.operator], Callable[[Value, Value], Value]] = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+}
+_UNARY: dict[type[ast.unaryop], Callable[[Value], Value]] = {
+    ast.Not: operator.not_,
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_COMPARE: dict[type[ast.cmpop], Callable[[Value, Value], bool]] = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.In: lambda a, b: a in b,
+    ast.NotIn: lambda a, b: a not in b,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+}
+
+
+# ── compiler ────────────────────────────────────────────────────────
+
+
+def _fail(node: ast.AST, what: str) -> ResolverError:
+    line = getattr(node, "lineno", "?")
+    return ResolverError(f"line {line}: {what} is not allowed in a resolver")
+
+
+def _block(stmts: list[ast.stmt]) -> Exec:
+    compiled = [_stmt(s) for s in stmts]
+
+    def run(f: _Frame) -> None:
+        for c in compiled:
+            c(f)
+
+    return run
+
+
+def _assign_to(target: ast.expr) -> Callable[[_Frame, Value], None]:
+    match target:
+        case ast.Name(id=name):
+
+            def bind(f: _Frame, v: Value) -> None:
+                f.vars[name] = v
+
+            return bind
+        case ast.Tuple(elts=elts) | ast.List(elts=elts):
+            binds = [_assign_to(e) for e in elts]
+
+            def unpack(f: _Frame, v: Value) -> None:
+                values = list(v)
+                if len(values) != len(binds):
+                    raise ResolverError("unpacking length mismatch")
+                for b, x in zip(binds, values, strict=True):
+                    b(f, x)
+
+            return unpack
+        case ast.Subscript(value=obj, slice=key) if not isinstance(key, ast.Slice):
+            get_obj, get_key = _expr(obj), _expr(key)
+
+            def setitem(f: _Frame, v: Value) -> None:
+                container = get_obj(f)
+                if not isinstance(container, (list, dict)):
+                    raise ResolverError("item assignment needs a list or dict")
+                container[get_key(f)] = v
+
+            return setitem
+        case _:
+            raise _fail(target, type(target).__name__ + " target")
+
+
+def _stmt(node: ast.stmt) -> Exec:  # noqa: C901
+    match node:
+        case ast.Expr(value=value):
+            ev = _expr(value)
+
+            def expr(f: _Frame) -> None:
+                f.run.tick()
+                ev(f)
+
+            return expr
+        case ast.Return(value=value):
+            ev = _expr(value) if value is not None else _none
+
+            def ret(f: _Frame) -> None:
+                f.run.tick()
+                raise _Return(ev(f))
+
+            return ret
+        case ast.Assign(targets=targets, value=value):
+            ev, binds = _expr(value), [_assign_to(t) for t in targets]
+
+            def assign(f: _Frame) -> None:
+                f.run.tick()
+                v = ev(f)
+                for b in binds:
+                    b(f, v)
+
+            return assign
+        case ast.AugAssign(target=ast.Name(id=name), op=op, value=value):
+            if type(op) not in _BINOPS:
+                raise _fail(node, type(op).__name__)
+            fn, ev = _BINOPS[type(op)], _expr(value)
+
+            def aug(f: _Frame) -> None:
+                f.run.tick()
+                f.vars[name] = _bounded(fn(_lookup(f, name), ev(f)))
+
+            return aug
+        case ast.If(test=test, body=body, orelse=orelse):
+            cond, then, other = _expr(test), _block(body), _block(orelse)
+
+            def if_(f: _Frame) -> None:
+                f.run.tick()
+                (then if cond(f) else other)(f)
+
+            return if_
+        case ast.For(target=target, iter=it, body=body, orelse=[]):
+            bind, ev, loop = _assign_to(target), _expr(it), _block(body)
+
+            def for_(f: _Frame) -> None:
+                f.run.tick()
+                for item in list(ev(f)):
+                    f.run.tick()
+                    bind(f, item)
+                    try:
+                        loop(f)
+                    except _Continue:
+                        continue
+                    except _Break:
+                        break
+
+            return for_
+        case ast.Pass():
+            return lambda f: None
+        case ast.Break():
+
+            def break_(f: _Frame) -> None:
+                raise _Break
+
+            return break_
+        case ast.Continue():
+
+            def continue_(f: _Frame) -> None:
+                raise _Continue
+
+            return continue_
+        case ast.FunctionDef() as fd:
+            fn = _function(fd)
+
+            def define(f: _Frame) -> None:
+                f.vars[fn.name] = fn
+
+            return define
+        case _:
+            raise _fail(node, type(node).__name__)
+
+
+def _function(fd: ast.FunctionDef) -> _Function:
+    a = fd.args
+    if a.vararg or a.kwarg or a.kwonlyargs or a.posonlyargs or fd.decorator_list:
+        raise _fail(fd, "only plain positional parameters")
+    defaults = tuple(_constant(d) for d in a.defaults)
+    return _Function(fd.name, tuple(p.arg for p in a.args), defaults, _block(fd.body))
+
+
+def _constant(node: ast.expr) -> Value:
+    if isinstance(node, ast.Constant):
+        return node.value
+    raise _fail(node, "non-constant default")
+
+
+def _lookup(f: _Frame, name: str) -> Value:
+    if name in f.vars:
+        return f.vars[name]
+    if name in f.run.globals:
+        return f.run.globals[name]
+    if name in PURE_BUILTINS:
+        return PURE_BUILTINS[name]
+    raise ResolverError(f"name {name!r} is not defined")
+
+
+def _call(f: _Frame, fn: Value, args: tuple[Value, ...]) -> Value:
+    if isinstance(fn, _Function):
+        return fn(f.run, args)
+    if isinstance(fn, _HostBuiltin):
+        f.run.effects.append(Effect(fn.name, args))
+        return None
+    if fn in PURE_BUILTINS.values():
+        return _bounded(fn(*args))
+    raise ResolverError(f"{fn!r} is not callable")
+
+
+@dataclass(frozen=True)
+class _HostBuiltin:
+    name: str
+
+
+def _expr(node: ast.expr) -> Eval:  # noqa: C901
+    match node:
+        case ast.Constant(value=value):
+            return lambda f: value
+        case ast.Name(id=name):
+            return lambda f: _lookup(f, name)
+        case ast.List(elts=elts):
+            evs = [_expr(e) for e in elts]
+            return lambda f: [e(f) for e in evs]
+        case ast.Tuple(elts=elts):
+            evs = [_expr(e) for e in elts]
+            return lambda f: tuple(e(f) for e in evs)
+        case ast.Dict(keys=keys, values=values):
+            if any(k is None for k in keys):
+                raise _fail(node, "dict unpacking")
+            pairs = [
+                (_expr(k), _expr(v)) for k, v in zip(keys, values, strict=True) if k
+            ]
+            return lambda f: {k(f): v(f) for k, v in pairs}
+        case ast.BinOp(left=left, op=op, right=right) if type(op) in _BINOPS:
+            fn, lhs, rhs = _BINOPS[type(op)], _expr(left), _expr(right)
+
+            def binop(f: _Frame) -> Value:
+                f.run.tick()
+                a, b = lhs(f), rhs(f)
+                if isinstance(op, ast.Mult):
+                    _check_repeat(a, b)
+                    _check_repeat(b, a)
+                return _bounded(fn(a, b))
+
+            return binop
+        case ast.UnaryOp(op=op, operand=operand) if type(op) in _UNARY:
+            fn, ev = _UNARY[type(op)], _expr(operand)
+            return lambda f: fn(ev(f))
+        case ast.BoolOp(op=op, values=values):
+            evs = [_expr(v) for v in values]
+            if isinstance(op, ast.And):
+
+                def and_(f: _Frame) -> Value:
+                    v: Value = True
+                    for e in evs:
+                        if not (v := e(f)):
+                            return v
+                    return v
+
+                return and_
+
+            def or_(f: _Frame) -> Value:
+                v: Value = False
+                for e in evs:
+                    if v := e(f):
+                        return v
+                return v
+
+            return or_
+        case ast.Compare(left=left, ops=ops, comparators=comps):
+            if any(type(o) not in _COMPARE for o in ops):
+                raise _fail(node, "comparison")
+            first = _expr(left)
+            rest = [
+                (_COMPARE[type(o)], _expr(c)) for o, c in zip(ops, comps, strict=True)
+            ]
+
+            def compare(f: _Frame) -> bool:
+                f.run.tick()
+                a = first(f)
+                for fn, ev in rest:
+                    b = ev(f)
+                    if not fn(a, b):
+                        return False
+                    a = b
+                return True
+
+            return compare
+        case ast.IfExp(test=test, body=body, orelse=orelse):
+            cond, then, other = _expr(test), _expr(body), _expr(orelse)
+            return lambda f: then(f) if cond(f) else other(f)
+        case ast.Subscript(value=value, slice=ast.Slice() as s):
+            ev = _expr(value)
+            parts = [_expr(p) if p else _none for p in (s.lower, s.upper, s.step)]
+            return lambda f: ev(f)[slice(*(p(f) for p in parts))]
+        case ast.Subscript(value=value, slice=key):
+            ev, k = _expr(value), _expr(key)
+            return lambda f: ev(f)[k(f)]
+        case ast.Call(func=ast.Attribute(value=obj, attr=attr), args=args, keywords=[]):
+            ev, evs = _expr(obj), [_expr(a) for a in args]
+
+            def method(f: _Frame) -> Value:
+                f.run.tick()
+                target = ev(f)
+                if attr not in METHODS.get(type(target), frozenset()):
+                    raise ResolverError(f"method {type(target).__name__}.{attr}")
+                values = tuple(e(f) for e in evs)
+                _check_method(target, attr, values)
+                out = getattr(target, attr)(*values)
+                return _bounded(
+                    list(out) if attr in ("keys", "values", "items") else out
+                )
+
+            return method
+        case ast.Call(func=func, args=args, keywords=[]):
+            if any(isinstance(a, ast.Starred) for a in args):
+                raise _fail(node, "star arguments")
+            fn_ev, evs = _expr(func), [_expr(a) for a in args]
+
+            def call(f: _Frame) -> Value:
+                f.run.tick()
+                return _call(f, fn_ev(f), tuple(e(f) for e in evs))
+
+            return call
+        case ast.ListComp(elt=elt, generators=[gen]) if not gen.is_async:
+            bind, it, ev = _assign_to(gen.target), _expr(gen.iter), _expr(elt)
+            conds = [_expr(c) for c in gen.ifs]
+
+            def listcomp(f: _Frame) -> list[Value]:
+                out: list[Value] = []
+                for item in list(it(f)):
+                    f.run.tick()
+                    bind(f, item)
+                    if all(c(f) for c in conds):
+                        out.append(ev(f))
+                return _bounded(out)
+
+            return listcomp
+        case ast.JoinedStr(values=values):
+            evs = [_expr(v) for v in values]
+            return lambda f: _bounded("".join(str(e(f)) for e in evs))
+        case ast.FormattedValue(value=value, conversion=-1, format_spec=None):
+            return _expr(value)
+        case _:
+            raise _fail(node, type(node).__name__)
+
+
+@dataclass(frozen=True)
+class Program:
+    """A checked, compiled resolver module."""
+
+    digest: str
+    body: Exec
+
+
+_programs: dict[str, Program] = {}
+_programs_lock = threading.Lock()
+
+
+def source_digest(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def compile_resolver(source: str) -> Program:
+    """Parse, check and compile ``source`` once; later calls hit the hash cache."""
+    digest = source_digest(source)
+    if (program := _programs.get(digest)) is not None:
+        return program
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        raise ResolverError(f"line {e.lineno}: {e.msg}") from e
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.Assign, ast.Expr, ast.Pass)):
+            raise _fail(node, f"top-level {type(node).__name__}")
+    program = Program(digest, _block(tree.body))
+    with _programs_lock:
+        _programs[digest] = program
+    return program
+
+
+def evaluate(
+    source: str,
+    ctx: Mapping[str, Value],
+    *,
+    steps: int = MAX_STEPS,
+    seconds: float = MAX_SECONDS,
+) -> Result:
+    """Call the resolver's ``resolve(ctx)`` under a step and time budget."""
+    program = compile_resolver(source)
+    run = _Run(steps, time.monotonic() + seconds)
+    run.globals.update({name: _HostBuiltin(name) for name in HOST_BUILTINS})
+    module = _Frame(run, run.globals)
+    try:
+        program.body(module)
+        entry = run.globals.get(ENTRY)
+        if not isinstance(entry, _Function):
+            raise ResolverError(f"resolver defines no {ENTRY}(ctx)")
+        value = entry(run, (dict(ctx),))
+    except (_Break, _Continue) as e:
+        raise ResolverError("break/continue outside a loop") from e
+    except ResolverError:
+        raise
+    except (TypeError, ValueError, KeyError, IndexError, ZeroDivisionError) as e:
+        raise ResolverError(f"{type(e).__name__}: {e}") from e
+    return Result(value, run.effects, run.used)
+
+
+def _serve(conn: Connection) -> None:
+    """Sandbox process loop: evaluate requests until the pipe closes."""
+    conn.send(None)  # ready
+    while True:
+        try:
+            source, ctx, steps, seconds = conn.recv()
+        except EOFError:
+            return
+        try:
+            conn.send((True, evaluate(source, ctx, steps=steps, seconds=seconds)))
+        except BudgetExceededError as e:
+            conn.send((False, (True, str(e))))
+        except Exception as e:  # noqa: BLE001 - reported to the parent
+            conn.send((False, (False, f"{type(e).__name__}: {e}")))
+
+
+class Sandbox:
+    """A worker process for :func:`evaluate`, killed and replaced on overrun.
+
+    The step and time budgets stop runaway resolvers in the worker; the kill
+    covers what they cannot see, such as one long C-level operation.
+    """
+
+    def __init__(self) -> None:
+        self._proc: SpawnProcess | None = None
+        self._conn: Connection | None = None
+
+    def _start(self) -> Connection:
+        mp = multiprocessing.get_context("spawn")
+        conn, child = mp.Pipe()
+        proc = mp.Process(target=_serve, args=(child,), daemon=True)
+        proc.start()
+        child.close()
+        self._proc, self._conn = proc, conn
+        if not conn.poll(SANDBOX_START_TIMEOUT):
+            self.close()
+            raise ResolverError("resolver sandbox did not start")
+        conn.recv()
+        return conn
+
+    def evaluate(
+        self,
+        source: str,
+        ctx: Mapping[str, Value],
+        *,
+        steps: int = MAX_STEPS,
+        seconds: float = MAX_SECONDS,
+        timeout: float | None = None,
+    ) -> Result:
+        """:func:`evaluate` in the worker; kill it after ``timeout`` seconds.
+
+        ``timeout`` defaults to the time budget plus ``KILL_GRACE``.
+        """
+        conn = self._conn or self._start()
+        timeout = seconds + KILL_GRACE if timeout is None else timeout
+        try:
+            conn.send((source, dict(ctx), steps, seconds))
+            if not conn.poll(timeout):
+                self.close()
+                raise BudgetExceededError(f"killed after {timeout:g}s")
+            ok, payload = conn.recv()
+        except (pickle.PicklingError, TypeError) as e:
+            raise ResolverError(f"context cannot be sent to the sandbox: {e}") from e
+        except (EOFError, OSError) as e:
+            self.close()
+            raise ResolverError("resolver sandbox died") from e
+        if ok:
+            return payload
+        budget, message = payload
+        raise (BudgetExceededError if budget else ResolverError)(message)
+
+    def close(self) -> None:
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._proc = self._conn = None
+
+
+# ── front matter ────────────────────────────────────────────────────
+
+
+def read_front_matter(text: str) -> dict[str, Value]:
+    if not text.startswith("---\n"):
+        return {}
+    end = text.find("\n---", 4)
+    if end < 0:
+        return {}
+    try:
+        data = yaml.safe_load(text[4:end])
+    except yaml.YAMLError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def read_resolver(gen_path: Path) -> str | None:
+    try:
+        text = gen_path.read_text()
+    except (OSError, UnicodeDecodeError):
+        return None
+    source = read_front_matter(text).get("resolver")
+    return source if isinstance(source, str) and source.strip() else None
+
+
+def resolver_front_matter(source: str) -> str:
+    """``resolver: |`` YAML block for a gen file's front matter."""
+    body = "".join(f"  {line}\n" if line else "\n" for line in source.splitlines())
+    return f"resolver: |\n{body}"
+
+
+# ── host ────────────────────────────────────────────────────────────
+
+
+@dataclass
+class Host:
+    """Evaluates resolvers and performs their effects off the caller's thread.
+
+    At most ``workers`` evaluations run at once and at most ``max_pending``
+    are queued; beyond that, submissions are dropped and counted.
+    """
+
+    cwd: Path
+    workers: int = 2
+    max_pending: int = 32
+    dropped: int = 0
+    errors: list[str] = field(default_factory=list[str])
+    notify: Callable[[str], None] = print
+
+    def __post_init__(self) -> None:
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="resolver")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._local = threading.local()
+        self._sandboxes: list[Sandbox] = []
+
+    def _sandbox(self) -> Sandbox:
+        """The calling pool thread's sandbox, started on first use."""
+        sandbox: Sandbox | None = getattr(self._local, "sandbox", None)
+        if sandbox is None:
+            sandbox = self._local.sandbox = Sandbox()
+            self._sandboxes.append(sandbox)
+        return sandbox
+
+    def submit(self, source: str, ctx: Mapping[str, Value]) -> Future[Result] | None:
+        if not self._slots.acquire(blocking=False):
+            self.dropped += 1
+            return None
+        try:
+            fut = self._pool.submit(self._resolve, source, dict(ctx))
+        except RuntimeError:  # pool shut down
+            self._slots.release()
+            return None
+        fut.add_done_callback(lambda _: self._slots.release())
+        return fut
+
+    def _resolve(self, source: str, ctx: dict[str, Value]) -> Result:
+        try:
+            result = self._sandbox().evaluate(source, ctx)
+        except ResolverError as e:
+            self.errors.append(f"{ctx.get('contract')}: {e}")
+            self.notify(f"resolver: {ctx.get('contract')}: {e}")
+            raise
+        for effect in result.effects:
+            self.perform(effect)
+        return result
+
+    def perform(self, effect: Effect) -> None:
+        match effect:
+            case Effect("notify", args):
+                self.notify(" ".join(str(a) for a in args))
+            case Effect("run", (str() as command,)):
+                proc = subprocess.run(
+                    shlex.split(command),
+                    cwd=self.cwd,
+                    capture_output=True,
+                    text=True,
+                    timeout=RUN_TIMEOUT,
+                    check=False,
+                )
+                self.notify(f"run: {command} → exit {proc.returncode}")
+            case _:
+                self.notify(f"resolver: bad call {effect.name}{effect.args!r}")
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        for sandbox in self._sandboxes:
+            sandbox.close()
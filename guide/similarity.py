@@ -0,0 +1,319 @@
+"""MinHash signatures and an LSH index for contract-to-code similarity.
+
+Text is cut into lowercase tokens (words and single punctuation marks),
+each token is hashed with crc32, and every run of ``SHINGLE`` tokens becomes
+one shingle hash. A signature is the minimum of ``NUM_PERM`` multiply-shift
+hashes over a text's shingles, taken in one NumPy broadcast; the fraction of
+positions where two signatures agree estimates the Jaccard similarity J of
+their shingle sets. Scores are containment, the share of a contract's
+shingles found in a code region: ``J * (|a| + |b|) / ((1 + J) * |a|)``, so a
+short contract inside a longer region still scores high.
+
+Code files are signed per region of two ``STRIDE``-line blocks, overlapping
+by one block, so a contract can match the part of a file that implements
+it. Each block is signed once and a region's signature is the elementwise
+minimum of its two blocks'. All blocks of a file are reduced in one
+``np.minimum.reduceat`` over the permuted shingle hashes.
+
+:class:`LSHIndex` cuts signatures into ``BANDS`` bands of ``ROWS`` values.
+Regions that agree on a whole band share a bucket, and a query compares
+only against its bucket mates: pairs with similarity s become candidates
+with probability ``1 - (1 - s**ROWS) ** BANDS``. Buckets are sorted key
+arrays probed with ``searchsorted``; files replaced while watching go to a
+small dict overlay until it is worth re-sorting.
+"""
+
+import re
+import zlib
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import cache, lru_cache
+from itertools import repeat
+from pathlib import Path
+from typing import Self
+
+import numpy as np
+
+NUM_PERM = 128
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+SHINGLE = 4
+STRIDE = 10
+"""Lines per block; a region spans two blocks."""
+CHUNK = 8192
+"""Shingles permuted at once: bounds the (NUM_PERM, CHUNK) scratch array."""
+PARALLEL_MIN_FILES = 64
+"""Below this many files a process pool costs more than it saves."""
+REBUILD_FRACTION = 0.25
+"""Re-sort the buckets once the overlay holds this share of all regions."""
+
+_TOKEN = re.compile(r"\w+|[^\w\s]|\n")
+_MIX = np.uint64(0x100000001B3)
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 2**63, NUM_PERM, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+_BAND_MIX = _rng.integers(1, 2**63, ROWS, dtype=np.uint64) | np.uint64(1)
+_MAX = np.iinfo(np.uint32).max
+_NEWLINE = 1 << 40
+"""Hash of a newline token; crc32 never produces it."""
+EMPTY = np.full(NUM_PERM, _MAX, dtype=np.uint32)
+"""Signature of a text without tokens; neutral under elementwise minimum."""
+
+type Signature = np.ndarray
+
+
+@cache
+def _token_hash(token: str) -> int:
+    return _NEWLINE if token == "\n" else zlib.crc32(token.encode())
+
+
+def _hashes(text: str) -> np.ndarray:
+    """Token hashes of ``text``, newlines included as ``_NEWLINE``."""
+    return np.array(
+        list(map(_token_hash, _TOKEN.findall(text.lower()))), dtype=np.uint64
+    )
+
+
+def shingles(hashes: np.ndarray, k: int = SHINGLE) -> np.ndarray:
+    """Hash of each run of ``k`` token hashes; one shingle if there are fewer."""
+    n = len(hashes)
+    if n == 0:
+        return hashes
+    k = min(k, n)
+    out = hashes[: n - k + 1].copy()
+    for j in range(1, k):
+        out = out * _MIX + hashes[j : n - k + 1 + j]
+    return out
+
+
+def _permuted(sh: np.ndarray) -> np.ndarray:
+    x = (sh ^ (sh >> np.uint64(32))) & np.uint64(_MAX)
+    return (_A[:, None] * x[None, :] + _B[:, None]) >> np.uint64(32)
+
+
+def minhash(sh: np.ndarray, bounds: np.ndarray | None = None) -> np.ndarray:
+    """MinHash signatures of the segments ``sh[bounds[i]:bounds[i + 1]]``.
+
+    Without ``bounds``, the signature of all of ``sh``. Empty segments get
+    :data:`EMPTY`.
+    """
+    if bounds is None:
+        return minhash(sh, np.array([0, len(sh)]))[0]
+    n = len(bounds) - 1
+    out = np.full((n, NUM_PERM), _MAX, dtype=np.uint32)
+    b = 0
+    while b < n:
+        e = b + 1
+        while e < n and bounds[e + 1] - bounds[b] <= CHUNK:
+            e += 1
+        lo, hi = bounds[b], bounds[e]
+        nonempty = np.flatnonzero(bounds[b + 1 : e + 1] > bounds[b:e])
+        if len(nonempty):
+            perm = _permuted(sh[lo:hi])
+            mins = np.minimum.reduceat(perm, bounds[b:e][nonempty] - lo, axis=1)
+            out[b + nonempty] = mins.T
+        b = e
+    return out
+
+
+@dataclass(frozen=True)
+class Sketch:
+    """Signature and shingle count of a whole text, e.g. a contract body."""
+
+    sig: Signature
+    size: int
+
+
+@lru_cache(maxsize=4096)
+def text_sketch(text: str) -> Sketch:
+    h = _hashes(text)
+    sh = shingles(h[h != _NEWLINE])
+    return Sketch(minhash(sh), len(sh))
+
+
+def containment(sketch: Sketch, sigs: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """Estimated share of the sketch's shingles in each row's region."""
+    if not sketch.size or not len(sigs):
+        return np.zeros(len(sigs))
+    j = (sigs == sketch.sig).mean(axis=1)
+    shared = j * (sketch.size + sizes) / (1 + j)
+    return np.minimum(shared / sketch.size, 1.0)
+
+
+@dataclass(frozen=True)
+class Region:
+    path: str
+    start: int
+    """First line, 1-based."""
+    end: int
+    """Last line, inclusive."""
+
+
+@dataclass(frozen=True)
+class Signed:
+    """A code file's regions with their signatures and shingle counts."""
+
+    regions: list[Region]
+    sigs: np.ndarray
+    sizes: np.ndarray
+
+    def best(self, sketch: Sketch) -> float:
+        scores = containment(sketch, self.sigs, self.sizes)
+        return float(scores.max()) if len(scores) else 0.0
+
+
+def sign_code(rel: str, text: str) -> Signed:
+    """Sign each region of a code file."""
+    h = _hashes(text)
+    newline = h == _NEWLINE
+    # token index at the start of each line, then the token count
+    first = np.concatenate([[0], np.cumsum(~newline)[newline]])
+    if not text.endswith("\n"):
+        first = np.append(first, len(h) - newline.sum())
+    lines = len(first) - 1
+    sh = shingles(h[~newline])
+    bounds = np.minimum(first[np.r_[0:lines:STRIDE, lines]], len(sh))
+    blocks, counts = minhash(sh, bounds), np.diff(bounds)
+    if len(blocks) == 1:
+        return Signed([Region(rel, 1, lines)], blocks, counts)
+    regions = [
+        Region(rel, i * STRIDE + 1, min((i + 2) * STRIDE, lines))
+        for i in range(len(blocks) - 1)
+    ]
+    return Signed(
+        regions, np.minimum(blocks[:-1], blocks[1:]), counts[:-1] + counts[1:]
+    )
+
+
+def _sign_path(root: Path, rel: str) -> Signed | None:
+    try:
+        return sign_code(rel, (root / rel).read_text())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def sign_files(root: Path, rels: list[str]) -> dict[str, Signed]:
+    """Sign code files under ``root``, in a process pool for large trees."""
+    if len(rels) < PARALLEL_MIN_FILES:
+        signed = [_sign_path(root, rel) for rel in rels]
+    else:
+        with ProcessPoolExecutor() as pool:
+            signed = list(pool.map(_sign_path, repeat(root), rels, chunksize=32))
+    return {rel: s for rel, s in zip(rels, signed, strict=True) if s is not None}
+
+
+def band_keys(sigs: np.ndarray) -> np.ndarray:
+    """One bucket key per band, shape ``(len(sigs), BANDS)``."""
+    x = sigs.reshape(len(sigs), BANDS, ROWS).astype(np.uint64)
+    return (x * _BAND_MIX).sum(axis=2, dtype=np.uint64)
+
+
+type RegionId = tuple[str, int]
+
+
+@dataclass
+class LSHIndex:
+    """Regions of many files in LSH buckets; a file is replaced as a whole."""
+
+    files: dict[str, Signed] = field(default_factory=dict[str, Signed])
+    _ids: list[RegionId] = field(default_factory=list[RegionId])
+    _alive: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    _keys: np.ndarray = field(
+        default_factory=lambda: np.zeros((BANDS, 0), dtype=np.uint64)
+    )
+    """Per band, the sorted bucket keys of the indexed regions."""
+    _order: np.ndarray = field(
+        default_factory=lambda: np.zeros((BANDS, 0), dtype=np.intp)
+    )
+    """Per band, the index into ``_ids`` of each entry of ``_keys``."""
+    _base: dict[str, range] = field(default_factory=dict[str, range])
+    _fresh: dict[str, np.ndarray] = field(default_factory=dict[str, np.ndarray])
+    _overlay: dict[tuple[int, int], set[RegionId]] = field(
+        default_factory=dict[tuple[int, int], set[RegionId]]
+    )
+
+    @classmethod
+    def build(cls, files: dict[str, Signed]) -> Self:
+        index = cls(dict(files))
+        index._sort()
+        return index
+
+    def _sort(self) -> None:
+        self._ids = [
+            (rel, i) for rel, s in self.files.items() for i in range(len(s.regions))
+        ]
+        self._base, pos = {}, 0
+        for rel, s in self.files.items():
+            self._base[rel] = range(pos, pos + len(s.regions))
+            pos += len(s.regions)
+        keys = [band_keys(s.sigs) for s in self.files.values()]
+        flat = np.concatenate(keys).T if keys else np.zeros((BANDS, 0), np.uint64)
+        self._order = np.argsort(flat, axis=1, kind="stable")
+        self._keys = np.take_along_axis(flat, self._order, axis=1)
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._fresh.clear()
+        self._overlay.clear()
+
+    def _overlay_entries(
+        self, rel: str, keys: np.ndarray
+    ) -> Iterator[tuple[tuple[int, int], RegionId]]:
+        for i, row in enumerate(keys.tolist()):
+            for band, key in enumerate(row):
+                yield (band, key), (rel, i)
+
+    def remove(self, rel: str) -> None:
+        self.files.pop(rel, None)
+        if (span := self._base.pop(rel, None)) is not None:
+            self._alive[span.start : span.stop] = False
+        if (keys := self._fresh.pop(rel, None)) is not None:
+            for bucket, rid in self._overlay_entries(rel, keys):
+                members = self._overlay[bucket]
+                members.discard(rid)
+                if not members:
+                    del self._overlay[bucket]
+
+    def add(self, rel: str, signed: Signed) -> None:
+        self.remove(rel)
+        self.files[rel] = signed
+        self._fresh[rel] = keys = band_keys(signed.sigs)
+        for bucket, rid in self._overlay_entries(rel, keys):
+            self._overlay.setdefault(bucket, set()).add(rid)
+        fresh = sum(len(k) for k in self._fresh.values())
+        if fresh > REBUILD_FRACTION * max(len(self._ids), 1024):
+            self._sort()
+
+    def score(self, rel: str, sketch: Sketch) -> float:
+        """Best score of a region of ``rel`` against ``sketch``, 0 if unknown."""
+        signed = self.files.get(rel)
+        return signed.best(sketch) if signed else 0.0
+
+    def candidates(self, sig: Signature) -> set[RegionId]:
+        """Regions sharing at least one band bucket with ``sig``."""
+        keys = band_keys(sig[None, :])[0]
+        parts: list[np.ndarray] = []
+        for b, key in enumerate(keys):
+            row = self._keys[b]
+            lo, hi = row.searchsorted(key, "left"), row.searchsorted(key, "right")
+            parts.append(self._order[b, lo:hi])
+        hits = np.unique(np.concatenate(parts))
+        found: set[RegionId] = {self._ids[i] for i in hits[self._alive[hits]].tolist()}
+        for bucket in enumerate(keys.tolist()):
+            found |= self._overlay.get(bucket, set())
+        return found
+
+    def query(self, sketch: Sketch, k: int = 3) -> list[tuple[Region, float]]:
+        """The ``k`` best-scoring regions among the candidates of ``sketch``."""
+        if not sketch.size:
+            return []
+        cands = sorted(self.candidates(sketch.sig))
+        if not cands:
+            return []
+        sigs = np.stack([self.files[rel].sigs[i] for rel, i in cands])
+        sizes = np.array([self.files[rel].sizes[i] for rel, i in cands])
+        scores = containment(sketch, sigs, sizes)
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [
+            (self.files[cands[j][0]].regions[cands[j][1]], float(scores[j]))
+            for j in top
+        ]
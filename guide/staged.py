@@ -0,0 +1,86 @@
+"""Read what is staged in a git index without touching the worktree.
+
+One ``git diff --cached --raw`` lists the staged paths with their blob ids,
+and one ``git cat-file --batch`` streams the blobs, so a pre-commit check
+sees exactly what will be committed (partially staged files included) for
+two subprocesses, however many files are staged.
+"""
+
+import os
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+
+REGULAR_MODES = frozenset({"100644", "100755"})
+"""Symlinks and submodules have no content to check."""
+
+
+@dataclass(frozen=True)
+class StagedFile:
+    path: str
+    """Path relative to the repository root, with forward slashes."""
+    sha: str
+    """Blob id of the staged content."""
+
+
+def git_dir(repo: Path) -> Path:
+    """The repository's git directory, resolving worktree ``.git`` files."""
+    if env := os.environ.get("GIT_DIR"):
+        return (repo / env).resolve()
+    dot = repo / ".git"
+    if dot.is_file():
+        gitdir = dot.read_text().removeprefix("gitdir:").strip()
+        return (repo / gitdir).resolve()
+    return dot
+
+
+def staged_files(repo: Path) -> list[StagedFile]:
+    """Regular files added, copied or modified in the index, against HEAD."""
+    out = subprocess.run(
+        [
+            "git",
+            "diff",
+            "--cached",
+            "--raw",
+            "-z",
+            "--no-abbrev",
+            "--no-renames",
+            "--diff-filter=ACM",
+        ],
+        cwd=repo,
+        capture_output=True,
+        check=True,
+    ).stdout
+    fields = out.split(b"\0")
+    staged: list[StagedFile] = []
+    # -z raw output: ":<old mode> <new mode> <old sha> <new sha> <status>\0<path>\0"
+    for meta, path in zip(fields[0::2], fields[1::2], strict=False):
+        _, mode, _, sha, _ = meta.decode().split(" ")
+        if mode in REGULAR_MODES:
+            staged.append(StagedFile(os.fsdecode(path), sha))
+    return staged
+
+
+def read_blobs(repo: Path, shas: list[str]) -> dict[str, bytes]:
+    """Contents of the given blobs, from one ``git cat-file --batch``."""
+    if not shas:
+        return {}
+    out = subprocess.run(
+        ["git", "cat-file", "--batch"],
+        cwd=repo,
+        input="".join(f"{sha}\n" for sha in shas).encode(),
+        capture_output=True,
+        check=True,
+    ).stdout
+    blobs: dict[str, bytes] = {}
+    pos = 0
+    while pos < len(out):
+        end = out.index(b"\n", pos)
+        sha, kind, *rest = out[pos:end].decode().split(" ")
+        pos = end + 1
+        if kind == "missing":
+            continue
+        size = int(rest[0])
+        blobs[sha] = out[pos : pos + size]
+        pos += size + 1  # content is followed by a newline
+    return blobs
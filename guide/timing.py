@@ -0,0 +1,111 @@
+"""Phase-level span timing appended to a local JSONL metrics store.
+
+One record per entry-point invocation::
+
+    {"ts": 1760000000.0, "command": "check", "spans": [["startup", 0.21], ...]}
+
+Spans are collected in memory and flushed with a single append on exit, so
+instrumentation costs one ``open(..., "a")`` per run.
+"""
+
+import json
+import os
+import time
+from collections.abc import Awaitable, Generator, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from guide.paths import RESULTS_DIR, TIMINGS_FILE_NAME
+
+TIMINGS_PATH = RESULTS_DIR / TIMINGS_FILE_NAME
+
+type Span = tuple[str, float]
+
+
+@dataclass
+class Recorder:
+    command: str
+    spans: list[Span] = field(default_factory=list[Span])
+    ts: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "ts": self.ts,
+                "command": self.command,
+                "spans": [[name, round(secs, 6)] for name, secs in self.spans],
+            }
+        )
+
+
+_active: Recorder | None = None
+
+
+def process_age() -> float | None:
+    """Seconds since process start (Linux only); approximates interpreter startup."""
+    try:
+        stat = Path("/proc/self/stat").read_text()
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+    except OSError:
+        return None
+    start_ticks = int(stat.rsplit(")", 1)[1].split()[19])
+    return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+@contextmanager
+def span(name: str) -> Generator[None]:
+    """Time a phase of the active recording. No-op outside ``record``."""
+    rec = _active
+    if rec is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        rec.spans.append((name, time.perf_counter() - t0))
+
+
+async def timed[T](name: str, aw: Awaitable[T]) -> T:
+    with span(name):
+        return await aw
+
+
+@contextmanager
+def record(command: str, path: Path = TIMINGS_PATH) -> Generator[Recorder]:
+    """Collect spans for one invocation and append them to ``path`` on exit."""
+    global _active
+    rec = Recorder(command)
+    if (age := process_age()) is not None:
+        rec.spans.append(("startup", age))
+    prev, _active = _active, rec
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec.spans.append(("total", time.perf_counter() - t0))
+        _active = prev
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a") as f:
+                f.write(rec.to_json() + "\n")
+        except OSError:
+            pass
+
+
+def load(path: Path = TIMINGS_PATH) -> Iterator[Recorder]:
+    if not path.exists():
+        return
+    for line in path.read_text().splitlines():
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        yield Recorder(
+            item["command"],
+            [(str(n), float(s)) for n, s in item.get("spans", [])],
+            float(item.get("ts", 0.0)),
+        )
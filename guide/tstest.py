@@ -0,0 +1,206 @@
+"""TypeScript test discovery and vitest/jest JSON result ingestion.
+
+Discovery is a single regex tokenizer pass per file (comments and strings are
+skipped, brackets are tracked to know which ``describe`` a call sits in), so
+no Node process is started. Nodeids are ``path::suite::...::case``, the same
+shape the JSON reporters produce from ``ancestorTitles`` and ``title``.
+"""
+
+import ast
+import json
+import os
+import re
+import subprocess
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+TEST_FILE = re.compile(r"\.(test|spec)\.[cm]?[jt]sx?$")
+SKIP_DIRS = frozenset({"node_modules", "dist", "build", "coverage"})
+SUITES = frozenset({"describe", "suite"})
+PARALLEL_MIN_FILES = 32
+"""Below this many files a process pool costs more than it saves."""
+CHUNK_SIZE = 1 << 16
+SEPARATORS = " \t\r\n,"
+
+_TOKEN = re.compile(
+    r"""
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<call>(?<![.\w$])(?P<kind>describe|suite|it|test)
+        (?:\s*\.\s*(?:only|skip|todo|concurrent|sequential|fails))*\s*\(\s*)
+    |(?P<str>'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\\n])*"|`(?:\\.|[^`\\])*`)
+    |(?P<open>[(\[{])
+    |(?P<close>[)\]}])
+    """,
+    re.DOTALL | re.VERBOSE,
+)
+_STRING = re.compile(r"""'(?:\\.|[^'\\\n])*'|"(?:\\.|[^"\\\n])*"|`(?:\\.|[^`\\])*`""")
+
+
+def _title(literal: str) -> str:
+    if literal[0] == "`":
+        return literal[1:-1]
+    try:
+        return ast.literal_eval(literal)
+    except (ValueError, SyntaxError):
+        return literal[1:-1]
+
+
+def case_titles(source: str) -> Iterator[tuple[str, ...]]:
+    """Title paths (suites..., case) of the tests declared in one source file."""
+    depth = 0
+    suites: list[tuple[int, str | None]] = []  # (paren depth, title)
+    for m in _TOKEN.finditer(source):
+        if m["call"] is not None:
+            depth += 1
+            lit = _STRING.match(source, m.end())
+            title = _title(lit[0]) if lit else None
+            if m["kind"] in SUITES:
+                suites.append((depth, title))
+            elif title is not None and all(t is not None for _, t in suites):
+                yield (*(t for _, t in suites if t is not None), title)
+        elif m["open"] is not None:
+            depth += 1
+        elif m["close"] is not None:
+            if suites and suites[-1][0] == depth:
+                suites.pop()
+            depth -= 1
+
+
+@cache
+def _file_nodeids(path: Path, rel: str, _mtime_ns: int) -> tuple[str, ...]:
+    try:
+        source = path.read_text()
+    except (OSError, UnicodeDecodeError):
+        return ()
+    return tuple("::".join((rel, *titles)) for titles in case_titles(source))
+
+
+def _nodeids(path: Path, rel: str) -> tuple[str, ...]:
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except OSError:
+        return ()
+    return _file_nodeids(path, rel, mtime_ns)
+
+
+def ts_test_files(base_dir: Path) -> Iterator[Path]:
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in SKIP_DIRS]
+        for name in files:
+            if TEST_FILE.search(name):
+                yield Path(root) / name
+
+
+def discover_ts_tests(base_dir: Path) -> Iterator[str]:
+    """Discover test nodeids in TS/JS test files, in parallel for large trees."""
+    files = sorted(ts_test_files(base_dir))
+    rels = [f.relative_to(base_dir).as_posix() for f in files]
+    if len(files) < PARALLEL_MIN_FILES:
+        for path, rel in zip(files, rels, strict=True):
+            yield from _nodeids(path, rel)
+        return
+    with ProcessPoolExecutor() as pool:
+        for ids in pool.map(_nodeids, files, rels, chunksize=16):
+            yield from ids
+
+
+def _array_start(buf: str, marker: str) -> int:
+    i = buf.find(marker)
+    j = buf.find("[", i + len(marker)) if i >= 0 else -1
+    return j + 1 if j >= 0 else -1
+
+
+def _stream_array(path: Path, key: str) -> Iterator[dict[str, Any]]:
+    """Yield elements of the top-level ``key`` array without loading the document."""
+    decoder = json.JSONDecoder()
+    marker = f'"{key}"'
+    with path.open() as f:
+        buf = ""
+        while (pos := _array_start(buf, marker)) < 0:
+            if not (chunk := f.read(CHUNK_SIZE)):
+                return
+            buf += chunk
+        eof = False
+        while True:
+            while pos < len(buf) and buf[pos] in SEPARATORS:
+                pos += 1
+            if buf.startswith("]", pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    return
+                chunk = f.read(CHUNK_SIZE)
+                eof = not chunk
+                buf, pos = buf[pos:] + chunk, 0
+                continue
+            yield item
+
+
+@dataclass(frozen=True)
+class CaseResult:
+    nodeid: str
+    status: str
+    duration: float
+    stop: float
+
+
+def iter_results(results_file: Path, base_dir: Path) -> Iterator[CaseResult]:
+    """Stream passed/failed cases from a vitest or jest JSON report."""
+    root = base_dir.resolve()
+    for file_result in _stream_array(results_file, "testResults"):
+        name = Path(file_result.get("name", ""))
+        rel = (name.relative_to(root) if name.is_absolute() else name).as_posix()
+        stop = float(file_result.get("endTime") or 0) / 1000
+        for case in file_result.get("assertionResults", []):
+            if case.get("status") not in ("passed", "failed"):
+                continue
+            titles = (*case.get("ancestorTitles", []), case["title"])
+            yield CaseResult(
+                "::".join((rel, *titles)),
+                case["status"],
+                float(case.get("duration") or 0) / 1000,
+                stop,
+            )
+
+
+def merge_results(target: Path, *reports: Path) -> None:
+    """Merge fresh JSON reports into ``target``; fresh files replace stale ones."""
+    fresh: dict[str, dict[str, Any]] = {}
+    for report in reports:
+        if report.exists():
+            for item in _stream_array(report, "testResults"):
+                fresh[item.get("name", "")] = item
+    kept = (
+        [i for i in _stream_array(target, "testResults") if i.get("name") not in fresh]
+        if target.exists()
+        else []
+    )
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"testResults": [*kept, *fresh.values()]}))
+    tmp.replace(target)
+
+
+def runner(base_dir: Path) -> list[str]:
+    """Command line of the project's test runner with its JSON reporter enabled."""
+    try:
+        pkg = json.loads((base_dir / "package.json").read_text())
+    except (OSError, json.JSONDecodeError):
+        pkg = {}
+    deps = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
+    if "jest" in deps and "vitest" not in deps:
+        return ["npx", "jest", "--json"]
+    return ["npx", "vitest", "run", "--reporter=json"]
+
+
+def run_ts(base_dir: Path, files: Iterable[str], report: Path) -> int:
+    """Run the given test files (all if empty), writing a JSON report."""
+    report.parent.mkdir(parents=True, exist_ok=True)
+    cmd = [*runner(base_dir), f"--outputFile={report}", *files]
+    return subprocess.run(cmd, cwd=base_dir, check=False).returncode
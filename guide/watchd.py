@@ -0,0 +1,286 @@
+"""Shared file watching: one watcher per root for every guide tool on the box.
+
+``guide watchd`` listens on a Unix socket. A client sends one JSON line
+naming the roots it wants, gets ``{"ok": true}`` back, then reads one JSON
+line per batch of changes under those roots::
+
+    -> {"roots": ["/home/me/repo"]}
+    <- {"ok": true}
+    <- {"deltas": [[2, "/home/me/repo/spec.md"]]}
+
+The server runs a single ``awatch`` per root, shared by all its clients; a
+root inside an already-watched root reuses that watcher. It batches with a
+short debounce and each client coalesces batches to its own debounce, so
+``guide drift``, ``guide watch`` and ``guide check --watch`` across N
+workspaces cost one scan and one inotify set per workspace. Clients
+disconnect by closing the socket; the last one out stops the watcher.
+
+:func:`watch_deltas` is the client side, a drop-in for ``awatch``: without
+a server, or when the server goes away, it watches locally.
+
+The server also keeps pyright language servers warm for one-shot callers
+such as ``guide check --hook``, which would otherwise start one per edit::
+
+    -> {"pyright": {"root": "/home/me/repo", "path": "...", "content": "..."}}
+    <- {"diagnostics": [{"path": "...", "line": 3, ...}]}
+
+:func:`pyright_check` is that client side; it returns None without a server.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+from collections.abc import AsyncGenerator, Callable
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from watchfiles import Change, awatch  # type: ignore[import-untyped]
+
+from guide import pyright
+from guide.utils import make_watch_filter
+
+SOCKET_ENV = "GUIDE_WATCHD_SOCKET"
+SERVER_DEBOUNCE_MS = 50
+STEP_MS = 50
+"""Clients yield once no batch has arrived for this long."""
+CONNECT_TIMEOUT = 2.0
+PYRIGHT_TIMEOUT = pyright.CHECK_TIMEOUT + 5.0
+"""Client wait for a pyright reply, which may include starting the server."""
+MAX_BUFFER = 1 << 20
+"""Clients that fall this many bytes behind are dropped."""
+
+type Delta = tuple[Change, str]
+type Filter = Callable[[Change, str], bool]
+
+
+class ServerRunningError(RuntimeError):
+    pass
+
+
+def socket_path() -> Path:
+    if env := os.environ.get(SOCKET_ENV):
+        return Path(env)
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(base) / f"guide-watchd-{os.getuid()}.sock"
+
+
+def _under(path: str, root: Path) -> bool:
+    r = str(root)
+    return path == r or path.startswith(r.rstrip(os.sep) + os.sep)
+
+
+@dataclass(eq=False)
+class _Client:
+    writer: asyncio.StreamWriter
+    roots: list[Path]
+
+    def send(self, deltas: set[Delta]) -> bool:
+        """Queue the deltas under this client's roots; False if it must go."""
+        mine = [[int(c), p] for c, p in deltas if any(_under(p, r) for r in self.roots)]
+        if not mine:
+            return True
+        if self.writer.is_closing():
+            return False
+        self.writer.write(json.dumps({"deltas": mine}).encode() + b"\n")
+        return self.writer.transport.get_write_buffer_size() <= MAX_BUFFER
+
+
+@dataclass(eq=False)
+class _RootWatch:
+    root: Path
+    clients: set[_Client] = field(default_factory=set[_Client])
+    stop: asyncio.Event = field(default_factory=asyncio.Event)
+    task: asyncio.Task[None] | None = None
+
+
+@dataclass
+class Server:
+    path: Path
+    watches: dict[Path, _RootWatch] = field(default_factory=dict[Path, _RootWatch])
+
+    async def serve(self, ready: asyncio.Event | None = None) -> None:
+        if (conn := await _connect(self.path, [])) is not None:
+            conn[1].close()
+            raise ServerRunningError(f"watchd already serving {self.path}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        server = await asyncio.start_unix_server(self._serve_client, path=self.path)
+        try:
+            async with server:
+                if ready is not None:
+                    ready.set()
+                await server.serve_forever()
+        finally:
+            for w in list(self.watches.values()):
+                w.stop.set()
+            self.path.unlink(missing_ok=True)
+            await pyright.shutdown()
+
+    def _attach(self, root: Path, client: _Client) -> _RootWatch:
+        w = next(
+            (w for r, w in self.watches.items() if r == root or r in root.parents),
+            None,
+        )
+        if w is None:
+            w = self.watches[root] = _RootWatch(root)
+            w.task = asyncio.create_task(self._run(w))
+            print(f"watchd: watching {root}")  # noqa: T201
+        w.clients.add(client)
+        return w
+
+    def _detach(self, w: _RootWatch, client: _Client) -> None:
+        w.clients.discard(client)
+        if not w.clients and self.watches.get(w.root) is w:
+            w.stop.set()
+            del self.watches[w.root]
+            print(f"watchd: released {w.root}")  # noqa: T201
+
+    async def _run(self, w: _RootWatch) -> None:
+        try:
+            async for deltas in awatch(
+                w.root,
+                debounce=SERVER_DEBOUNCE_MS,
+                watch_filter=make_watch_filter(w.root),
+                stop_event=w.stop,
+            ):
+                for client in list(w.clients):
+                    if not client.send(deltas):
+                        client.writer.close()
+                        self._detach(w, client)
+        finally:
+            # the watcher died (e.g. root removed): clients fall back to local
+            for client in w.clients:
+                client.writer.close()
+
+    async def _serve_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        client = _Client(writer, [])
+        watches: list[_RootWatch] = []
+        try:
+            hello = json.loads(await reader.readline() or b"{}")
+            if "pyright" in hello:
+                writer.write(json.dumps(await _pyright(hello["pyright"])).encode())
+                writer.write(b"\n")
+                await writer.drain()
+                return
+            client.roots = [Path(r) for r in hello.get("roots", [])]
+            for root in client.roots:
+                if (w := self._attach(root, client)) not in watches:
+                    watches.append(w)
+            writer.write(b'{"ok": true}\n')
+            await reader.read()  # returns at EOF, when the client goes away
+        except (json.JSONDecodeError, ConnectionError):
+            pass
+        finally:
+            for w in watches:
+                self._detach(w, client)
+            writer.close()
+
+
+async def _pyright(req: dict[str, Any]) -> dict[str, Any]:
+    """Check one file on the warm server for its root."""
+    try:
+        server = await pyright.server_for(Path(req["root"]))
+        found = await server.check(Path(req["path"]), req["content"])
+    except TimeoutError:
+        return {"error": "timeout"}
+    except (OSError, KeyError) as e:
+        return {"error": str(e)}
+    return {"diagnostics": [asdict(d) for ds in found.values() for d in ds]}
+
+
+async def pyright_check(
+    root: Path, path: Path, content: str
+) -> list[pyright.Diagnostic] | None:
+    """Diagnostics from the server's pyright for ``root``; None without a server.
+
+    Raises ``TimeoutError`` when the server's pyright did not answer in time.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(socket_path()), CONNECT_TIMEOUT
+        )
+    except (OSError, TimeoutError):
+        return None
+    req = {"root": str(root), "path": str(path), "content": content}
+    try:
+        writer.write(json.dumps({"pyright": req}).encode() + b"\n")
+        line = await asyncio.wait_for(reader.readline(), PYRIGHT_TIMEOUT)
+    except OSError:
+        return None
+    finally:
+        writer.close()
+    reply = json.loads(line or b"{}")
+    if reply.get("error") == "timeout":
+        raise TimeoutError
+    if "diagnostics" not in reply:
+        return None
+    return [pyright.Diagnostic(**d) for d in reply["diagnostics"]]
+
+
+async def _connect(
+    path: Path, roots: list[Path]
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter] | None:
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(path), CONNECT_TIMEOUT
+        )
+    except (OSError, TimeoutError):
+        return None
+    try:
+        writer.write(json.dumps({"roots": [str(r) for r in roots]}).encode() + b"\n")
+        ok = await asyncio.wait_for(reader.readline(), CONNECT_TIMEOUT)
+    except (OSError, TimeoutError):
+        ok = b""
+    if not ok:
+        writer.close()
+        return None
+    return reader, writer
+
+
+def _decode(line: bytes) -> set[Delta]:
+    return {(Change(c), p) for c, p in json.loads(line)["deltas"]}
+
+
+async def _coalesce(
+    reader: asyncio.StreamReader, debounce: int
+) -> AsyncGenerator[set[Delta]]:
+    """Merge server batches until ``STEP_MS`` of quiet or ``debounce`` ms pass."""
+    loop = asyncio.get_running_loop()
+    while line := await reader.readline():
+        batch = _decode(line)
+        deadline = loop.time() + debounce / 1000
+        while (left := deadline - loop.time()) > 0:
+            try:
+                line = await asyncio.wait_for(
+                    reader.readline(), min(left, STEP_MS / 1000)
+                )
+            except TimeoutError:
+                break
+            if not line:
+                break
+            batch |= _decode(line)
+        yield batch
+
+
+async def watch_deltas(
+    *roots: Path, debounce: int = 1600, watch_filter: Filter | None = None
+) -> AsyncGenerator[set[Delta]]:
+    """Like ``awatch``, but through the shared server when one is running."""
+    resolved = [r.resolve() for r in roots]
+    if (conn := await _connect(socket_path(), resolved)) is not None:
+        reader, writer = conn
+        try:
+            async for batch in _coalesce(reader, debounce):
+                if watch_filter is not None:
+                    batch = {d for d in batch if watch_filter(*d)}
+                if batch:
+                    yield batch
+        finally:
+            writer.close()
+    # no server, or it went away: watch locally
+    async for deltas in awatch(*resolved, debounce=debounce, watch_filter=watch_filter):
+        yield deltas
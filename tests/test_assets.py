@@ -0,0 +1,111 @@
+"""Tests for guide.assets — the portal bundle dedupe/minify/precompress stage."""
+
+import gzip
+from pathlib import Path
+
+import pytest
+
+from guide import assets
+from guide.assets import minify_css, minify_html, optimize
+from guide.paths import Style
+
+MOOD = (Style.moods.path / "brief.css").read_text()
+
+
+def _page(title: str) -> str:
+    return f"""<!doctype html>
+<html>
+  <head>
+    <!-- generated -->
+    <style>{MOOD}</style>
+    <style>h1 {{ color: red; }}</style>
+    <style>{MOOD}</style>
+  </head>
+  <body>
+    <h1>{title}</h1>
+    <pre>
+  keep   this
+    </pre>
+  </body>
+</html>
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def report(tmp_path: Path) -> Path:
+    root = tmp_path / "report"
+    (root / "sub").mkdir(parents=True)
+    (root / "index.html").write_text(_page("One"))
+    (root / "sub" / "two.html").write_text(_page("Two"))
+    (root / "logo.png").write_bytes(b"\x89PNG")
+    return root
+
+
+def test_minify_css_keeps_strings():
+    css = """
+    /* drop */ /*! keep */
+    a > b , c { content: "  a  /* not a comment */ "; margin: 0 ; }
+    @media (min-width: 600px) { a { color: red; } }
+    """
+    assert minify_css(css) == (
+        '/*! keep */ a>b,c{content:"  a  /* not a comment */ ";margin:0}'
+        "@media (min-width: 600px){a{color:red}}"
+    )
+
+
+def test_minify_css_keeps_descendant_pseudo_classes():
+    css = "a :hover { color : red ; }\n@media print { p :first-child { x: 1 } }"
+    assert minify_css(css) == "a :hover{color:red}@media print{p :first-child{x:1}}"
+
+
+def test_minify_html_spares_raw_text():
+    html = "<p>\n  a <b>b</b>\n</p><!-- x --><pre>\n  x  y\n</pre>"
+    assert minify_html(html) == "<p> a <b>b</b> </p><pre>\n  x  y\n</pre>"
+
+
+def test_optimize_dedupes_styles(report: Path):
+    bundle = optimize(report)
+    assert not bundle.cached
+    assert bundle.sheets == 1
+    assert bundle.bytes_out < bundle.bytes_in / 2
+
+    (sheet,) = (bundle.path / "assets").iterdir()
+    assert sheet.read_text() == minify_css(MOOD)
+    index = (bundle.path / "index.html").read_text()
+    two = (bundle.path / "sub" / "two.html").read_text()
+    assert index.count(f'href="assets/{sheet.name}"') == 1
+    assert two.count(f'href="../assets/{sheet.name}"') == 1
+    assert "<style>h1{color:red}</style>" in index
+    assert "generated" not in index
+    assert "\n  keep   this\n" in index
+    assert (bundle.path / "logo.png").read_bytes() == b"\x89PNG"
+    assert not list(bundle.path.rglob("*.gz"))
+
+
+def test_optimize_caches_by_input(report: Path):
+    first = optimize(report)
+    with pytest.MonkeyPatch.context() as m:
+        m.setattr(assets, "_build", None)  # a cache hit must not rebuild
+        again = optimize(report)
+    assert again.cached
+    assert again.path == first.path
+
+    (report / "index.html").write_text(_page("Changed"))
+    changed = optimize(report)
+    assert not changed.cached
+    assert changed.path != first.path
+
+
+def test_optimize_precompresses(report: Path):
+    bundle = optimize(report, precompress=True)
+    (sheet,) = (bundle.path / "assets").glob("*.css")
+    gz = sheet.with_name(sheet.name + ".gz")
+    assert gzip.decompress(gz.read_bytes()) == sheet.read_bytes()
+    assert not (bundle.path / "index.html.gz").exists()  # under COMPRESS_MIN
+    assert not (bundle.path / "logo.png.gz").exists()
+    assert bundle.path != optimize(report).path
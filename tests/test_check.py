@@ -0,0 +1,345 @@
+"""Tests for guide.api.cli.check — step planning and DAG scheduling."""
+
+import asyncio
+import io
+import os
+import shutil
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+from rich.console import Console
+
+from guide import pyright
+from guide.api.cli import check
+from guide.api.cli.check import (
+    Config,
+    LintResult,
+    Step,
+    ValidationResult,
+    Watcher,
+    plan_steps,
+    run_cmd,
+    run_pyright,
+    run_steps,
+    validate_file,
+    watch,
+)
+from guide.watchd import SOCKET_ENV, Server
+
+CFG = Config()
+EXTS = frozenset({"x"})
+
+
+def _append(tag: str, *, passed: bool = True, delay: float = 0.0):
+    async def fn(_path: str, content: str, _cfg: Config) -> LintResult:
+        await asyncio.sleep(delay)
+        return LintResult(tag, passed, content=content + tag)
+
+    return fn
+
+
+def _check(tag: str, seen: list[str], delay: float = 0.0):
+    async def fn(_path: str, content: str, _cfg: Config) -> LintResult:
+        await asyncio.sleep(delay)
+        seen.append(content)
+        return LintResult(tag, True)
+
+    return fn
+
+
+def test_plan_filters_by_extension():
+    steps = [Step("a", EXTS, _append("a")), Step("b", frozenset({"y"}), _append("b"))]
+    assert [s.name for s in plan_steps("x", steps)] == ["a"]
+
+
+def test_plan_rejects_unordered_mutations():
+    steps = [
+        Step("a", EXTS, _append("a"), mutates=True),
+        Step("b", EXTS, _append("b"), mutates=True),
+    ]
+    with pytest.raises(AssertionError):
+        plan_steps("x", steps)
+
+
+def test_run_steps_threads_content_through_chain():
+    seen: list[str] = []
+    steps = [
+        Step("fmt", EXTS, _append("1"), mutates=True),
+        Step("fix", EXTS, _append("2"), after=("fmt",), mutates=True),
+        Step("lint", EXTS, _check("lint", seen), after=("fix",)),
+    ]
+    final, results = asyncio.run(run_steps(plan_steps("x", steps), "f.x", "0", CFG))
+    assert final == "012"
+    assert seen == ["012"]
+    assert [r.name for r in results] == ["1", "2", "lint"]
+
+
+def test_run_steps_runs_independent_steps_concurrently():
+    seen: list[str] = []
+    steps = [
+        Step("a", EXTS, _check("a", seen, delay=0.2)),
+        Step("b", EXTS, _check("b", seen, delay=0.2)),
+        Step("c", EXTS, _check("c", seen, delay=0.2)),
+    ]
+
+    async def timed() -> float:
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        await run_steps(steps, "f.x", "", CFG)
+        return loop.time() - t0
+
+    assert asyncio.run(timed()) < 0.5
+
+
+def test_run_steps_fatal_short_circuits():
+    seen: list[str] = []
+    steps = [
+        Step("fmt", EXTS, _append("!", passed=False), mutates=True, fatal=True),
+        Step("slow", EXTS, _check("slow", seen, delay=5.0)),
+        Step("lint", EXTS, _check("lint", seen), after=("fmt",)),
+    ]
+    final, results = asyncio.run(run_steps(steps, "f.x", "0", CFG))
+    assert seen == []
+    assert [r.name for r in results] == ["!"]
+    assert final == "0!"
+
+
+def test_run_steps_applies_step_timeout():
+    steps = [Step("slow", EXTS, _check("slow", [], delay=5.0), timeout=0.05)]
+    _, (result,) = asyncio.run(run_steps(steps, "f.x", "", CFG))
+    assert not result.passed
+    assert "timed out" in result.error
+
+
+def test_commands_run_under_their_step_timeout():
+    async def sleep(_path: str, _content: str, _cfg: Config) -> LintResult:
+        return await run_cmd("sleep", ["0.3"])
+
+    def run(timeout: float) -> LintResult:
+        steps = [Step("sleep", EXTS, sleep, timeout=timeout)]
+        return asyncio.run(run_steps(steps, "f.x", "", CFG))[1][0]
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(check, "DEFAULT_TIMEOUT", 0.05)
+        assert run(5.0).passed
+    slow = run(0.05)
+    assert not slow.passed
+    assert "timed out after 0.05s" in slow.error
+
+
+def test_run_steps_silent_steps_reported_only_on_failure():
+    steps = [
+        Step("quiet", EXTS, _append("q"), mutates=True, silent=True),
+        Step("loud", EXTS, _check("loud", []), after=("quiet",)),
+    ]
+    final, results = asyncio.run(run_steps(steps, "f.x", "", CFG))
+    assert final == "q"
+    assert [r.name for r in results] == ["loud"]
+
+
+@pytest.fixture
+def tools(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> Callable[[str, str], None]:
+    """Install fake linters as shell scripts at the front of PATH."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", f"{bin_dir}:{os.environ['PATH']}")
+
+    def install(name: str, script: str) -> None:
+        exe = bin_dir / name
+        exe.write_text(f"#!/bin/sh\n{script}")
+        exe.chmod(0o755)
+
+    return install
+
+
+def test_stdin_commands_rewrite_content_and_report_stderr(
+    tools: Callable[[str, str], None],
+):
+    tools("fmt", 'tr a-z A-Z\necho "warn: $1" >&2\nexit 1\n')
+    result = asyncio.run(run_cmd("fmt", ["x.md"], stdin="hello\n"))
+    assert not result.passed
+    assert result.content == "HELLO\n"
+    assert result.output == "warn: x.md"
+
+
+def test_markdownlint_fixes_a_temp_copy_and_reports_the_real_path(
+    tmp_path: Path, tools: Callable[[str, str], None]
+):
+    tools(
+        "markdownlint",
+        'for f; do :; done\nsed -i "s/^#T/# T/" "$f"\n'
+        'echo "$f:3 MD012/no-multiple-blanks" >&2\nexit 1\n',
+    )
+    doc = tmp_path / "doc.md"
+    doc.write_text("#Title\n\n\ntext\n")
+
+    dry = asyncio.run(validate_file(str(doc), doc.read_text(), CFG, write=False))
+    assert dry.was_formatted
+    assert doc.read_text() == "#Title\n\n\ntext\n"
+
+    result = asyncio.run(validate_file(str(doc), doc.read_text(), CFG))
+    assert result.content == doc.read_text() == "# Title\n\n\ntext\n"
+    [lint] = result.lint_results
+    assert lint.output == f"{doc}:3 MD012/no-multiple-blanks"
+
+
+@pytest.fixture(autouse=True)
+def sock(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "watchd.sock"
+    monkeypatch.setenv(SOCKET_ENV, str(path))
+    return path
+
+
+def _project(tmp_path: Path) -> Path:
+    (tmp_path / "pyproject.toml").write_text("[tool.pyright]\n")
+    pkg = tmp_path / "pkg"
+    pkg.mkdir()
+    (pkg / "__init__.py").write_text("")
+    (pkg / "a.py").write_text("def f() -> int:\n    return 1\n")
+    b = pkg / "b.py"
+    b.write_text("")
+    return b
+
+
+OK = "from .a import f\n\nx: int = f()\n"
+BAD = "from .a import f\n\nx: str = f()\n"
+
+
+@pytest.mark.skipif(not shutil.which(pyright.LANGSERVER), reason="needs pyright")
+def test_run_pyright_resolves_relative_imports_in_project(tmp_path: Path):
+    b = _project(tmp_path)
+
+    def check(content: str) -> LintResult:
+        return asyncio.run(pyright.serving(run_pyright(str(b), content, CFG)))
+
+    ok = check(OK)
+    assert ok.passed, ok.output
+    bad = check(BAD)
+    assert not bad.passed
+    assert f"{b}:3:" in bad.output
+
+
+@pytest.mark.skipif(not shutil.which(pyright.LANGSERVER), reason="needs pyright")
+def test_checked_buffers_do_not_shadow_the_disk(tmp_path: Path):
+    b = _project(tmp_path)
+    a = b.with_name("a.py")
+
+    async def main() -> tuple[LintResult, LintResult]:
+        edited = await run_pyright(str(a), "def f() -> str:\n    return ''\n", CFG)
+        return edited, await run_pyright(str(b), OK, CFG)
+
+    edited, ok = asyncio.run(pyright.serving(main()))
+    assert edited.passed, edited.output
+    assert ok.passed, ok.output
+
+
+@pytest.mark.skipif(not shutil.which(pyright.LANGSERVER), reason="needs pyright")
+def test_watchd_keeps_pyright_warm_across_checks(tmp_path: Path, sock: Path):
+    b = _project(tmp_path)
+
+    async def main() -> None:
+        ready = asyncio.Event()
+        serving = asyncio.create_task(Server(sock).serve(ready))
+        await ready.wait()
+        ok = await run_pyright(str(b), OK, CFG)
+        assert ok.passed, ok.output
+        server = await pyright.server_for(tmp_path)
+        bad = await run_pyright(str(b), BAD, CFG)
+        assert f"{b}:3:" in bad.output
+        assert await pyright.server_for(tmp_path) is server
+        serving.cancel()
+        await asyncio.gather(serving, return_exceptions=True)
+        assert not server.alive
+
+    asyncio.run(main())
+
+
+@pytest.mark.skipif(not shutil.which("pyright"), reason="needs pyright")
+def test_run_pyright_falls_back_to_the_cli_on_timeout(tmp_path: Path):
+    b = _project(tmp_path)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(pyright, "CHECK_TIMEOUT", 0.0)
+        bad = asyncio.run(pyright.serving(run_pyright(str(b), BAD, CFG)))
+    assert not bad.passed
+    assert f"{b}:3:" in bad.output
+
+
+def test_configured_pyright_project_wins(tmp_path: Path):
+    b = _project(tmp_path)
+    root = check._pyright_root  # pyright: ignore[reportPrivateUsage]
+    assert root(str(b), CFG) == tmp_path
+    config = tmp_path / "conf" / "pyrightconfig.json"
+    assert root(str(b), Config(pyright_config=str(config))) == config.parent
+
+
+async def _until(cond: Callable[[], bool]) -> None:
+    for _ in range(250):
+        if cond():
+            return
+        await asyncio.sleep(0.02)
+    raise TimeoutError
+
+
+def _fake_validate(seen: list[str], done: list[str], delay: float = 0.0):
+    async def validate_file(
+        _path: str, content: str, _cfg: Config, write: bool = True
+    ) -> ValidationResult:
+        seen.append(content)
+        await asyncio.sleep(delay)
+        done.append(content)
+        return ValidationResult(content=content)
+
+    return validate_file
+
+
+def test_newer_change_supersedes_inflight_validation(tmp_path: Path):
+    f = tmp_path / "a.py"
+    seen: list[str] = []
+    done: list[str] = []
+    watcher = Watcher(CFG, Console(file=io.StringIO()))
+
+    async def main() -> None:
+        f.write_text("old")
+        watcher.submit(str(f))
+        await _until(lambda: seen == ["old"])
+        f.write_text("new")
+        watcher.submit(str(f))
+        await _until(lambda: not watcher.inflight)
+        # an unchanged save is not validated again
+        watcher.submit(str(f))
+        await _until(lambda: not watcher.inflight)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(check, "validate_file", _fake_validate(seen, done, delay=0.2))
+        asyncio.run(main())
+    assert seen == ["old", "new"]
+    assert done == ["new"]
+    assert watcher.validated == {str(f): "new"}
+
+
+def test_watch_coalesces_bursts_and_applies_root_gitignore(tmp_path: Path):
+    root = tmp_path.resolve()
+    (root / ".gitignore").write_text("skip.py\n")
+    seen: list[str] = []
+    done: list[str] = []
+
+    async def main() -> None:
+        task = asyncio.create_task(watch([root], CFG, Console(file=io.StringIO())))
+        await asyncio.sleep(0.3)  # let the watcher register
+        for i in range(3):
+            (root / "a.py").write_text(f"a{i}")
+        (root / "b.py").write_text("b")
+        (root / "skip.py").write_text("skip")
+        (root / "notes.txt").write_text("txt")
+        await _until(lambda: len(done) == 2)
+        await asyncio.sleep(0.4)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(check, "validate_file", _fake_validate(seen, done))
+        asyncio.run(main())
+    assert sorted(seen) == ["a2", "b"]
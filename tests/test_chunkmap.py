@@ -0,0 +1,112 @@
+"""Tests for guide.chunkmap — chunking, the bounded map and its checkpoints."""
+
+import asyncio
+import re
+from pathlib import Path
+
+import pytest
+
+from guide.chunkmap import (
+    Chunk,
+    MapError,
+    line_chunks,
+    map_chunks,
+    md_to_yaml,
+    page_chunks,
+)
+from guide.llm import FakeBackend, use_backend
+from guide.paths import Commands
+from guide.prompts import declared_int, fenced
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def test_chunking():
+    text = "".join(f"{i}\n" for i in range(1, 8))
+    assert [(c.start, c.end, c.text) for c in line_chunks(text, 3)] == [
+        (1, 3, "1\n2\n3\n"),
+        (4, 6, "4\n5\n6\n"),
+        (7, 7, "7\n"),
+    ]
+    pages = "p1\fp2\fp3\f"
+    assert [(c.start, c.end, c.text) for c in page_chunks(pages, 2)] == [
+        (1, 2, "p1\fp2"),
+        (3, 3, "p3"),
+    ]
+
+
+def test_declared_caps_come_from_command_files():
+    assert (
+        declared_int(Commands.map_md_to_yaml.template, "N_MAX_CONCURRENT_AGENT", 0) == 3
+    )
+    assert declared_int(Commands.map_pdf_to_md.template, "PAGE_GROUP_SIZE", 0) == 10
+    assert declared_int(Commands.map_pdf_to_md.template, "NOPE", 7) == 7
+
+
+def test_fenced_takes_the_matching_fence():
+    answer = "sure\n````md\n# a\n```py\nx\n```\n````\n```yaml\nk: v\n```\n"
+    assert fenced(answer, "md") == "# a\n```py\nx\n```\n"
+    assert fenced(answer, "yaml") == "k: v\n"
+    assert fenced("k: v", "yaml") == "k: v\n"
+
+
+def test_map_is_bounded_ordered_and_resumes():
+    chunks = line_chunks("".join(f"{i}\n" for i in range(20)), 2)
+    inflight = peak = 0
+    asked: list[int] = []
+    broken = {3, 7}
+
+    async def fn(chunk: Chunk) -> str:
+        nonlocal inflight, peak
+        asked.append(chunk.index)
+        inflight += 1
+        peak = max(peak, inflight)
+        await asyncio.sleep(0.01 * (len(chunks) - chunk.index))
+        inflight -= 1
+        if chunk.index in broken:
+            raise TimeoutError
+        return chunk.text.upper()
+
+    with pytest.raises(MapError) as e:
+        asyncio.run(map_chunks(chunks, fn, key="k", concurrency=3))
+    assert sorted(e.value.failed) == [3, 7]
+    assert peak == 3
+
+    asked.clear()
+    broken.clear()
+    got = asyncio.run(map_chunks(chunks, fn, key="k", concurrency=3))
+    assert sorted(asked) == [3, 7]
+    assert got == [c.text.upper() for c in chunks]
+
+    # another task key shares nothing
+    asked.clear()
+    asyncio.run(map_chunks(chunks[:2], fn, key="other"))
+    assert asked == [0, 1]
+
+    # chunks are keyed on their text, wherever they now sit
+    asked.clear()
+    moved = line_chunks("a\nb\n" + "".join(f"{i}\n" for i in range(20)), 2)
+    asyncio.run(map_chunks(moved, fn, key="k"))
+    assert asked == [0]
+
+
+def test_md_to_yaml_merges_chunks_in_order():
+    def respond(prompt: str) -> str:
+        lines = re.search(r"## chunk\n\n(.*)", prompt, re.DOTALL)
+        assert lines is not None
+        items = "".join(f"- {line}\n" for line in lines.group(1).split())
+        return f"Here you go:\n```yaml\n{items}```\n"
+
+    fake = FakeBackend(respond, latency=0.01)
+    text = "".join(f"l{i}\n" for i in range(1, 6))
+    with use_backend(fake):
+        got = asyncio.run(md_to_yaml(text, "a list of lines", lines_per_chunk=2))
+        assert (
+            asyncio.run(md_to_yaml(text, "a list of lines", lines_per_chunk=2)) == got
+        )
+    assert got == "- l1\n- l2\n---\n- l3\n- l4\n---\n- l5\n"
+    assert len(fake.calls) == 3
+    assert any("lines 3-4" in c for c in fake.calls)
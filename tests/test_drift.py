@@ -1,22 +1,30 @@
 """Tests for guide.api.cli.drift — contract fence parsing, drift tracking, cross-ref."""
 
+import asyncio
 import json
+import random
 from pathlib import Path
 
 import pytest
+from watchfiles import Change  # type: ignore[import-untyped]
 
 from guide.api.cli.drift import (
     Block,
+    DriftState,
+    RefMatcher,
     _matches,
     _scan_refs,
     _write_gen,
+    check,
     difference,
     load_cache,
+    load_index,
     parse_contracts,
+    query,
     save_cache,
     update_fences,
 )
-
+from guide.resolver import Host
 
 # ── parse_contracts ──────────────────────────────────────────────────
 
@@ -208,6 +216,17 @@ def test_matches_absent():
     assert not _matches("SELECT 1;", "create-user")
 
 
+def test_ref_matcher_agrees_with_matches():
+    rng = random.Random(0)
+    names = ["a", "ab", "a-b", "a-bc", "b-a", "user", "create-user", "create-users"]
+    matcher = RefMatcher.build(names)
+    for _ in range(500):
+        text = "".join(rng.choice("ab-_ cd\n") for _ in range(rng.randint(0, 12)))
+        text += rng.choice(["", "create_user", "recreate-users", "x-user"])
+        assert matcher.find(text) == {n for n in names if _matches(text, n)}, text
+    assert RefMatcher.build([]).find("anything") == set()
+
+
 # ── cache I/O ────────────────────────────────────────────────────────
 
 
@@ -404,3 +423,194 @@ def test_full_flow(tmp_path: Path):
     assert "---\nname: spec.gen\n---\n" in gen
     assert "create-user:" in gen
     assert "\tdb/init.sql" in gen
+
+
+# ── DriftState: batched watch handling ───────────────────────────────
+
+
+def _workspace(tmp_path: Path) -> tuple[Path, Path]:
+    spec = tmp_path / "spec.md"
+    spec.write_text("```sql:create-user\nCREATE TABLE users (id INT);\n```\n")
+    sql = tmp_path / "db" / "init.sql"
+    sql.parent.mkdir()
+    sql.write_text("SELECT 1;\n")
+    return spec, sql
+
+
+@pytest.mark.parametrize("storm", [256, 0])
+def test_drift_state_handles_batch(tmp_path: Path, storm: int):
+    spec, sql = _workspace(tmp_path)
+    state = DriftState(tmp_path, _always_allow, storm=storm)
+    state.scan()
+    assert state.contracts == {"create-user": "sql"}
+    state.cache["spec.md::create-user"] = "CREATE TABLE users (id INT);"
+
+    spec.write_text("```sql:create-user\nCREATE TABLE people (id INT);\n```\n")
+    sql.write_text("-- create-user\n")
+    deltas = {(Change.modified, str(spec)), (Change.modified, str(sql))}
+    asyncio.run(state.handle(deltas))
+
+    assert spec.read_text().startswith("```sql:create-user:")
+    assert state.refs == {"create-user": {"db/init.sql"}}
+    assert "\tdb/init.sql" in (tmp_path / "spec.gen.md").read_text()
+    assert load_cache(tmp_path) == state.cache
+
+
+def test_drift_state_loads_without_touching_state(tmp_path: Path):
+    spec, _ = _workspace(tmp_path)
+    state = DriftState(tmp_path, _always_allow)
+    state.scan()
+    state.cache["spec.md::create-user"] = "CREATE TABLE users (id INT);"
+    spec.write_text("```sql:create-user\nCREATE TABLE people (id INT);\n```\n")
+    written, layout = dict(state.written), state.layouts.files["spec.md"]
+
+    update = state._load(spec)  # pyright: ignore[reportPrivateUsage]
+    assert state.written == written
+    assert state.layouts.files["spec.md"] is layout
+    assert layout.content.count("users") == 1
+
+    state._apply(update)  # pyright: ignore[reportPrivateUsage]
+    assert state.own_write(spec)
+    assert state.layouts.files["spec.md"].content == spec.read_text()
+
+
+def test_drift_state_rescans_storms_across_workers(tmp_path: Path):
+    _workspace(tmp_path)
+    state = DriftState(tmp_path, _always_allow, workers=3, storm=0)
+    state.scan()
+    sqls = [tmp_path / "db" / f"{i}.sql" for i in range(7)]
+    for i, sql in enumerate(sqls):
+        sql.write_text("-- create-user\n" if i % 2 else "SELECT 1;\n")
+    asyncio.run(state.handle({(Change.added, str(p)) for p in sqls}))
+    assert state.refs == {"create-user": {"db/1.sql", "db/3.sql", "db/5.sql"}}
+
+
+def test_drift_state_suppresses_own_writes(tmp_path: Path):
+    spec, _ = _workspace(tmp_path)
+    state = DriftState(tmp_path, _always_allow)
+    state.scan()
+    gen = tmp_path / "spec.gen.md"
+    state.cache["spec.md::create-user"] = "CREATE TABLE users (id INT);"
+    spec.write_text("```sql:create-user\nCREATE TABLE people (id INT);\n```\n")
+    asyncio.run(state.handle({(Change.modified, str(spec))}))
+    assert state.self_hits == 0
+
+    # the rewrite of spec.md and the gen file echo back as events
+    echo = {(Change.modified, str(spec)), (Change.modified, str(gen))}
+    asyncio.run(state.handle(echo))
+    assert state.self_hits == 2
+
+    # a real edit after our write is not suppressed
+    spec.write_text("```sql:create-user\nCREATE TABLE users (id INT);\n```\n")
+    asyncio.run(state.handle({(Change.modified, str(spec))}))
+    assert state.self_hits == 2
+    assert spec.read_text().startswith("```sql:create-user\n")
+
+
+def test_drift_state_keeps_and_runs_resolver(tmp_path: Path):
+    spec, _ = _workspace(tmp_path)
+    gen = tmp_path / "spec.gen.md"
+    gen.write_text(
+        "---\nname: spec.gen\nresolver: |\n  def resolve(ctx):\n"
+        "    notify(ctx['contract'], ctx['difference'])\n---\n"
+    )
+    notes: list[str] = []
+    state = DriftState(
+        tmp_path, _always_allow, host=Host(tmp_path, notify=notes.append)
+    )
+    state.scan()
+    assert "resolver: |" in gen.read_text()
+    assert "create-user:" in gen.read_text()
+
+    state.cache["spec.md::create-user"] = "CREATE TABLE users (id INT);"
+    spec.write_text("```sql:create-user\nCREATE TABLE people (id INT);\n```\n")
+    asyncio.run(state.handle({(Change.modified, str(spec))}))
+    assert state.host is not None
+    state.host.shutdown()
+    assert "resolver: |" in gen.read_text()
+    assert len(notes) == 1
+    assert notes[0].startswith("create-user ")
+
+
+def test_drift_state_scores_refs(tmp_path: Path):
+    _, sql = _workspace(tmp_path)
+    sql.write_text("-- create-user\nCREATE TABLE users (id INT);\n")
+    state = DriftState(tmp_path, _always_allow)
+    state.scan()
+    gen = tmp_path / "spec.gen.md"
+    assert "\tdb/init.sql 1.00\n" in gen.read_text()
+    index = load_index(tmp_path)
+    assert index is not None
+    entry = index["contracts"]["create-user"]
+    assert entry["similarity"] == {"db/init.sql": 1.0}
+    assert entry["similar"][0]["path"] == "db/init.sql"
+
+    sql.write_text("-- create-user\nDROP VIEW audit_log CASCADE;\n")
+    asyncio.run(state.handle({(Change.modified, str(sql))}))
+    assert state.scores["create-user"]["db/init.sql"] < 0.5
+    assert "\tdb/init.sql 1.00" not in gen.read_text()
+
+
+# ── index and query ──────────────────────────────────────────────────
+
+
+def test_index_tracks_contracts_and_paths(tmp_path: Path):
+    spec, sql = _workspace(tmp_path)
+    sql.write_text("-- create-user\n")
+    state = DriftState(tmp_path, _always_allow)
+    state.scan()
+    index = load_index(tmp_path)
+    assert index is not None
+    entry = index["contracts"]["create-user"]
+    assert entry["doc"] == "spec.md"
+    assert entry["lang"] == "sql"
+    assert entry["baseline"] is None
+    assert entry["refs"] == ["db/init.sql"]
+    assert index["paths"]["db/init.sql"] == ["create-user"]
+
+    state.cache["spec.md::create-user"] = "CREATE TABLE users (id INT);"
+    spec.write_text("```sql:create-user\nCREATE TABLE people (id INT);\n```\n")
+    asyncio.run(state.handle({(Change.modified, str(spec))}))
+    index = load_index(tmp_path)
+    assert index is not None
+    entry = index["contracts"]["create-user"]
+    assert entry["difference"] > 0
+    assert len(entry["baseline"]) == 32
+    assert not (tmp_path / ".qx" / "index.tmp").exists()
+
+
+def test_query_by_contract_and_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    _, sql = _workspace(tmp_path)
+    sql.write_text("-- create-user\n")
+    DriftState(tmp_path, _always_allow).scan()
+    index = load_index(tmp_path)
+    assert index is not None
+    assert list(query(index, tmp_path, "create-user")) == ["create-user"]
+    assert list(query(index, tmp_path, "spec.md")) == ["create-user"]
+    monkeypatch.chdir(tmp_path / "db")
+    assert list(query(index, tmp_path, "init.sql")) == ["create-user"]
+    assert query(index, tmp_path, "missing") == {}
+
+
+# ── check ────────────────────────────────────────────────────────────
+
+
+def test_check_reports_without_writing(tmp_path: Path):
+    spec, _ = _workspace(tmp_path)
+    (tmp_path / "other.md").write_text("```py:orphan-fn\ndef f(): ...\n```\n")
+    (tmp_path / "db" / "q.sql").write_text("-- create-user\n")
+    save_cache(tmp_path, {"spec.md::create-user": "CREATE TABLE people (id INT);"})
+    before = spec.read_text()
+
+    report = check(tmp_path, _always_allow)
+
+    assert spec.read_text() == before
+    assert not (tmp_path / "spec.gen.md").exists()
+    assert not (tmp_path / ".qx" / "index.json").exists()
+    out = report.to_json(threshold=0)
+    assert out["contracts"] == 2
+    assert [d["contract"] for d in out["drifted"]] == ["create-user"]
+    assert [d["contract"] for d in out["orphaned"]] == ["orphan-fn"]
+    assert [d["contract"] for d in out["missing_baseline"]] == ["orphan-fn"]
+    assert report.exceeds(0)
+    assert not report.exceeds(100)
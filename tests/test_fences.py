@@ -0,0 +1,87 @@
+"""Tests for guide.fences — prescan parser and incremental layouts."""
+
+import random
+from pathlib import Path
+
+from guide.fences import RE_FENCE, Block, Layouts, has_fences, parse_contracts
+
+
+def _reference(content: str) -> list[tuple[str, str, str, int, str]]:
+    """The original line-by-line parser, as the behavior to preserve."""
+    lines, i = content.split("\n"), 0
+    blocks: list[tuple[str, str, str, int, str]] = []
+    while i < len(lines):
+        if m := RE_FENCE.match(lines[i]):
+            ticks, start, body = m.group("ticks"), i, []
+            i += 1
+            while i < len(lines):
+                s = lines[i].strip()
+                if s.startswith(ticks) and not s.replace("`", ""):
+                    break
+                body.append(lines[i])
+                i += 1
+            blocks.append(
+                (m.group("contract"), m.group("lang"), "\n".join(body), start, ticks)
+            )
+        i += 1
+    by_name = {b[0]: b for b in blocks}
+    return sorted(by_name.values(), key=lambda b: b[3])
+
+
+def _tuples(blocks: list[Block]) -> list[tuple[str, str, str, int, str]]:
+    return [(b.contract, b.lang, b.body, b.fence_idx, b.ticks) for b in blocks]
+
+
+LINES = [
+    "```sql:create-user",
+    "````py:load-data:12 {.x}",
+    "  ```ts:a-b",
+    "```",
+    "````",
+    "   ```   ",
+    "```Py:bad",
+    "text with ``` inline",
+    "SELECT 1;",
+    "",
+    "prose",
+]
+
+
+def test_parse_matches_reference_and_offsets():
+    rng = random.Random(0)
+    for _ in range(300):
+        content = "\n".join(rng.choice(LINES) for _ in range(rng.randint(0, 30)))
+        blocks = parse_contracts(content)
+        assert _tuples(blocks) == _reference(content)
+        for b in blocks:
+            assert RE_FENCE.match(content[b.start : b.end])
+
+
+def test_layouts_incremental_edits_match_full_parse():
+    rng = random.Random(1)
+    layouts = Layouts()
+    lines = [rng.choice(LINES) for _ in range(40)]
+    for _ in range(500):
+        i = rng.randrange(len(lines) + 1)
+        match rng.randrange(3):
+            case 0:
+                lines.insert(i, rng.choice(LINES))
+            case 1 if lines:
+                del lines[min(i, len(lines) - 1)]
+            case _:
+                if lines:
+                    j = min(i, len(lines) - 1)
+                    lines[j] = lines[j] + rng.choice(["", "x", "`", " "])
+        content = "\n".join(lines)
+        assert _tuples(layouts.parse("doc.md", content)) == _reference(content)
+
+
+def test_has_fences(tmp_path: Path):
+    empty, plain, spec = tmp_path / "e.md", tmp_path / "p.md", tmp_path / "s.md"
+    empty.write_text("")
+    plain.write_text("# title\n")
+    spec.write_text("```sql:x\n```\n")
+    assert not has_fences(empty)
+    assert not has_fences(plain)
+    assert has_fences(spec)
+    assert not has_fences(tmp_path / "missing.md")
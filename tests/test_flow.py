@@ -0,0 +1,200 @@
+"""Tests for guide.flow — parsing flow: fences and running them."""
+
+import asyncio
+import re
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from guide.fences import parse_contracts
+from guide.flow import FlowError, Runner, normalize, parse_flows, run_command
+from guide.llm import FakeBackend, use_backend
+from guide.paths import Commands
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+
+def test_normalize_rewrites_the_dialect():
+    spelled: dict[str, str] = {}
+    source = normalize(
+        "x ← load-schema($SCHEMA_PATH, ${N})\n"
+        "y = bash`sed -n '${a},${b}p' $TARGET_PATH`\n"
+        "z = run-later(() => map(xs, do-it))\n"
+        'w = fmt(\n````md:page\n{a-b} $KEEP\n````,\n    "a-b")',
+        spelled,
+    )
+    assert source == (
+        "x = load_schema(SCHEMA_PATH, N)\n"
+        "y = bash(\"sed -n '${a},${b}p' $TARGET_PATH\")\n"
+        "z = run_later(lambda : map(xs, do_it))\n"
+        "w = fmt(\n'{a-b} $KEEP',\n    \"a-b\")"
+    )
+    assert spelled == {
+        "load_schema": "load-schema",
+        "run_later": "run-later",
+        "do_it": "do-it",
+    }
+
+
+def test_command_flows_parse_into_step_graphs():
+    flows = parse_flows(Commands.map_md_to_yaml.template.body)
+    assert list(flows) == ["main", "create-line-map", "process-chunk"]
+    assert flows["process-chunk"].params == (("start_line", "end_line"), "schema")
+    main = flows["main"]
+    assert [s.deps for s in main.steps] == [(), (), (0, 1)]
+    # the map waits for schema too: process-chunk looks it up in main
+    assert "schema" in main.steps[2].reads
+
+    pdf = parse_flows(Commands.map_pdf_to_md.template.body)
+    assert pdf["map-page"].params == ("page",)
+    assert [s.writes for s in pdf["map-page"].steps] == [("image",), ("text",), ()]
+
+
+def test_flow_fences_are_not_contracts():
+    content = Commands.map_md_to_yaml.template.body
+    assert [b.lang for b in parse_contracts(content)] == []
+
+
+FLOWS = """
+```flow:main()
+a = slow("a")
+b = slow("b")
+out = map(items, work)
+join([a, b] + out, ",")
+```
+
+```flow:work(x)
+y = double(x)
+```
+"""
+
+
+class _Ops:
+    def __init__(self, fail: frozenset[int] = frozenset()) -> None:
+        self.fail = fail
+        self.inflight = self.peak = 0
+        self.calls: list[Any] = []
+
+    async def _track(self, value: Any) -> None:
+        self.calls.append(value)
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        await asyncio.sleep(0.01)
+        self.inflight -= 1
+
+    async def slow(self, name: str) -> str:
+        await self._track(name)
+        return name
+
+    async def double(self, x: int) -> str:
+        await self._track(x)
+        if x in self.fail:
+            raise RuntimeError(f"no {x}")
+        return str(2 * x)
+
+    def runner(self, checkpoints: Path, **kwargs: Any) -> Runner:
+        return Runner(
+            parse_flows(FLOWS),
+            {"items": [1, 2, 3, 4, 5, 6]},
+            {"slow": self.slow, "double": self.double},
+            checkpoints=checkpoints,
+            **kwargs,
+        )
+
+
+def test_steps_overlap_and_map_is_capped(tmp_path: Path):
+    ops = _Ops()
+    runner = ops.runner(tmp_path, concurrency=2)
+    assert asyncio.run(runner.call("main")) == "a,b,2,4,6,8,10,12"
+    # a, b and the first two map items all start together
+    assert ops.peak == 4
+
+    ops = _Ops()
+    asyncio.run(ops.runner(tmp_path / "other", concurrency=1).call("main"))
+    assert ops.peak == 3
+
+
+def test_rerun_skips_finished_steps(tmp_path: Path):
+    ops = _Ops(fail=frozenset({3, 5}))
+    with pytest.raises(FlowError, match="2 of 6 map items failed"):
+        asyncio.run(ops.runner(tmp_path).call("main"))
+
+    ops = _Ops()
+    runner = ops.runner(tmp_path)
+    assert asyncio.run(runner.call("main")) == "a,b,2,4,6,8,10,12"
+    assert sorted(ops.calls) == [3, 5]
+
+    ops = _Ops()
+    asyncio.run(ops.runner(tmp_path).call("main"))
+    assert ops.calls == []
+
+
+def test_undefined_operations_need_a_fallback(tmp_path: Path):
+    flows = parse_flows("```flow:main()\nx = mystery-op(1, k=2)\n```\n")
+    with pytest.raises(FlowError, match="undefined operation mystery-op"):
+        asyncio.run(Runner(flows, checkpoints=tmp_path).call("main"))
+
+    async def fallback(name: str, args: tuple[Any, ...], kwargs: dict[str, Any]) -> Any:
+        return [name, list(args), kwargs]
+
+    runner = Runner(flows, fallback=fallback, checkpoints=tmp_path)
+    assert asyncio.run(runner.call("main")) == ["mystery-op", [1], {"k": 2}]
+
+
+def test_bash_gets_flow_values_through_its_environment(tmp_path: Path):
+    spaced = tmp_path / "a b.md"
+    spaced.write_text("1\n2\n3\n")
+    flows = parse_flows(
+        "```flow:main()\n"
+        "n = bash`wc -l < $TARGET_PATH`\n"
+        "head = bash`sed -n '1,${n}p' $TARGET_PATH | head -c 2`\n"
+        'echo = bash`echo "[$TARGET_PATH]"`\n'
+        "```\n"
+    )
+    runner = Runner(flows, {"TARGET_PATH": str(spaced)}, checkpoints=tmp_path)
+    assert asyncio.run(runner.call("main")) == f"[{spaced}]\n"
+
+    hostile = Runner(flows, {"TARGET_PATH": "/dev/null; echo 7"}, checkpoints=tmp_path)
+    with pytest.raises(FlowError, match="No such file"):
+        asyncio.run(hostile.call("main"))
+
+
+def test_checkpointed_values_keep_their_types_across_reruns(tmp_path: Path):
+    flows = parse_flows("```flow:main()\npairs = zip-up(items)\nfirst(pairs)\n```\n")
+
+    async def zip_up(items: list[int]) -> list[tuple[int, int]]:
+        return [(i, i + 1) for i in items]
+
+    def run() -> Any:
+        runner = Runner(
+            flows, {"items": [1, 2]}, {"zip-up": zip_up}, checkpoints=tmp_path
+        )
+        return asyncio.run(runner.call("main")), runner.hits
+
+    assert run() == ([1, 2], 0)
+    assert run() == ([1, 2], 2)
+
+
+def _answer(prompt: str) -> str:
+    lines = re.findall(r"^line (\d+)$", prompt, re.MULTILINE)
+    return f"```yaml\nlines: {lines[0]}-{lines[-1]}\n```" if lines else "schema"
+
+
+def test_map_md_to_yaml_runs_and_resumes(tmp_path: Path):
+    doc = tmp_path / "doc.md"
+    doc.write_text("".join(f"line {i}\n" for i in range(1, 26)))
+    fake = FakeBackend(_answer)
+    variables = {"TARGET_PATH": str(doc), "SCHEMA_PATH": "s", "NLINE_PER_CHUNK": 10}
+    with use_backend(fake):
+        docs = asyncio.run(run_command(Commands.map_md_to_yaml, variables))
+        asked = len(fake.calls)
+        again = asyncio.run(run_command(Commands.map_md_to_yaml, variables))
+    assert docs == ["lines: 1-10\n", "lines: 11-20\n", "lines: 21-25\n"]
+    assert asked == 4  # the schema, then one per chunk
+    # the rerun reads the chunks again but asks nothing
+    assert again == docs
+    assert len(fake.calls) == asked
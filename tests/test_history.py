@@ -0,0 +1,91 @@
+"""Tests for guide.history — columnar result history and its queries."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from guide.history import History
+from guide.lang import TestResult
+
+
+def _result(ref: str, duration: float, stop: float, status: str = "passed"):
+    return TestResult(
+        ref=ref, status=status, details={"duration": str(duration), "stop": str(stop)}
+    )
+
+
+def test_ingest_roundtrip_and_idempotent(tmp_path: Path):
+    h = History.load(tmp_path)
+    run = [_result("t::a", 0.5, 1.0), _result("t::b", 1.0, 1.0)]
+    assert h.ingest(run, ts=1.0) == 2
+    assert h.ingest(run, ts=2.0) == 0
+    # a merged file: only the rerun test is newer
+    assert h.ingest([_result("t::a", 0.6, 2.0), run[1]], ts=2.0) == 1
+
+    loaded = History.load(tmp_path)
+    assert loaded.nodeids == ["t::a", "t::b"]
+    assert loaded.run.tolist() == [0, 0, 1]
+    assert loaded.duration.tolist() == [0.5, 1.0, 0.6]
+
+
+def test_ingest_repairs_an_interrupted_append(tmp_path: Path):
+    History.load(tmp_path).ingest([_result("t::a", 0.5, 1.0)], ts=1.0)
+    with (tmp_path / "node.i4").open("ab") as f:
+        np.asarray([0], np.int32).tofile(f)
+
+    h = History.load(tmp_path)
+    run = [_result("t::a", 2.0, 2.0, "failed"), _result("t::b", 3.0, 2.0)]
+    assert h.ingest(run, ts=2.0) == 2
+
+    loaded = History.load(tmp_path)
+    assert loaded.node.tolist() == [0, 0, 1]
+    assert loaded.status.tolist() == [1, 0, 1]
+    assert loaded.duration.tolist() == [0.5, 2.0, 3.0]
+
+
+def test_missing_columns_load_as_empty(tmp_path: Path):
+    (tmp_path / "nodeids.txt").write_text("t::a\n")
+    h = History.load(tmp_path)
+    assert h.nodeids == ["t::a"]
+    assert h.runs == 0
+    assert h.ingest([_result("t::a", 0.5, 1.0)], ts=1.0) == 1
+    assert History.load(tmp_path).duration.tolist() == [0.5]
+
+
+def test_rolling_median_uses_last_window(tmp_path: Path):
+    h = History.load(tmp_path)
+    for i, secs in enumerate([9.0, 1.0, 2.0, 3.0]):
+        h.ingest([_result("t::a", secs, float(i))], ts=float(i))
+    h.ingest([_result("t::b", 5.0, 10.0)], ts=10.0)
+    assert h.rolling_median(window=3).tolist() == [2.0, 5.0]
+
+
+def test_flake_rate_counts_flips(tmp_path: Path):
+    h = History.load(tmp_path)
+    for i, status in enumerate(["passed", "failed", "passed", "passed", "passed"]):
+        h.ingest(
+            [_result("t::a", 1.0, float(i), status), _result("t::b", 1.0, float(i))],
+            ts=float(i),
+        )
+    assert h.flake_rate(window=5) == pytest.approx([0.5, 0.0])
+
+
+def test_regressions_beyond_k_mad(tmp_path: Path):
+    h = History.load(tmp_path)
+    rng = np.random.default_rng(0)
+    for i in range(20):
+        h.ingest(
+            [
+                _result("t::a", 1.0 + rng.normal(0, 0.01), float(i)),
+                _result("t::b", 1.0 + rng.normal(0, 0.01), float(i)),
+            ],
+            ts=float(i),
+        )
+    h.ingest([_result("t::a", 2.0, 99.0), _result("t::b", 1.0, 99.0)], ts=99.0)
+    assert h.regressions(window=20).tolist() == [True, False]
+
+    results = [TestResult(ref="t::a", status="passed")]
+    h.annotate(results)
+    assert results[0].details is not None
+    assert results[0].details["regressed"] == "true"
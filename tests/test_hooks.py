@@ -0,0 +1,95 @@
+"""Tests for guide.api.cli.hooks — the cached staged-files validation pass."""
+
+import asyncio
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from guide.api.cli import check, hooks
+from guide.api.cli.check import Config, LintResult, Step
+
+
+def _git(repo: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def seen(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    seen: list[str] = []
+
+    async def lint(path: str, content: str, _cfg: Config) -> LintResult:
+        seen.append(Path(path).name)
+        return LintResult("lint", "bad" not in content, output="bad line")
+
+    monkeypatch.setattr(check, "STEPS", [Step("lint", frozenset({"x"}), lint)])
+    return seen
+
+
+def test_staged_validates_index_and_caches_passes(tmp_path: Path, seen: list[str]):
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "a.x").write_text("good")
+    (tmp_path / "b.x").write_text("bad")
+    (tmp_path / "notes.txt").write_text("bad")
+    _git(tmp_path, "add", ".")
+    (tmp_path / "b.x").write_text("good, but unstaged")
+
+    assert asyncio.run(hooks._staged(tmp_path)) == 1  # pyright: ignore[reportPrivateUsage]
+    assert sorted(seen) == ["a.x", "b.x"]
+    assert (tmp_path / "b.x").read_text() == "good, but unstaged"
+
+    # a.x passed and is skipped; b.x failed and is checked again
+    seen.clear()
+    assert asyncio.run(hooks._staged(tmp_path)) == 1  # pyright: ignore[reportPrivateUsage]
+    assert seen == ["b.x"]
+
+    _git(tmp_path, "add", "b.x")
+    seen.clear()
+    assert asyncio.run(hooks._staged(tmp_path)) == 0  # pyright: ignore[reportPrivateUsage]
+    assert seen == ["b.x"]
+
+    seen.clear()
+    assert asyncio.run(hooks._staged(tmp_path)) == 0  # pyright: ignore[reportPrivateUsage]
+    assert seen == []
+
+
+def test_staged_rejects_unformatted_content(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    async def fmt(_path: str, content: str, _cfg: Config) -> LintResult:
+        return LintResult("fmt", True, content=content.strip() + "\n")
+
+    monkeypatch.setattr(
+        check, "STEPS", [Step("fmt", frozenset({"x"}), fmt, mutates=True)]
+    )
+    _git(tmp_path, "init", "-q")
+    (tmp_path / "a.x").write_text("  a  ")
+    _git(tmp_path, "add", ".")
+    assert asyncio.run(hooks._staged(tmp_path)) == 1  # pyright: ignore[reportPrivateUsage]
+    assert asyncio.run(hooks._staged(tmp_path)) == 1  # pyright: ignore[reportPrivateUsage]
+    assert (tmp_path / "a.x").read_text() == "  a  "
+
+
+def test_validation_key_covers_configs_outside_the_repo(tmp_path: Path):
+    ruff = tmp_path / "configs" / "ruff.toml"
+    ruff.parent.mkdir()
+    ruff.write_text("line-length = 88\n")
+    cfg = Config(ruff_config=str(ruff), biome_config=str(ruff.parent))
+    key = hooks._validation_key(tmp_path, cfg)  # pyright: ignore[reportPrivateUsage]
+    ruff.write_text("line-length = 100\n")
+    assert hooks._validation_key(tmp_path, cfg) != key  # pyright: ignore[reportPrivateUsage]
+    key = hooks._validation_key(tmp_path, cfg)  # pyright: ignore[reportPrivateUsage]
+    (ruff.parent / "biome.json").write_text("{}")
+    assert hooks._validation_key(tmp_path, cfg) != key  # pyright: ignore[reportPrivateUsage]
+
+
+def test_install_writes_handlers(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    _git(tmp_path, "init", "-q")
+    monkeypatch.chdir(tmp_path)
+    cmd = hooks.Hooks(hooks._Install(("staged", "changelog")))  # pyright: ignore[reportPrivateUsage]
+    assert hooks.run(cmd) == 0
+    hook = (tmp_path / ".git" / "hooks" / "pre-commit").read_text()
+    assert hook.endswith("exec guide hooks run staged changelog\n")
+    assert '"${QX_COMMIT_HOOK_ACTIVE:-}"' in hook
+    bad = hooks.Hooks(hooks._Install(("nope",)))  # pyright: ignore[reportPrivateUsage]
+    assert hooks.run(bad) == 1
@@ -0,0 +1,143 @@
+"""Tests for guide.imports and guide.lang test selection, sharding and merging."""
+
+import json
+from pathlib import Path
+
+from guide.imports import ImportGraph, affected_tests, module_names
+from guide.lang import (
+    TestResult,
+    lpt_shards,
+    merge_reportlogs,
+    reportlog_durations,
+    run_pytest_shards,
+)
+
+
+def _write(root: Path, files: dict[str, str]) -> None:
+    for rel, text in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+
+
+def test_module_names_src_layout():
+    assert list(module_names(Path("pkg/mod.py"))) == ["pkg.mod"]
+    assert list(module_names(Path("pkg/__init__.py"))) == ["pkg"]
+    assert list(module_names(Path("src/pkg/mod.py"))) == ["src.pkg.mod", "pkg.mod"]
+
+
+def test_graph_resolves_relative_and_from_imports(tmp_path: Path):
+    _write(
+        tmp_path,
+        {
+            "pkg/__init__.py": "",
+            "pkg/a.py": "X = 1\n",
+            "pkg/b.py": "from .a import X\n",
+            "pkg/c.py": "from pkg import b\n",
+        },
+    )
+    graph = ImportGraph.build(tmp_path)
+    assert Path("pkg/a.py") in graph.imports[Path("pkg/b.py")]
+    assert Path("pkg/b.py") in graph.imports[Path("pkg/c.py")]
+    assert graph.dependents([Path("pkg/a.py")]) >= {
+        Path("pkg/a.py"),
+        Path("pkg/b.py"),
+        Path("pkg/c.py"),
+    }
+
+
+def test_affected_tests_transitive(tmp_path: Path):
+    _write(
+        tmp_path,
+        {
+            "pkg/__init__.py": "",
+            "pkg/a.py": "X = 1\n",
+            "pkg/b.py": "import pkg.a\n",
+            "pkg/other.py": "",
+            "tests/test_b.py": "from pkg import b\n\ndef test_b():\n    pass\n",
+            "tests/test_other.py": "import pkg.other\n\ndef test_o():\n    pass\n",
+        },
+    )
+    assert affected_tests(tmp_path, [Path("pkg/a.py")]) == ["tests/test_b.py::test_b"]
+    assert affected_tests(tmp_path, [Path("README.md")]) == []
+
+
+def test_affected_tests_conftest_covers_directory(tmp_path: Path):
+    _write(
+        tmp_path,
+        {
+            "tests/conftest.py": "",
+            "tests/test_x.py": "def test_x():\n    pass\n",
+        },
+    )
+    assert affected_tests(tmp_path, [Path("tests/conftest.py")]) == [
+        "tests/test_x.py::test_x"
+    ]
+
+
+def test_merge_reportlogs_fresh_entries_win(tmp_path: Path):
+    def line(nodeid: str, outcome: str) -> str:
+        return json.dumps({"nodeid": nodeid, "when": "call", "outcome": outcome})
+
+    target = tmp_path / "results.jsonl"
+    target.write_text(line("t::a", "failed") + "\n" + line("t::b", "passed") + "\n")
+    fresh = tmp_path / "fresh.jsonl"
+    fresh.write_text(line("t::a", "passed") + "\n")
+    merge_reportlogs(target, fresh)
+    items = [json.loads(ln) for ln in target.read_text().splitlines()]
+    assert {i["nodeid"]: i["outcome"] for i in items} == {
+        "t::a": "passed",
+        "t::b": "passed",
+    }
+    assert len(items) == 2
+
+
+def test_reportlog_durations_sums_parametrized_cases():
+    results = [
+        TestResult(ref="t::a[1]", status="passed", details={"duration": "0.5"}),
+        TestResult(ref="t::a[2]", status="passed", details={"duration": "1.5"}),
+        TestResult(ref="t::b", status="failed", details={"duration": "3"}),
+    ]
+    assert reportlog_durations(results) == {"t::a": 2.0, "t::b": 3.0}
+
+
+def test_lpt_shards_balances_duration():
+    durations = {"a": 7.0, "b": 5.0, "c": 4.0, "d": 3.0, "e": 1.0}
+    shards = lpt_shards(list(durations), durations, 2)
+    loads = sorted(sum(durations[t] for t in s) for s in shards)
+    assert loads == [10.0, 10.0]
+    assert sorted(t for s in shards for t in s) == sorted(durations)
+
+
+def test_lpt_shards_unknown_tests_cost_median():
+    shards = lpt_shards(["a", "b", "new1", "new2"], {"a": 1.0, "b": 3.0}, 2)
+    assert {frozenset(s) for s in shards} == {
+        frozenset({"b", "a"}),
+        frozenset({"new1", "new2"}),
+    }
+    assert lpt_shards(["a"], {}, 4) == [["a"]]
+
+
+def test_run_pytest_shards_writes_one_log_per_shard(tmp_path: Path):
+    _write(
+        tmp_path,
+        {
+            "test_x.py": "def test_a():\n    pass\n\ndef test_b():\n    assert 0\n",
+        },
+    )
+    logs = [tmp_path / "out" / f"shard-{i}.jsonl" for i in range(2)]
+    code = run_pytest_shards(
+        tmp_path, [["test_x.py::test_a"], ["test_x.py::test_b"]], logs
+    )
+    assert code == 1
+    target = tmp_path / "results.jsonl"
+    merge_reportlogs(target, *logs)
+    calls = [
+        item
+        for ln in target.read_text().splitlines()
+        if (item := json.loads(ln)).get("when") == "call"
+    ]
+    assert {i["nodeid"]: i["outcome"] for i in calls} == {
+        "test_x.py::test_a": "passed",
+        "test_x.py::test_b": "failed",
+    }
@@ -0,0 +1,145 @@
+"""Tests for guide.llm — backends and batched structured extraction."""
+
+import asyncio
+import json
+import re
+import subprocess
+from pathlib import Path
+
+import pytest
+from pydantic import BaseModel
+
+from guide import llm
+from guide.llm import (
+    ExtractionError,
+    FakeBackend,
+    Recorded,
+    ReplayMissError,
+    aask,
+    aask_model,
+    aask_model_many,
+    pack,
+    use_backend,
+)
+
+
+class Summary(BaseModel):
+    title: str
+    words: int
+
+
+ITEM = re.compile(r"^## Item (\d+)\n\n### text\n\n(.*)$", re.MULTILINE)
+
+
+def _answer(prompt: str, skip: set[int]) -> str:
+    answers = [
+        {"item": int(i), "answer": {"title": text.upper(), "words": len(text.split())}}
+        for i, text in ITEM.findall(prompt)
+        if int(i) not in skip
+    ]
+    return f"```json\n{json.dumps(answers)}\n```"
+
+
+def test_pack_respects_budget_and_order():
+    sizes = {0: 40, 1: 40, 2: 100, 3: 10, 4: 10}
+    assert pack(sizes, overhead=10, budget=100) == [[0, 1], [2], [3, 4]]
+    assert pack(dict.fromkeys(range(70), 1), 0, 10**6) == [
+        list(range(32)),
+        list(range(32, 64)),
+        list(range(64, 70)),
+    ]
+
+
+def test_many_packs_and_reasks_only_failures(monkeypatch: pytest.MonkeyPatch):
+    prompts: list[str] = []
+
+    async def fake(*content: str, **_: object) -> str:
+        prompt = "\n".join(content)
+        prompts.append(prompt)
+        if len(prompts) > 1:
+            return _answer(prompt, set())
+        # item 3 goes missing and item 5 comes back invalid; the rest stand
+        invalid = '{"item": 5, "answer": {"title": "x"}}]'
+        return _answer(prompt, {3, 5}).replace("]", ", " + invalid)
+
+    monkeypatch.setattr(llm, "aask", fake)
+    items = [{"text": f"item number {i}"} for i in range(10)]
+    got = asyncio.run(aask_model_many(Summary, items))
+
+    assert [s.title for s in got] == [f"ITEM NUMBER {i}" for i in range(10)]
+    assert len(prompts) == 2
+    assert prompts[0].count('"title": "Summary"') == 1  # schema sent once
+    assert [int(i) for i, _ in ITEM.findall(prompts[1])] == [3, 5]
+
+
+def test_many_raises_with_partial_results(monkeypatch: pytest.MonkeyPatch):
+    calls = 0
+
+    async def fake(*content: str, **_: object) -> str:
+        nonlocal calls
+        calls += 1
+        return _answer("\n".join(content), {1})
+
+    monkeypatch.setattr(llm, "aask", fake)
+    with pytest.raises(ExtractionError) as e:
+        asyncio.run(aask_model_many(Summary, [{"text": "a"}, {"text": "b"}]))
+    assert e.value.results[0] == Summary(title="A", words=1)
+    assert e.value.results[1] is None
+    assert list(e.value.errors) == [1]
+    assert calls == llm.MAX_ROUNDS
+
+
+async def _outcomes(backend: FakeBackend, prompts: list[str]) -> list[str]:
+    async def one(p: str) -> str:
+        try:
+            return await backend.complete(p, model="opus", timeout_seconds=0.05)
+        except subprocess.CalledProcessError:
+            return "failed"
+        except TimeoutError:
+            return "timeout"
+
+    return await asyncio.gather(*(one(p) for p in prompts))
+
+
+def test_fake_backend_is_reproducible():
+    prompts = [f"p{i}" for i in range(200)]
+
+    def backend() -> FakeBackend:
+        return FakeBackend(str.upper, failure_rate=0.2, timeout_rate=0.05, seed=7)
+
+    first = asyncio.run(_outcomes(backend(), prompts))
+    # the same outcome per prompt, whatever order the calls come in
+    again = asyncio.run(_outcomes(backend(), prompts[::-1]))[::-1]
+    assert first == again
+    assert 20 < first.count("failed") < 60
+    assert 2 < first.count("timeout") < 25
+    assert "P0" in first or "P1" in first
+
+    # a retried prompt draws again
+    fake = backend()
+    retries = asyncio.run(_outcomes(fake, ["p0"] * 20))
+    assert len(set(retries)) > 1
+    assert len(fake.calls) == 20
+
+
+def test_fake_backend_drives_aask_model():
+    fake = FakeBackend(
+        lambda _: '```json\n{"title": "t", "words": 2}\n```', latency=0.01
+    )
+    with use_backend(fake):
+        got = asyncio.run(aask_model(Summary, text="two words"))
+    assert got == Summary(title="t", words=2)
+    assert "two words" in fake.calls[0]
+
+
+def test_recorded_replays_without_backend(tmp_path: Path):
+    fake = FakeBackend(lambda p: f"answer to {p}")
+    with use_backend(Recorded(tmp_path, fake)):
+        assert asyncio.run(aask("q", "1")) == "answer to q\n1"
+        assert asyncio.run(aask("q", "1")) == "answer to q\n1"
+    assert len(fake.calls) == 1
+
+    with use_backend(Recorded(tmp_path)):
+        assert asyncio.run(aask("q", "1")) == "answer to q\n1"
+        with pytest.raises(ReplayMissError):
+            asyncio.run(aask("q", "1", model="sonnet"))
@@ -0,0 +1,175 @@
+"""Tests for guide.netlify against a local stand-in for the Netlify API."""
+
+import hashlib
+import json
+import threading
+import urllib.parse
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, cast
+
+import pytest
+
+from guide.api.cli import portal
+from guide.api.cli.portal import Portal, _Set
+from guide.netlify import Client, plan
+
+
+class _FakeNetlify(ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.sites: dict[str, dict[str, Any]] = {}
+        self.blobs: set[str] = set()
+        self.deploys: dict[str, dict[str, str]] = {}
+        self.uploads: list[str] = []
+        self.site_lists = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    @property
+    def fake(self) -> _FakeNetlify:
+        return cast("_FakeNetlify", self.server)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+    def _reply(self, body: object = None, code: int = 200) -> None:
+        raw = json.dumps(body).encode() if body is not None else b""
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def do_GET(self) -> None:
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts == ["sites"]:
+            with self.fake.lock:
+                self.fake.site_lists += 1
+            self._reply(list(self.fake.sites.values()))
+        elif parts[0] == "deploys":
+            self._reply({"id": parts[1], "state": "ready"})
+        else:
+            self._reply(code=404)
+
+    def do_POST(self) -> None:
+        parts = self.path.strip("/").split("/")
+        body = json.loads(self._body())
+        if parts[1:] == ["sites"]:
+            site = {
+                "id": f"id-{body['name']}",
+                "name": body["name"],
+                "ssl_url": f"https://{body['name']}.netlify.app",
+            }
+            self.fake.sites[site["id"]] = site
+            self._reply(site)
+        elif parts[0] == "sites" and parts[2] == "deploys":
+            deploy_id = f"d{len(self.fake.deploys)}"
+            files: dict[str, str] = body["files"]
+            self.fake.deploys[deploy_id] = files
+            required = sorted(set(files.values()) - self.fake.blobs)
+            self._reply({"id": deploy_id, "required": required})
+        else:
+            self._reply(code=404)
+
+    def do_PUT(self) -> None:
+        _, _, deploy_id, _, path = self.path.split("/", 4)
+        path = urllib.parse.unquote(path)
+        sha = hashlib.sha1(self._body()).hexdigest()
+        with self.fake.lock:
+            assert self.fake.deploys[deploy_id]["/" + path] == sha
+            self.fake.blobs.add(sha)
+            self.fake.uploads.append("/" + path)
+        self._reply({"id": sha})
+
+    def do_DELETE(self) -> None:
+        self.fake.sites.pop(self.path.strip("/").split("/")[1], None)
+        self._reply(code=204)
+
+
+@pytest.fixture
+def netlify(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Iterator[_FakeNetlify]:
+    server = _FakeNetlify()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv("NETLIFY_API_URL", server.url)
+    monkeypatch.setenv("NETLIFY_AUTH_TOKEN", "token")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def html(tmp_path: Path) -> Path:
+    root = tmp_path / "html"
+    (root / "assets").mkdir(parents=True)
+    (root / "index.html").write_text("<h1>portal</h1>")
+    (root / "assets" / "a.css").write_text("h1 { color: red }")
+    (root / "assets" / "copy.css").write_text("h1 { color: red }")
+    (root / ".hidden").write_text("x")
+    return root
+
+
+def test_deploy_uploads_only_what_changed(netlify: _FakeNetlify, html: Path):
+    client = Client()
+    site = client.create_site("qx-demo", "qxotk")
+
+    first = client.deploy(site, html)
+    assert first.uploaded == ["/assets/a.css", "/index.html"]  # one per digest
+    assert netlify.deploys["d0"].keys() == {
+        "/index.html",
+        "/assets/a.css",
+        "/assets/copy.css",
+    }
+
+    assert client.deploy(site, html).uploaded == []
+
+    (html / "index.html").write_text("<h1>portal v2</h1>")
+    assert client.deploy(site, html).uploaded == ["/index.html"]
+    assert netlify.uploads.count("/index.html") == 2
+
+
+def test_sites_are_cached(netlify: _FakeNetlify):
+    client = Client()
+    client.create_site("qx-demo", "qxotk")
+    assert client.site("qx-demo") is not None
+    assert Client().site("qx-demo") is not None
+    assert netlify.site_lists == 1
+
+    client.delete_site(netlify.sites["id-qx-demo"])
+    assert client.site("qx-demo") is None
+    assert netlify.site_lists == 2
+
+
+def test_dry_run_plans_against_last_deploy(
+    netlify: _FakeNetlify, html: Path, capsys: pytest.CaptureFixture[str]
+):
+    client = Client()
+    site = client.create_site("qx-demo", "qxotk")
+    assert plan("qx-demo", html).added == [
+        "/assets/a.css",
+        "/assets/copy.css",
+        "/index.html",
+    ]
+    client.deploy(site, html)
+    assert not plan("qx-demo", html)
+
+    (html / "index.html").write_text("changed")
+    (html / "new.js").write_text("1")
+    (html / "assets" / "copy.css").unlink()
+    assert portal.run(Portal(_Set("demo", html, raw=True, dry_run=True))) == 0
+    assert capsys.readouterr().out.split("\n")[:3] == [
+        "+ /new.js",
+        "~ /index.html",
+        "- /assets/copy.css",
+    ]
+    assert len(netlify.deploys) == 1
@@ -0,0 +1,78 @@
+"""Tests for guide.prompts — cached command templates and budget trimming."""
+
+import asyncio
+from pathlib import Path
+
+from guide.llm import FakeBackend, use_backend
+from guide.paths import Commands
+from guide.prompts import (
+    estimate_tokens,
+    load_template,
+    render,
+    split_front_matter,
+    trim,
+)
+
+
+def test_split_front_matter_tolerates_slash_command_hints():
+    meta, body = split_front_matter(Commands.gen_comm.path.read_text())
+    assert meta["name"] == "Gen Comm"
+    assert meta["argument-hint"] == "[mood] [format] [brief...]"
+    assert body.startswith("MOOD=$ARGUMENTS[0]")
+
+    meta, _ = split_front_matter(
+        (Commands.gen_comm.path.parent / "map-md-to-yaml.md").read_text()
+    )
+    assert meta["N_MAX_CONCURRENT_AGENT"] == 3
+    assert split_front_matter("no front matter") == ({}, "no front matter")
+
+
+def test_template_reloads_on_change(tmp_path: Path):
+    path = tmp_path / "cmd.md"
+    path.write_text("---\nname: a\n---\nbody one\n")
+    first = load_template(path)
+    assert load_template(path) is first
+    path.write_text("---\nname: b\n---\nbody two, longer\n")
+    second = load_template(path)
+    assert second.meta == {"name": "b"}
+    assert second.body == "body two, longer\n"
+
+
+def test_trim_keeps_head_and_tail():
+    text = "\n".join(f"line {i:04}" for i in range(1000))
+    cut = trim(text, 200)
+    assert estimate_tokens(cut) <= 200
+    lines = cut.splitlines()
+    assert lines[0] == "line 0000"
+    assert lines[-1] == "line 0999"
+    assert "lines trimmed" in cut
+    assert trim("short", 200) == "short"
+
+
+def test_render_trims_low_priority_details_first(tmp_path: Path):
+    path = tmp_path / "cmd.md"
+    path.write_text("---\nname: a\n---\nDo the thing.\n")
+    big = "\n".join(f"row {i}" for i in range(2000))
+    details = {"spec": "keep me", "data": big, "notes": "x" * 4000}
+
+    body, content, sections = render(load_template(path), ("content",), details, 2000)
+    assert (body, content) == ("Do the thing.\n", "content")
+    assert "## spec\n\nkeep me" in sections
+    assert "lines trimmed" in sections
+    assert "## notes\n\n[omitted: ~1000 tokens" in sections
+    assert estimate_tokens(body + content + sections) <= 2000
+
+    *_, whole = render(load_template(path), (), details, 10**6)
+    assert big in whole
+
+
+def test_commands_aask_sends_body_within_budget():
+    fake = FakeBackend(lambda p: p)
+    with use_backend(fake):
+        prompt = asyncio.run(
+            Commands.gen_limn.aask("go", budget=3000, data="y\n" * 50_000)
+        )
+    assert not prompt.startswith("---")
+    assert prompt.startswith(Commands.gen_limn.template.body)
+    assert estimate_tokens(prompt) <= 3000
+    assert Commands.gen_report.path.is_file()
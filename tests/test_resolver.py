@@ -0,0 +1,132 @@
+"""Tests for guide.resolver — sandboxed resolver compile, evaluate and host."""
+
+from pathlib import Path
+
+import pytest
+
+from guide.resolver import (
+    BudgetExceededError,
+    Effect,
+    Host,
+    ResolverError,
+    Sandbox,
+    compile_resolver,
+    evaluate,
+    read_front_matter,
+    resolver_front_matter,
+)
+
+RESOLVER = """
+LIMIT = 30
+
+def label(n):
+    return "high" if n > LIMIT else "low"
+
+def resolve(ctx):
+    hot = [r for r in ctx["refs"] if r.endswith(".sql")]
+    if ctx["difference"] > LIMIT:
+        notify(f"{ctx['contract']} drifted {ctx['difference']}")
+        return run("make " + ctx["contract"])
+    return {"level": label(ctx["difference"]), "hot": hot}
+"""
+
+
+def _ctx(difference: int) -> dict[str, object]:
+    return {"contract": "create-user", "difference": difference, "refs": ["a.sql"]}
+
+
+def test_evaluate_returns_value():
+    result = evaluate(RESOLVER, _ctx(5))
+    assert result.value == {"level": "low", "hot": ["a.sql"]}
+    assert result.effects == []
+
+
+def test_evaluate_records_host_effects():
+    result = evaluate(RESOLVER, _ctx(40))
+    assert result.value is None
+    assert result.effects == [
+        Effect("notify", ("create-user drifted 40",)),
+        Effect("run", ("make create-user",)),
+    ]
+
+
+def test_compile_cached_by_source_hash():
+    assert compile_resolver(RESOLVER) is compile_resolver(RESOLVER)
+
+
+@pytest.mark.parametrize(
+    "source",
+    [
+        "import os\ndef resolve(ctx):\n    return 1",
+        "def resolve(ctx):\n    while True:\n        pass",
+        "def resolve(ctx):\n    return ctx.__class__",
+        "def resolve(ctx):\n    return (lambda: 1)()",
+        "def resolve(ctx):\n    return open('x')",
+        "def resolve(ctx):\n    return 'a'.format(ctx)",
+        "def resolve(ctx):\n    return resolve(ctx)",
+        "x = 1",
+    ],
+)
+def test_rejects_unsafe_or_invalid(source: str):
+    with pytest.raises(ResolverError):
+        evaluate(source, {})
+
+
+def test_step_budget():
+    source = "def resolve(ctx):\n    n = 0\n    for i in range(10000):\n        n += i\n    return n"
+    assert evaluate(source, {}).value == sum(range(10000))
+    with pytest.raises(BudgetExceededError):
+        evaluate(source, {}, steps=1000)
+
+
+def test_size_budget():
+    with pytest.raises(BudgetExceededError):
+        evaluate("def resolve(ctx):\n    return 'x' * 1000000", {})
+    with pytest.raises(BudgetExceededError):
+        evaluate("def resolve(ctx):\n    return 1000000 * 'x'", {})
+
+
+def test_integer_and_method_budgets():
+    squares = "def resolve(ctx):\n    x = 3\n    for i in range(40):\n        x = x * x\n    return x"
+    with pytest.raises(BudgetExceededError, match="bits"):
+        evaluate(squares, {})
+    padded = "def resolve(ctx):\n    return ('a' * 30000).replace('', ctx['s'])"
+    with pytest.raises(BudgetExceededError):
+        evaluate(padded, {"s": "xyz"})
+    keys = "def resolve(ctx):\n    return ctx['s'].replace('a', 'bb', 2)"
+    assert evaluate(keys, {"s": "aaa"}).value == "bbbba"
+
+
+def test_time_budget_is_checked_every_step():
+    source = "def resolve(ctx):\n    return sorted(range(90000))[0]"
+    with pytest.raises(BudgetExceededError, match="time"):
+        evaluate(source, {}, seconds=0.0)
+
+
+def test_sandbox_kills_overrunning_workers():
+    sandbox = Sandbox()
+    loop = "def resolve(ctx):\n    n = 0\n    for i in range(90000):\n        n += i\n    return n"
+    try:
+        with pytest.raises(BudgetExceededError, match="killed"):
+            sandbox.evaluate(loop, {}, steps=10**9, seconds=60, timeout=0.0)
+        assert sandbox.evaluate(RESOLVER, _ctx(5)).value["level"] == "low"
+        with pytest.raises(ResolverError, match="not defined"):
+            sandbox.evaluate("def resolve(ctx):\n    return nope", {})
+    finally:
+        sandbox.close()
+
+
+def test_front_matter_roundtrip():
+    text = f"---\nname: spec.gen\n{resolver_front_matter(RESOLVER.strip())}---\nx:\n"
+    assert read_front_matter(text)["resolver"].strip() == RESOLVER.strip()
+
+
+def test_host_performs_effects(tmp_path: Path):
+    notes: list[str] = []
+    host = Host(tmp_path, notify=notes.append)
+    source = "def resolve(ctx):\n    notify('hi', ctx['contract'])\n    run('true')"
+    fut = host.submit(source, {"contract": "c"})
+    assert fut is not None
+    assert fut.result(timeout=10).effects[0] == Effect("notify", ("hi", "c"))
+    host.shutdown()
+    assert notes == ["hi c", "run: true → exit 0"]
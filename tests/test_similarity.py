@@ -0,0 +1,100 @@
+"""Tests for guide.similarity — MinHash signatures, code regions and LSH lookup."""
+
+import random
+
+import numpy as np
+import pytest
+
+from guide import similarity
+from guide.similarity import (
+    EMPTY,
+    LSHIndex,
+    Region,
+    minhash,
+    shingles,
+    sign_code,
+    text_sketch,
+)
+
+BODY = """
+CREATE TABLE users (
+    id INT PRIMARY KEY,
+    email TEXT NOT NULL UNIQUE,
+    created_at TIMESTAMP DEFAULT now()
+);
+"""
+
+
+def _noise(rng: random.Random, lines: int) -> str:
+    words = ["select", "from", "where", "join", "orders", "total", "1", "=", "("]
+    return "".join(
+        " ".join(rng.choice(words) for _ in range(8)) + "\n" for _ in range(lines)
+    )
+
+
+def _score(a: str, b: str) -> float:
+    return float((text_sketch(a).sig == text_sketch(b).sig).mean())
+
+
+def test_similarity_orders_texts():
+    rng = random.Random(0)
+    near = BODY.replace("email TEXT", "email VARCHAR(255)")
+    assert _score(BODY, BODY.upper()) == 1.0
+    assert _score(BODY, near) > 0.4
+    assert _score(BODY, near) > _score(BODY, _noise(rng, 6)) + 0.3
+
+
+def test_minhash_segments_match_whole():
+    rng = np.random.default_rng(1)
+    sh = shingles(rng.integers(0, 2**32, 200, dtype=np.uint64))
+    bounds = np.array([0, 50, 50, 120, len(sh)])
+    segs = minhash(sh, bounds)
+    assert (segs[1] == EMPTY).all()
+    assert (segs[2] == minhash(sh[50:120])).all()
+    assert (segs.min(axis=0) == minhash(sh)).all()
+
+
+@pytest.mark.parametrize(
+    ("lines", "expected"),
+    [(0, [(1, 1)]), (8, [(1, 8)]), (25, [(1, 20), (11, 25)])],
+)
+def test_sign_code_regions(lines: int, expected: list[tuple[int, int]]):
+    text = "".join(f"x{i} = {i}\n" for i in range(lines))
+    signed = sign_code("a.py", text)
+    assert [(r.start, r.end) for r in signed.regions] == expected
+    assert signed.sigs.shape == (len(expected), similarity.NUM_PERM)
+    assert signed.sizes.sum() >= 0
+
+
+def _code(rng: random.Random, body_at: int | None) -> str:
+    before = _noise(rng, body_at or 0)
+    return before + (BODY if body_at is not None else "") + _noise(rng, 30)
+
+
+def test_lsh_finds_region(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(similarity, "REBUILD_FRACTION", 100.0)
+    rng = random.Random(2)
+    files = {f"f{i}.sql": sign_code(f"f{i}.sql", _code(rng, None)) for i in range(20)}
+    files["hit.sql"] = sign_code("hit.sql", _code(rng, 45))
+    index = LSHIndex.build(files)
+    sketch = text_sketch(BODY)
+    (region, score), *_ = index.query(sketch)
+    assert region.path == "hit.sql"
+    assert region.start <= 46 <= region.end
+    assert score == index.score("hit.sql", sketch)
+    assert score > 0.8
+
+    # replaced files go through the overlay, and are found there
+    index.add("hit.sql", sign_code("hit.sql", _code(rng, None)))
+    index.add("new.sql", sign_code("new.sql", BODY))
+    assert index.query(sketch)[0][0] == Region("new.sql", 1, 6)
+    index.remove("new.sql")
+    assert all(r.path != "new.sql" for r, _ in index.query(sketch))
+
+
+def test_lsh_overlay_resorts(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(similarity, "REBUILD_FRACTION", 0.0)
+    index = LSHIndex()
+    index.add("a.sql", sign_code("a.sql", BODY))
+    assert not index._fresh  # pyright: ignore[reportPrivateUsage]
+    assert index.query(text_sketch(BODY))[0][0].path == "a.sql"
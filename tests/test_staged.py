@@ -0,0 +1,55 @@
+"""Tests for guide.staged — staged paths and blobs straight from the index."""
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from guide.staged import git_dir, read_blobs, staged_files
+
+
+def _git(repo: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Path:
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "config", "user.email", "t@example.com")
+    _git(tmp_path, "config", "user.name", "t")
+    return tmp_path
+
+
+def test_staged_files_reads_index_not_worktree(repo: Path):
+    (repo / "kept.py").write_text("x = 1\n")
+    (repo / "gone.py").write_text("y = 1\n")
+    _git(repo, "add", ".")
+    _git(repo, "commit", "-qm", "init")
+
+    (repo / "kept.py").write_text("x = 2\n")
+    _git(repo, "add", "kept.py")
+    (repo / "kept.py").write_text("x = 3  # unstaged\n")
+    (repo / "new dir").mkdir()
+    (repo / "new dir" / "ü.md").write_text("# hi\n")
+    (repo / "link").symlink_to("kept.py")
+    _git(repo, "add", "new dir", "link")
+    _git(repo, "rm", "-q", "gone.py")
+
+    staged = {f.path: f.sha for f in staged_files(repo)}
+    assert set(staged) == {"kept.py", "new dir/ü.md"}
+    blobs = read_blobs(repo, [*staged.values(), "0" * 40])
+    assert blobs[staged["kept.py"]] == b"x = 2\n"
+    assert blobs[staged["new dir/ü.md"]] == b"# hi\n"
+    assert len(blobs) == 2
+
+
+def test_git_dir_follows_worktree_file(
+    repo: Path, tmp_path_factory: pytest.TempPathFactory
+):
+    assert git_dir(repo) == repo / ".git"
+    (repo / "a").write_text("a")
+    _git(repo, "add", "a")
+    _git(repo, "commit", "-qm", "a")
+    tree = tmp_path_factory.mktemp("wt") / "tree"
+    _git(repo, "worktree", "add", "-q", str(tree))
+    assert git_dir(tree) == (repo / ".git" / "worktrees" / "tree").resolve()
@@ -0,0 +1,52 @@
+"""Tests for guide.timing spans and guide.api.cli.stats percentiles."""
+
+from pathlib import Path
+
+import pytest
+
+from guide import timing
+from guide.api.cli.stats import summarize
+
+
+def test_span_noop_outside_record():
+    with timing.span("phase"):
+        pass
+    assert timing._active is None
+
+
+def test_record_roundtrip(tmp_path: Path):
+    path = tmp_path / "results" / "timings.jsonl"
+    with timing.record("check", path):
+        with timing.span("parse"):
+            pass
+        with timing.span("lint"):
+            pass
+    with timing.record("check", path):
+        pass
+    recs = list(timing.load(path))
+    assert len(recs) == 2
+    names = [name for name, _ in recs[0].spans]
+    assert names[-3:] == ["parse", "lint", "total"]
+    assert all(secs >= 0 for _, secs in recs[0].spans)
+
+
+def test_summarize_percentiles():
+    recs = [
+        timing.Recorder("check", [("lint", float(i))], ts=float(i))
+        for i in range(1, 101)
+    ]
+    (s,) = summarize(recs, window=100)
+    assert s.n == 100
+    assert s.p50 == pytest.approx(50.5)
+    assert s.p99 == pytest.approx(99.01)
+    assert s.prev_p95 is None
+
+
+def test_summarize_flags_regression():
+    fast = [timing.Recorder("check", [("lint", 1.0)], ts=float(i)) for i in range(10)]
+    slow = [
+        timing.Recorder("check", [("lint", 2.0)], ts=float(10 + i)) for i in range(10)
+    ]
+    (s,) = summarize(fast + slow, window=10)
+    assert s.prev_p95 == pytest.approx(1.0)
+    assert s.regressed
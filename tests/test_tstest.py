@@ -0,0 +1,106 @@
+"""Tests for guide.tstest — TS test discovery and JSON report ingestion."""
+
+import json
+from pathlib import Path
+
+import pytest
+
+from guide import tstest
+from guide.lang import ts
+
+SOURCE = """
+import { describe, it, expect } from "vitest";
+
+// it("commented out", () => {});
+describe("math", () => {
+  it("adds", () => {
+    expect(add(1, 2)).toBe(3);
+  });
+  describe.skip('nested "quotes"', () => {
+    test(`template`, () => { const s = "it('not a test')"; });
+  });
+  it.each([1, 2])("dynamic %i", (n) => {});
+});
+
+test("top level", async () => {});
+obj.it("method call", () => {});
+"""
+
+
+def test_case_titles_tracks_suites_and_skips_comments_and_strings():
+    assert list(tstest.case_titles(SOURCE)) == [
+        ("math", "adds"),
+        ("math", 'nested "quotes"', "template"),
+        ("top level",),
+    ]
+
+
+def test_discover_ts_tests(tmp_path: Path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "add.test.ts").write_text(SOURCE)
+    (tmp_path / "node_modules" / "dep").mkdir(parents=True)
+    (tmp_path / "node_modules" / "dep" / "x.test.ts").write_text('it("x", () => {})')
+    assert list(ts.discover_tests(tmp_path)) == [
+        "src/add.test.ts::math::adds",
+        'src/add.test.ts::math::nested "quotes"::template',
+        "src/add.test.ts::top level",
+    ]
+
+
+def _report(base: Path, *files: tuple[str, list[dict[str, object]]]) -> str:
+    return json.dumps(
+        {
+            "numTotalTests": 3,
+            "testResults": [
+                {"name": str(base / name), "endTime": 2000, "assertionResults": cases}
+                for name, cases in files
+            ],
+        }
+    )
+
+
+def _case(title: str, status: str, *ancestors: str) -> dict[str, object]:
+    return {
+        "ancestorTitles": list(ancestors),
+        "title": title,
+        "status": status,
+        "duration": 250,
+    }
+
+
+def test_iter_results_streams_small_chunks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(tstest, "CHUNK_SIZE", 7)
+    report = tmp_path / "results.json"
+    report.write_text(
+        _report(
+            tmp_path,
+            ("a.test.ts", [_case("adds", "passed", "math"), _case("s", "skipped")]),
+            ("b.test.ts", [_case("fails", "failed")]),
+        )
+    )
+    results = list(tstest.iter_results(report, tmp_path))
+    assert [(r.nodeid, r.status) for r in results] == [
+        ("a.test.ts::math::adds", "passed"),
+        ("b.test.ts::fails", "failed"),
+    ]
+    assert results[0].duration == 0.25
+    assert results[0].stop == 2.0
+
+
+def test_merge_results_replaces_rerun_files(tmp_path: Path):
+    target = tmp_path / "results" / "results.json"
+    target.parent.mkdir()
+    target.write_text(
+        _report(
+            tmp_path,
+            ("a.test.ts", [_case("a", "failed")]),
+            ("b.test.ts", [_case("b", "passed")]),
+        )
+    )
+    fresh = tmp_path / "fresh.json"
+    fresh.write_text(_report(tmp_path, ("a.test.ts", [_case("a", "passed")])))
+    tstest.merge_results(target, fresh)
+    results = {r.ref: r.status for r in ts.load_test_results(tmp_path)}
+    assert results == {"a.test.ts::a": "passed", "b.test.ts::b": "passed"}
@@ -0,0 +1,79 @@
+"""Tests for guide.watchd — one shared watcher per root, fanned out over a socket."""
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+
+import pytest
+
+from guide.watchd import SOCKET_ENV, Delta, Server, ServerRunningError, watch_deltas
+
+SETTLE = 0.3
+"""Seconds for a fresh watcher to register its inotify watches."""
+
+
+async def _until(cond: Callable[[], bool]) -> None:
+    for _ in range(250):
+        if cond():
+            return
+        await asyncio.sleep(0.02)
+    raise TimeoutError
+
+
+async def _paths(it: AsyncIterator[set[Delta]]) -> set[str]:
+    return {p for _, p in await asyncio.wait_for(anext(it), 5)}
+
+
+@pytest.fixture
+def sock(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    path = tmp_path / "watchd.sock"
+    monkeypatch.setenv(SOCKET_ENV, str(path))
+    return path
+
+
+def test_clients_share_one_watch(tmp_path: Path, sock: Path):
+    root = (tmp_path / "repo").resolve()
+    (root / "sub").mkdir(parents=True)
+
+    async def main() -> None:
+        server, ready = Server(sock), asyncio.Event()
+        serving = asyncio.create_task(server.serve(ready))
+        await ready.wait()
+        with pytest.raises(ServerRunningError):
+            await Server(sock).serve()
+
+        a = watch_deltas(root, debounce=100)
+        b = watch_deltas(root / "sub", debounce=100)
+        got_a = asyncio.ensure_future(_paths(a))
+        got_b = asyncio.ensure_future(_paths(b))
+        await _until(lambda: sum(len(w.clients) for w in server.watches.values()) == 2)
+        assert list(server.watches) == [root]
+        await asyncio.sleep(SETTLE)
+
+        (root / "top.txt").write_text("x")
+        (root / "sub" / "x.txt").write_text("x")
+        assert str(root / "sub" / "x.txt") in await got_a
+        assert await got_b == {str(root / "sub" / "x.txt")}
+
+        await a.aclose()
+        await b.aclose()
+        await _until(lambda: not server.watches)
+        serving.cancel()
+
+    asyncio.run(main())
+    assert not sock.exists()
+
+
+def test_falls_back_to_local_watch(tmp_path: Path, sock: Path):
+    async def main() -> set[str]:
+        it = watch_deltas(tmp_path, debounce=100)
+        got = asyncio.ensure_future(_paths(it))
+        await asyncio.sleep(SETTLE)
+        (tmp_path / "x.txt").write_text("x")
+        try:
+            return await got
+        finally:
+            await it.aclose()
+
+    assert not sock.exists()
+    assert str(tmp_path.resolve() / "x.txt") in asyncio.run(main())